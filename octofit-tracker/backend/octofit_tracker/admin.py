@@ -1,5 +1,11 @@
 from django.contrib import admin
-from .models import User, Team, Activity, Leaderboard, Workout
+from django.http import Http404, HttpResponse
+from django.urls import path, reverse
+from django.utils.html import format_html
+from bson import ObjectId
+from bson.errors import InvalidId
+from .models import User, Team, Activity, ArchivedActivity, Leaderboard, Workout, RequestProfile
+from .profiling import summarize
 
 
 @admin.register(User)
@@ -17,7 +23,7 @@ class TeamAdmin(admin.ModelAdmin):
     ordering = ['-created_at']
 
 
-@admin.register(Activity)
+@admin.register(Activity, ArchivedActivity)
 class ActivityAdmin(admin.ModelAdmin):
     list_display = ['user_email', 'activity_type', 'duration', 'distance', 'calories', 'date']
     list_filter = ['activity_type', 'date']
@@ -39,3 +45,53 @@ class WorkoutAdmin(admin.ModelAdmin):
     list_filter = ['activity_type', 'difficulty']
     search_fields = ['name', 'description']
     ordering = ['name']
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ['created_at', 'method', 'path', 'status_code', 'duration_ms', 'username', 'download']
+    list_filter = ['method', 'status_code']
+    search_fields = ['path', 'username']
+    ordering = ['-created_at']
+    exclude = ['stats']
+    readonly_fields = ['method', 'path', 'status_code', 'duration_ms', 'username', 'created_at', 'download', 'hottest_functions']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                '<str:object_id>/download/',
+                self.admin_site.admin_view(self.download_view),
+                name='octofit_tracker_requestprofile_download',
+            ),
+        ] + super().get_urls()
+
+    def get_object(self, request, object_id, from_field=None):
+        # djongo only matches _id against real ObjectIds
+        try:
+            return super().get_object(request, ObjectId(object_id), from_field)
+        except InvalidId:
+            return None
+
+    def download_view(self, request, object_id):
+        """Serve the profile as a .prof file readable by pstats and snakeviz"""
+        profile = self.get_object(request, object_id)
+        if profile is None or not self.has_view_permission(request, profile):
+            raise Http404
+        response = HttpResponse(bytes(profile.stats), content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="profile-{profile._id}.prof"'
+        return response
+
+    @admin.display(description='Profile')
+    def download(self, obj):
+        url = reverse('admin:octofit_tracker_requestprofile_download', args=[str(obj._id)])
+        return format_html('<a href="{}">Download .prof</a>', url)
+
+    @admin.display(description='Hottest functions (cumulative)')
+    def hottest_functions(self, obj):
+        return format_html('<pre>{}</pre>', summarize(bytes(obj.stats)))
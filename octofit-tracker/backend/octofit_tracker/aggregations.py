@@ -0,0 +1,125 @@
+"""
+MongoDB aggregation pipelines over the activities collection.
+
+Everything here runs server-side through ``DjongoManager.mongo_aggregate``
+so totals never require pulling Activity documents into Python. Archived
+activities are added with ``$unionWith`` when the archive overlaps.
+"""
+from .archive import archive_overlaps, union_archive
+from .filters import activity_match, parse_date_param
+from .models import Activity, User
+
+STATS_GROUP_KEYS = {
+    'user': '$user_email',
+    'team': '$team',
+    'activity_type': '$activity_type',
+    'day': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$date'}},
+    'week': {'$dateToString': {'format': '%G-W%V', 'date': '$date'}},
+    'month': {'$dateToString': {'format': '%Y-%m', 'date': '$date'}},
+}
+
+STATS_MAX_GROUPS = 1000
+
+
+def team_lookup():
+    """Stages that copy each activity owner's team onto the document"""
+    return [
+        {'$lookup': {
+            'from': User._meta.db_table,
+            'localField': 'user_email',
+            'foreignField': 'email',
+            'as': 'owner',
+        }},
+        {'$addFields': {'team': {'$ifNull': [{'$arrayElemAt': ['$owner.team', 0]}, None]}}},
+        {'$project': {'owner': 0}},
+    ]
+
+
+def activity_stats(group_by, params):
+    """
+    Return totals, averages and counts of activities grouped by the
+    dimensions in ``group_by`` (keys of ``STATS_GROUP_KEYS``).
+    Accepts the ``activity_match`` parameters plus ``team``.
+    """
+    match = activity_match(params)
+    pipeline = [{'$match': match}]
+    if archive_overlaps(parse_date_param(params, 'start')):
+        pipeline.extend(union_archive(match))
+    if 'team' in group_by or params.get('team'):
+        pipeline.extend(team_lookup())
+        if params.get('team'):
+            pipeline.append({'$match': {'team': params['team']}})
+
+    pipeline.extend([
+        {'$group': {
+            '_id': {key: STATS_GROUP_KEYS[key] for key in group_by},
+            'count': {'$sum': 1},
+            'total_calories': {'$sum': '$calories'},
+            'avg_calories': {'$avg': '$calories'},
+            'total_duration': {'$sum': '$duration'},
+            'avg_duration': {'$avg': '$duration'},
+            'total_distance': {'$sum': '$distance'},
+            'avg_distance': {'$avg': '$distance'},
+        }},
+        {'$sort': {'_id': 1}},
+        {'$limit': STATS_MAX_GROUPS},
+    ])
+
+    results = []
+    for row in Activity.objects.mongo_aggregate(pipeline):
+        group = row.pop('_id')
+        results.append({**group, **row})
+    return results
+
+
+def user_totals(match=None):
+    """Yield leaderboard totals for every user with activities"""
+    pipeline = [{'$match': match or {}}]
+    if archive_overlaps():
+        pipeline.extend(union_archive(match))
+    pipeline.extend([
+        {'$group': {
+            '_id': '$user_email',
+            'total_calories': {'$sum': '$calories'},
+            'total_activities': {'$sum': 1},
+            'total_duration': {'$sum': '$duration'},
+        }},
+    ])
+    for row in Activity.objects.mongo_aggregate(pipeline, allowDiskUse=True):
+        row['user_email'] = row.pop('_id')
+        yield row
+
+
+def leaderboard_pipeline(match=None, ranked=True, archived=False):
+    """
+    Stages computing a leaderboard row per user with activities matching
+    ``match``, with the user's name and team; in rank order if ``ranked``.
+    Counts archived activities too if ``archived``.
+    """
+    pipeline = [{'$match': match}] if match else []
+    if archived:
+        pipeline.extend(union_archive(match))
+    pipeline.append({'$group': {
+        '_id': '$user_email',
+        'total_calories': {'$sum': '$calories'},
+        'total_activities': {'$sum': 1},
+        'total_duration': {'$sum': '$duration'},
+    }})
+    if ranked:
+        pipeline.append({'$sort': {'total_calories': -1, '_id': 1}})
+    pipeline.append({'$lookup': {
+        'from': User._meta.db_table,
+        'localField': '_id',
+        'foreignField': 'email',
+        'as': 'user',
+    }})
+    return pipeline
+
+
+def leaderboard_row(row):
+    """Flatten a ``leaderboard_pipeline`` result into Leaderboard fields"""
+    user = row.pop('user')
+    row['user_email'] = row.pop('_id')
+    row['user_name'] = user[0]['name'] if user else row['user_email']
+    row['team'] = (user[0].get('team') or '') if user else ''
+    return row
@@ -0,0 +1,182 @@
+"""
+Hot and archived activity storage.
+
+``activities`` holds recent activities and ``activities_archive`` the
+older ones, which ``archive_activities`` moves over in bulk. Reads route
+by date range: the archive's newest date is its horizon, and a range
+starting after it never touches the archive. The hot collection is
+always read, so activities back-dated after an archive run are found.
+
+``PartitionedQuery`` merges the two collections for cursor pagination,
+reading the archive only when the hot rows cannot fill the requested
+page on their own, so recent pages cost the same however much history
+is archived. Aggregations add the archive with ``$unionWith``
+(MongoDB 4.4+) when it overlaps their range.
+
+The horizon costs a round trip, so within ``horizon_cache()`` (every
+request, see ``middleware.py``) it is read once and reused.
+"""
+import contextvars
+from contextlib import contextmanager
+from datetime import timezone
+from pymongo import ReplaceOne
+from .models import Activity, ArchivedActivity
+from .mongo import get_collection
+
+
+_horizons = contextvars.ContextVar('octofit_archive_horizon', default=None)
+
+
+@contextmanager
+def horizon_cache():
+    """Read the archive horizon at most once until the block exits; nested blocks share it"""
+    if _horizons.get() is not None:
+        yield
+        return
+    token = _horizons.set({})
+    try:
+        yield
+    finally:
+        _horizons.reset(token)
+
+
+def _read_horizon():
+    cursor = get_collection(ArchivedActivity).find({}, {'date': 1}).sort('date', -1).hint([('date', 1)])
+    for document in cursor.limit(1):
+        return document['date']
+    return None
+
+
+def archive_horizon():
+    """The date of the newest archived activity, or None when the archive is empty"""
+    cache = _horizons.get()
+    if cache is None:
+        return _read_horizon()
+    if 'horizon' not in cache:
+        cache['horizon'] = _read_horizon()
+    return cache['horizon']
+
+
+def _naive_utc(value):
+    # Raw documents carry naive UTC datetimes, the ORM aware ones
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+
+def archive_overlaps(start=None):
+    """Whether archived activities may fall in a range starting at ``start``"""
+    horizon = archive_horizon()
+    if horizon is None:
+        return False
+    return start is None or _naive_utc(start) <= horizon
+
+
+def union_archive(match=None):
+    """Stages appending the archived activities matching ``match`` to a pipeline"""
+    return [{'$unionWith': {
+        'coll': ArchivedActivity._meta.db_table,
+        'pipeline': [{'$match': match}] if match else [],
+    }}]
+
+
+def activity_models(start=None):
+    """The activity models to read for a range starting at ``start``"""
+    return [Activity, ArchivedActivity] if archive_overlaps(start) else [Activity]
+
+
+def _sort_value(row, field):
+    return row[field] if isinstance(row, dict) else getattr(row, field)
+
+
+class PartitionedQuery:
+    """
+    Sorted reads over a hot query and an archive query of the same shape
+    (QuerySets or ``DocumentQuery``), merged on their ordering. Supports
+    what cursor pagination uses: ``order_by``, ``filter``, ``only`` and slicing.
+    """
+
+    def __init__(self, hot, archived, ordering=()):
+        self.hot = hot
+        self.archived = archived
+        self.ordering = ordering
+
+    def _apply(self, method, *args, **kwargs):
+        return PartitionedQuery(
+            getattr(self.hot, method)(*args, **kwargs),
+            getattr(self.archived, method)(*args, **kwargs),
+            args if method == 'order_by' else self.ordering,
+        )
+
+    def filter(self, **lookups):
+        return self._apply('filter', **lookups)
+
+    def order_by(self, *fields):
+        return self._apply('order_by', *fields)
+
+    def only(self, *fields):
+        return self._apply('only', *fields)
+
+    def _merged(self, stop=None):
+        hot = list(self.hot[:stop]) if stop is not None else list(self.hot)
+        # Archived activities are older than the hot ones but for back-dated
+        # writes, so a full newest-first page of newer hot rows is complete
+        if stop is not None and len(hot) == stop and self.ordering[:1] == ('-date',):
+            horizon = archive_horizon()
+            if horizon is None or _naive_utc(_sort_value(hot[-1], 'date')) > horizon:
+                return hot
+        archived = list(self.archived[:stop]) if stop is not None else list(self.archived)
+        if not self.ordering:
+            return hot + archived
+
+        # Merge on each ordering field in turn, least significant first
+        rows = hot + archived
+        for field in reversed(self.ordering):
+            name = field.lstrip('-')
+            rows.sort(key=lambda row: _sort_value(row, name), reverse=field.startswith('-'))
+        return rows[:stop] if stop is not None else rows
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self._merged(key + 1)[key]
+        if key.step is not None:
+            raise ValueError('Slices with a step are not supported')
+        start = key.start or 0
+        if key.stop is None:
+            return self._merged()[start:]
+        return self._merged(key.stop)[start:] if key.stop > start else []
+
+    def __iter__(self):
+        return iter(self._merged())
+
+
+def partitioned(hot, archived, start=None):
+    """Read ``hot`` alone, or merged with ``archived`` when the archive overlaps ``start``"""
+    if not archive_overlaps(start):
+        return hot
+    return PartitionedQuery(hot, archived)
+
+
+def archive_activities(before, batch_size=5000, progress=None):
+    """
+    Move the activities dated before ``before`` to the archive in batches.
+    Each batch is upserted into the archive before it is deleted, so an
+    interrupted run loses nothing and is finished by running again.
+    Returns the number of activities moved.
+    """
+    hot = get_collection(Activity)
+    archive = get_collection(ArchivedActivity)
+    moved = 0
+    while True:
+        batch = list(hot.find({'date': {'$lt': before}}).sort('date', 1).hint([('date', 1)]).limit(batch_size))
+        if not batch:
+            break
+        archive.bulk_write([ReplaceOne({'_id': document['_id']}, document, upsert=True) for document in batch],
+                           ordered=False)
+        hot.delete_many({'_id': {'$in': [document['_id'] for document in batch]}})
+        moved += len(batch)
+        if progress:
+            progress(moved)
+    # The horizon moved with the activities
+    cache = _horizons.get()
+    if cache is not None:
+        cache.clear()
+    return moved
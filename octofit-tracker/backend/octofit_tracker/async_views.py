@@ -0,0 +1,267 @@
+"""
+Native async read paths for the hottest endpoints.
+
+The DRF viewsets run on blocking djongo/pymongo, so an ASGI worker can only
+serve one of them at a time. These views query Mongo through Motor instead
+and yield to the event loop while waiting, letting one worker serve many
+concurrent reads. They return the same representations as the matching
+viewset actions; the activity reads add archived activities the same way,
+only when the hot ones cannot fill the page (see ``archive.py``).
+
+Each event loop gets one ``AsyncIOMotorClient`` whose connection pool is
+shared by every request on that loop; it is built from the same
+``DATABASES`` settings as djongo. Where Motor cannot be imported (Motor
+2.5, the last release for pymongo 3, predates Python 3.11), the same
+queries run on djongo's pymongo client through ``sync_to_async``, so the
+endpoints keep working without the event-loop benefit.
+
+Pages are keyset cursors over sort keys that identify a document uniquely
+(``rank``, or ``_id`` as a tie-breaker); ``next`` links carry an opaque
+``cursor`` parameter.
+"""
+import asyncio
+import base64
+import weakref
+from datetime import datetime, timezone
+from asgiref.sync import sync_to_async
+from bson import json_util
+from django.db import connections
+from django.http import JsonResponse
+from rest_framework import serializers
+from .models import Activity, ArchivedActivity, Leaderboard, Workout
+from .mongo import get_database
+from .pagination import BaseCursorPagination
+from .serializers import ActivitySerializer, LeaderboardSerializer, WorkoutSerializer, readable_fields
+from .views import LeaderboardViewSet
+
+_clients = weakref.WeakKeyDictionary()
+_datetime_field = serializers.DateTimeField()
+
+
+class ThreadedCursor:
+    """The part of Motor's cursor API these views use, run on djongo's pymongo client"""
+
+    def __init__(self, using, name, args):
+        self.using = using
+        self.name = name
+        self.args = args
+        self.sort_args = None
+        self.limit_count = 0
+
+    def sort(self, *args):
+        self.sort_args = args
+        return self
+
+    def limit(self, limit):
+        self.limit_count = limit
+        return self
+
+    def _fetch(self, length):
+        cursor = get_database(self.using)[self.name].find(*self.args)
+        if self.sort_args:
+            cursor = cursor.sort(*self.sort_args)
+        return list(cursor.limit(self.limit_count))[:length]
+
+    async def to_list(self, length):
+        return await sync_to_async(self._fetch)(length)
+
+
+class ThreadedCollection:
+    def __init__(self, using, name):
+        self.using = using
+        self.name = name
+
+    def find(self, *args):
+        return ThreadedCursor(self.using, self.name, args)
+
+
+class ThreadedDatabase:
+    """Motor-style database used where Motor cannot be imported"""
+
+    def __init__(self, using):
+        self.using = using
+
+    def __getitem__(self, name):
+        return ThreadedCollection(self.using, name)
+
+
+def get_async_database(using='default'):
+    """Return the Motor database for a djongo connection on the running loop"""
+    try:
+        from motor.motor_asyncio import AsyncIOMotorClient
+    except ImportError:
+        return ThreadedDatabase(using)
+    loop = asyncio.get_running_loop()
+    database_settings = connections[using].settings_dict
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = AsyncIOMotorClient(io_loop=loop, **database_settings.get('CLIENT', {}))
+    return client[database_settings['NAME']]
+
+
+def to_representation(document, fields):
+    """Render a raw document the way the model serializer would"""
+    data = {}
+    for name in fields:
+        value = document.get(name)
+        if name == '_id':
+            value = str(value)
+        elif isinstance(value, datetime):
+            # djongo stores naive UTC datetimes
+            value = _datetime_field.to_representation(value.replace(tzinfo=timezone.utc))
+        data[name] = value
+    return data
+
+
+def _encode_cursor(document, sort):
+    position = [document.get(field) for field, _ in sort]
+    return base64.urlsafe_b64encode(json_util.dumps(position).encode()).decode()
+
+
+def _decode_cursor(cursor, sort):
+    try:
+        position = json_util.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(position, list) or len(position) != len(sort):
+        return None
+    return position
+
+
+def _after(position, sort):
+    """Filter for documents sorted after ``position``"""
+    clauses = []
+    for index, (field, direction) in enumerate(sort):
+        clause = {name: position[i] for i, (name, _) in enumerate(sort[:index])}
+        clause[field] = {'$gt' if direction > 0 else '$lt': position[index]}
+        clauses.append(clause)
+    return {'$or': clauses}
+
+
+def _page_size(request):
+    try:
+        size = int(request.GET.get(BaseCursorPagination.page_size_query_param, BaseCursorPagination.page_size))
+    except ValueError:
+        return BaseCursorPagination.page_size
+    return max(1, min(size, BaseCursorPagination.max_page_size))
+
+
+async def _archive_horizon(database):
+    cursor = database[ArchivedActivity._meta.db_table].find({}, {'date': 1}).sort('date', -1)
+    documents = await cursor.limit(1).to_list(1)
+    return documents[0]['date'] if documents else None
+
+
+async def _find(collection, query, projection, sort, limit):
+    return await collection.find(query, projection).sort(sort).limit(limit).to_list(limit)
+
+
+def _merged(documents, sort):
+    for field, direction in reversed(sort):
+        documents.sort(key=lambda document: document[field], reverse=direction < 0)
+    return documents
+
+
+async def paginated_response(request, model, query, sort, serializer_class, archive=None):
+    """
+    Fetch one keyset page of ``query`` and render it like a cursor page.
+    With an ``archive`` model (``sort`` newest ``date`` first), archived
+    documents are merged in when the hot ones may not fill the page.
+    """
+    cursor = request.GET.get('cursor')
+    if cursor:
+        position = _decode_cursor(cursor, sort)
+        if position is None:
+            return JsonResponse({'detail': 'Invalid cursor'}, status=404)
+        query = {'$and': [query, _after(position, sort)]}
+
+    fields = readable_fields(serializer_class)
+    projection = {name: 1 for name in fields}
+    size = _page_size(request)
+    database = get_async_database()
+    documents = await _find(database[model._meta.db_table], query, projection, sort, size + 1)
+    if archive is not None:
+        horizon = await _archive_horizon(database)
+        # Archived activities are older than the hot ones but for back-dated writes
+        if horizon is not None and (len(documents) <= size or documents[-1]['date'] <= horizon):
+            archived = await _find(database[archive._meta.db_table], query, projection, sort, size + 1)
+            documents = _merged(documents + archived, sort)[:size + 1]
+
+    next_url = None
+    if len(documents) > size:
+        documents = documents[:size]
+        params = request.GET.copy()
+        params['cursor'] = _encode_cursor(documents[-1], sort)
+        next_url = request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+    return JsonResponse({
+        'next': next_url,
+        'previous': None,
+        'results': [to_representation(document, fields) for document in documents],
+    })
+
+
+def _required(request, name, label):
+    value = request.GET.get(name)
+    if value:
+        return value, None
+    return None, JsonResponse({'error': f'{label} parameter is required'}, status=400)
+
+
+async def activities_by_user(request):
+    """Get activities filtered by user email, newest first"""
+    email, error = _required(request, 'email', 'Email')
+    if error:
+        return error
+    return await paginated_response(
+        request, Activity, {'user_email': email}, [('date', -1), ('_id', -1)], ActivitySerializer,
+        archive=ArchivedActivity,
+    )
+
+
+async def leaderboard_top(request):
+    """Get the top N leaderboard entries"""
+    try:
+        limit = int(request.GET.get('limit', 10))
+    except ValueError:
+        return JsonResponse({'error': 'Limit must be an integer'}, status=400)
+    limit = max(1, min(limit, LeaderboardViewSet.top_max_limit))
+
+    fields = readable_fields(LeaderboardSerializer)
+    collection = get_async_database()[Leaderboard._meta.db_table]
+    documents = await collection.find({}, {name: 1 for name in fields}).sort('rank', 1).limit(limit).to_list(limit)
+    return JsonResponse([to_representation(document, fields) for document in documents], safe=False)
+
+
+async def leaderboard_by_team(request):
+    """Get leaderboard filtered by team"""
+    team, error = _required(request, 'team', 'Team')
+    if error:
+        return error
+    return await paginated_response(
+        request, Leaderboard, {'team': team}, [('rank', 1)], LeaderboardSerializer,
+    )
+
+
+async def workouts(request):
+    """List workouts in insertion order"""
+    return await paginated_response(request, Workout, {}, [('_id', 1)], WorkoutSerializer)
+
+
+async def workouts_by_difficulty(request):
+    """Get workouts filtered by difficulty level"""
+    difficulty, error = _required(request, 'difficulty', 'Difficulty')
+    if error:
+        return error
+    return await paginated_response(
+        request, Workout, {'difficulty': difficulty}, [('_id', 1)], WorkoutSerializer,
+    )
+
+
+async def workouts_by_type(request):
+    """Get workouts filtered by activity type"""
+    activity_type, error = _required(request, 'type', 'Type')
+    if error:
+        return error
+    return await paginated_response(
+        request, Workout, {'activity_type': activity_type}, [('_id', 1)], WorkoutSerializer,
+    )
@@ -0,0 +1,210 @@
+"""
+Timing helpers and scenarios for the ``benchmark_api`` command.
+
+A scenario is a function ``(client, sample) -> response`` that issues one
+request through the Django test client; ``sample`` holds real values
+(an email, a team, ...) picked from the seeded dataset.
+
+Concurrency comparisons fire many overlapping requests at a sync viewset
+action and its async counterpart through the ASGI handler, where sync views
+share a single thread as they do in one ASGI worker.
+"""
+import asyncio
+import time
+import tracemalloc
+from django.db import connection, reset_queries
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from . import synthetic
+from .models import Activity, Leaderboard, Team
+from .renderers import ORJSONRenderer
+from .repository import hydrate
+from .serializers import ActivitySerializer, activity_rows
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return None
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(samples):
+    """Latency summary in milliseconds"""
+    ordered = sorted(samples)
+    return {
+        'iterations': len(ordered),
+        'min_ms': round(ordered[0] * 1000, 3),
+        'p50_ms': round(percentile(ordered, 50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 99) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3),
+    }
+
+
+def run_scenario(scenario, client, sample, iterations, warmup=2, before_each=None):
+    """
+    Time ``iterations`` calls of a scenario, then make one more call to
+    count ORM queries and one under tracemalloc for peak memory. Raw
+    ``mongo_*`` operations bypass the ORM and are not counted.
+    """
+    for _ in range(warmup):
+        if before_each:
+            before_each()
+        scenario(client, sample)
+
+    samples = []
+    for _ in range(iterations):
+        if before_each:
+            before_each()
+        started = time.perf_counter()
+        response = scenario(client, sample)
+        samples.append(time.perf_counter() - started)
+
+    if before_each:
+        before_each()
+    # The query log is a bounded deque; a full one would capture nothing
+    reset_queries()
+    with CaptureQueriesContext(connection) as queries:
+        scenario(client, sample)
+
+    if before_each:
+        before_each()
+    tracemalloc.start()
+    try:
+        scenario(client, sample)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    content = b'' if response.streaming else response.content
+    return {
+        **summarize(samples),
+        'status': response.status_code,
+        'queries': len(queries),
+        'peak_memory_kib': round(peak / 1024, 1),
+        'response_bytes': len(content),
+    }
+
+
+def pick_sample():
+    """Real values from the seeded dataset for parameterized requests"""
+    activity = Activity.objects.order_by('date').first()
+    entry = Leaderboard.objects.order_by('rank').first()
+    team = Team.objects.order_by('-member_count').first()
+    return {
+        'email': activity.user_email if activity else 'nobody@example.com',
+        'activity_type': activity.activity_type if activity else 'Running',
+        'leaderboard_team': entry.team if entry else '',
+        'team_id': str(team._id) if team else '',
+    }
+
+
+def _bulk_rows(sample, count=100):
+    date = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    return [
+        {
+            'user_email': sample['email'],
+            'activity_type': sample['activity_type'],
+            'duration': 30,
+            'distance': 5.0,
+            'calories': 250,
+            'date': date,
+        }
+        for _ in range(count)
+    ]
+
+
+SCENARIOS = {
+    'activities.list': lambda client, sample: client.get('/api/activities/'),
+    'activities.by_user': lambda client, sample: client.get(
+        '/api/activities/by_user/', {'email': sample['email']}),
+    'activities.by_type': lambda client, sample: client.get(
+        '/api/activities/by_type/', {'type': sample['activity_type']}),
+    'leaderboard.top': lambda client, sample: client.get('/api/leaderboard/top/', {'limit': 10}),
+    'leaderboard.around': lambda client, sample: client.get(
+        '/api/leaderboard/around/', {'email': sample['email'], 'limit': 10}),
+    'leaderboard.by_team': lambda client, sample: client.get(
+        '/api/leaderboard/by_team/', {'team': sample['leaderboard_team']}),
+    'teams.members': lambda client, sample: client.get(f'/api/teams/{sample["team_id"]}/members/'),
+    'activities.bulk': lambda client, sample: client.post(
+        '/api/activities/bulk/', _bulk_rows(sample), content_type='application/json'),
+}
+
+
+CONCURRENCY_SCENARIOS = {
+    # name: (sync path, async path, query parameters)
+    'activities.by_user': (
+        '/api/activities/by_user/', '/api/async/activities/by_user/', lambda sample: {'email': sample['email']}),
+    'leaderboard.top': ('/api/leaderboard/top/', '/api/async/leaderboard/top/', lambda sample: {'limit': 10}),
+    'leaderboard.by_team': (
+        '/api/leaderboard/by_team/', '/api/async/leaderboard/by_team/',
+        lambda sample: {'team': sample['leaderboard_team']}),
+    'workouts.list': ('/api/workouts/', '/api/async/workouts/', lambda sample: {}),
+}
+
+
+async def _fire(path, params, concurrency, requests, before_each=None):
+    client = AsyncClient()
+    semaphore = asyncio.Semaphore(concurrency)
+    samples, statuses = [], set()
+
+    async def one():
+        async with semaphore:
+            if before_each:
+                before_each()
+            started = time.perf_counter()
+            response = await client.get(path, params)
+            samples.append(time.perf_counter() - started)
+            statuses.add(response.status_code)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    return {
+        **summarize(samples),
+        'statuses': sorted(statuses),
+        'throughput_rps': round(requests / elapsed, 1),
+    }
+
+
+def run_concurrency(name, sample, concurrency, requests, before_each=None):
+    """Compare a sync action with its async counterpart under concurrent load"""
+    sync_path, async_path, params = CONCURRENCY_SCENARIOS[name]
+    result = {}
+    for mode, path in (('sync', sync_path), ('async', async_path)):
+        result[mode] = asyncio.run(_fire(path, params(sample), concurrency, requests, before_each))
+    result['speedup'] = round(result['async']['throughput_rps'] / result['sync']['throughput_rps'], 2)
+    return result
+
+
+def compare_serialization(count, repeat=5, seed=42):
+    """
+    Time rendering ``count`` activities to JSON bytes with the model
+    serializer and stdlib JSON against the row converter and orjson.
+    Needs no database; reports the best of ``repeat`` runs.
+    """
+    documents = synthetic.activity_documents(0, count, seed, synthetic.utc_now(), 365)
+    rows = [hydrate(document) for document in documents]
+    instances = [Activity(**row) for row in rows]
+
+    def best(render):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            body = render()
+            timings.append(time.perf_counter() - started)
+        return round(min(timings) * 1000, 3), len(body)
+
+    paths = {
+        'model_serializer': lambda: JSONRenderer().render(ActivitySerializer(instances, many=True).data),
+        'row_converter': lambda: ORJSONRenderer().render(activity_rows.many(rows)),
+    }
+    result = {'rows': count}
+    for name, render in paths.items():
+        result[f'{name}_ms'], result[f'{name}_bytes'] = best(render)
+    result['speedup'] = round(result['model_serializer_ms'] / result['row_converter_ms'], 1)
+    return result
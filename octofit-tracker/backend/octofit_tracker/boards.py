@@ -0,0 +1,134 @@
+"""
+Precomputed leaderboards per scope, window and metric.
+
+Each board (global or one team; current UTC day, ISO week, calendar month
+or all time; ranked by calories, duration or activity count) is stored as
+``LeaderboardSnapshot`` rows carrying their final rank. Reads never sort:
+the head of a board and the neighbours of a user are rank range scans on
+the ``(board, rank)`` index, after at most one ``(board, user_email)``
+lookup, so they cost O(log n + k) at any board size.
+
+Boards are refreshed from the user rollups (see ``rollups.py``), which
+activity writes keep current, by ``refresh_leaderboards`` on a schedule.
+Ties are broken by ``user_email`` ascending, like the main leaderboard.
+A refresh writes the new boards, plus copies of the boards it does not
+refresh, into a shadow collection and swaps it in with one rename, so
+readers never see a board half refreshed.
+"""
+from django.utils import timezone
+from .cache import invalidate_model
+from .models import ActivityRollup, LeaderboardSnapshot, User
+from .mongo import get_collection, get_database, swap_in
+from .rollups import day_start, week_start
+
+SHADOW = 'leaderboard_snapshots_refresh'
+
+WINDOWS = [window for window, _ in LeaderboardSnapshot.WINDOWS]
+# Board metric -> rollup total
+METRICS = {'calories': 'calories', 'duration': 'duration', 'activities': 'count'}
+
+
+def board_id(scope, window, metric, team=None):
+    """Key of a board: ``scope:window:metric``, plus ``:team`` for team boards"""
+    board = f'{scope}:{window}:{metric}'
+    return f'{board}:{team}' if scope == 'team' else board
+
+
+def window_start(window, now):
+    """Start of the window containing ``now``, or None for all time"""
+    if window == 'day':
+        return day_start(now)
+    if window == 'week':
+        return week_start(now)
+    if window == 'month':
+        return day_start(now).replace(day=1)
+    return None
+
+
+def window_totals(window, now):
+    """Per user totals over the window containing ``now``, summed from the user rollups"""
+    start = window_start(window, now)
+    match = {'scope': 'user'}
+    if window in ('day', 'week'):
+        match.update(period=window, bucket=start)
+    elif window == 'month':
+        match.update(period='day', bucket={'$gte': start})
+    else:
+        match['period'] = 'week'
+    return ActivityRollup.objects.mongo_aggregate([
+        {'$match': match},
+        {'$group': {
+            '_id': '$key',
+            'calories': {'$sum': '$calories'},
+            'duration': {'$sum': '$duration'},
+            'count': {'$sum': '$count'},
+        }},
+    ], allowDiskUse=True)
+
+
+def board_rank(board, email):
+    """A user's rank on a board, or None if they are not on it"""
+    cursor = get_collection(LeaderboardSnapshot).find({'board': board, 'user_email': email}, {'rank': 1})
+    for entry in cursor.hint([('board', 1), ('user_email', 1)]).limit(1):
+        return entry['rank']
+    return None
+
+
+def _insert_batches(collection, documents, batch_size):
+    """Insert ``documents`` in batches; returns the number inserted"""
+    batch, inserted = [], 0
+    for document in documents:
+        batch.append(document)
+        if len(batch) >= batch_size:
+            collection.insert_many(batch, ordered=False)
+            inserted += len(batch)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+        inserted += len(batch)
+    return inserted
+
+
+def refresh_boards(windows=WINDOWS, metrics=tuple(METRICS), now=None, batch_size=5000):
+    """Recompute every global and team board of ``windows`` x ``metrics``; returns rows written"""
+    now = now or timezone.now()
+    users = {
+        user['email']: user
+        for user in get_collection(User).find({}, {'_id': 0, 'email': 1, 'name': 1, 'team': 1})
+    }
+    database = get_database()
+    database.drop_collection(SHADOW)
+    shadow = database.create_collection(SHADOW)
+
+    # Boards of the windows and metrics not refreshed carry over unchanged
+    refreshed = [{'window': window, 'metric': metric} for window in windows for metric in metrics]
+    _insert_batches(shadow, get_collection(LeaderboardSnapshot).find({'$nor': refreshed}), batch_size)
+
+    written = 0
+    for window in windows:
+        period_start = window_start(window, now)
+        totals = list(window_totals(window, now))
+        for metric in metrics:
+            total = METRICS[metric]
+            boards = {board_id('global', window, metric): []}
+            for row in sorted(totals, key=lambda row: (-row[total], row['_id'])):
+                user = users.get(row['_id'], {})
+                team = user.get('team') or ''
+                entry = {
+                    'scope': 'global', 'window': window, 'metric': metric, 'period_start': period_start,
+                    'user_email': row['_id'], 'user_name': user.get('name', row['_id']), 'team': team,
+                    'value': row[total], 'updated_at': now,
+                }
+                boards[board_id('global', window, metric)].append(entry)
+                if team:
+                    boards.setdefault(board_id('team', window, metric, team), []).append({**entry, 'scope': 'team'})
+
+            # Teams without activity in the window get no board
+            for board, entries in boards.items():
+                written += _insert_batches(shadow, (
+                    {**entry, 'board': board, 'rank': rank} for rank, entry in enumerate(entries, start=1)
+                ), batch_size)
+
+    swap_in(SHADOW, LeaderboardSnapshot)
+    invalidate_model(LeaderboardSnapshot)
+    return written
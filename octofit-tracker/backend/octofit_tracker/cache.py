@@ -0,0 +1,149 @@
+"""
+Read-through response cache for hot read-only actions.
+
+Each cached model has a generation entry in the cache holding a random
+version token and the time of the last write. Writes replace the
+generation (see ``signals.py``), which changes every derived cache key and
+ETag at once, so stale responses are never served and need no explicit
+deletion.
+
+Generations only reach every process through a shared cache, so response
+caching is off unless ``OCTOFIT_RESPONSE_CACHE`` is set, and the
+``octofit.W001`` check warns when it is set over a per-process backend.
+Without it responses are still conditional: their ETag is a digest of the
+rendered data and Last-Modified the newest ``updated_at``/``created_at``
+among the returned rows, so clients still get 304s, just not for free.
+"""
+import hashlib
+import uuid
+from functools import wraps
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Warn when responses are cached in a cache other processes cannot see"""
+    if settings.OCTOFIT_RESPONSE_CACHE and settings.CACHES['default']['BACKEND'] in PROCESS_LOCAL_BACKENDS:
+        return [checks.Warning(
+            'OCTOFIT_RESPONSE_CACHE is enabled with a per-process cache backend',
+            hint='Set REDIS_URL so writes in one process retire the responses cached by the others.',
+            id='octofit.W001',
+        )]
+    return []
+
+
+def _generation_key(model):
+    return f'octofit:generation:{model._meta.label_lower}'
+
+
+def model_generation(model):
+    """Return the current ``{'version', 'modified'}`` generation of a model"""
+    generation = cache.get(_generation_key(model))
+    if generation is None:
+        generation = invalidate_model(model)
+    return generation
+
+
+def invalidate_model(model, modified=None):
+    """Start a new generation for a model, retiring its cached responses"""
+    generation = {
+        'version': uuid.uuid4().hex,
+        'modified': modified or timezone.now(),
+    }
+    cache.set(_generation_key(model), generation, None)
+    return generation
+
+
+def _rows(data):
+    if isinstance(data, dict):
+        return data.get('results', [data])
+    return data if isinstance(data, list) else []
+
+
+def _modified(rows):
+    """The newest ``updated_at`` or ``created_at`` of serialized rows, or None"""
+    stamps = []
+    for row in rows:
+        value = isinstance(row, dict) and (row.get('updated_at') or row.get('created_at'))
+        if isinstance(value, str):
+            value = parse_datetime(value)
+        if value:
+            stamps.append(value)
+    return max(stamps, default=None)
+
+
+def conditional_response(request, response):
+    """Tag an uncached 200 response with validators from its data; 304 when they match"""
+    if response.status_code != status.HTTP_200_OK:
+        return response
+    etag = f'"{hashlib.md5(JSONRenderer().render(response.data)).hexdigest()}"'
+    modified = _modified(_rows(response.data))
+    last_modified = int(modified.timestamp()) if modified else None
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        not_modified['ETag'] = etag
+        return not_modified
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def cached_response(*models):
+    """
+    Cache a viewset action's 200 responses until one of ``models`` is written,
+    when ``OCTOFIT_RESPONSE_CACHE`` is set.
+    Keys are derived from the path and query parameters; responses carry an
+    ETag and Last-Modified and conditional requests are answered with 304,
+    with or without the cache.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            if not settings.OCTOFIT_RESPONSE_CACHE:
+                return conditional_response(request, view_method(self, request, *args, **kwargs))
+            generations = [model_generation(model) for model in models]
+            fingerprint = repr((
+                request.path,
+                sorted(request.query_params.lists()),
+                [generation['version'] for generation in generations],
+            ))
+            digest = hashlib.md5(fingerprint.encode()).hexdigest()
+            etag = f'"{digest}"'
+            last_modified = int(max(generation['modified'] for generation in generations).timestamp())
+
+            not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if not_modified is not None:
+                not_modified['ETag'] = etag
+                return not_modified
+
+            cache_key = f'octofit:response:{digest}'
+            data = cache.get(cache_key)
+            if data is None:
+                response = view_method(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                cache.set(cache_key, response.data, settings.OCTOFIT_RESPONSE_CACHE_TIMEOUT)
+            else:
+                response = Response(data)
+
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,112 @@
+"""
+Everything the app's main screen shows for one user, in one response.
+
+Once the user is found, the sections are independent bounded queries
+that run concurrently on a shared thread pool. The workers use the
+pymongo Database taken from the request thread, since pymongo clients are
+thread safe while djongo connections belong to one thread. Each section
+records its Mongo round trips in stats of its own, which are merged into
+the request's once it finishes, so they still show up in Server-Timing.
+"""
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.utils import timezone
+from .models import Activity, Leaderboard, Team, User, Workout
+from .mongo import get_database
+from .monitoring import merge_result, run_with_stats
+from .repository import hydrate
+from .serializers import (
+    ActivitySerializer,
+    LeaderboardSerializer,
+    UserSerializer,
+    WorkoutSerializer,
+    activity_rows,
+    leaderboard_rows,
+    readable_fields,
+    team_rows,
+    user_rows,
+    workout_rows,
+)
+
+RECENT_ACTIVITIES = 10
+TEAM_LEADERS = 5
+SUGGESTED_WORKOUTS = 5
+# Workouts are suggested for the activity types of this recent window
+SUGGESTION_WINDOW = timedelta(days=30)
+# The team's member list is left out; it grows with the team
+TEAM_FIELDS = ['_id', 'name', 'description', 'member_count']
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='dashboard')
+
+
+def _projection(serializer_class):
+    return dict.fromkeys(readable_fields(serializer_class), 1)
+
+
+def recent_activities(database, email):
+    cursor = database[Activity._meta.db_table].find({'user_email': email}, _projection(ActivitySerializer))
+    cursor = cursor.sort('date', -1).hint([('user_email', 1), ('date', 1)]).limit(RECENT_ACTIVITIES)
+    return activity_rows.many(hydrate(document) for document in cursor)
+
+
+def standing(database, email):
+    cursor = database[Leaderboard._meta.db_table].find({'user_email': email}, _projection(LeaderboardSerializer))
+    for entry in cursor.hint([('user_email', 1)]).limit(1):
+        return leaderboard_rows(hydrate(entry))
+    return None
+
+
+def team_summary(database, team):
+    document = database[Team._meta.db_table].find_one({'name': team}, dict.fromkeys(TEAM_FIELDS, 1))
+    return team_rows(hydrate(document), TEAM_FIELDS) if document else None
+
+
+def team_leaders(database, team):
+    cursor = database[Leaderboard._meta.db_table].find({'team': team}, _projection(LeaderboardSerializer))
+    cursor = cursor.sort('rank', 1).hint([('team', 1), ('rank', 1)]).limit(TEAM_LEADERS)
+    return leaderboard_rows.many(hydrate(entry) for entry in cursor)
+
+
+def suggested_workouts(database, email):
+    """Workouts for the activity types the user did lately, or any workouts for new users"""
+    activity_types = database[Activity._meta.db_table].distinct('activity_type', {
+        'user_email': email, 'date': {'$gte': timezone.now() - SUGGESTION_WINDOW},
+    })
+    query = {'activity_type': {'$in': activity_types}} if activity_types else {}
+    cursor = database[Workout._meta.db_table].find(query, _projection(WorkoutSerializer))
+    return workout_rows.many(hydrate(workout) for workout in cursor.sort('_id', 1).limit(SUGGESTED_WORKOUTS))
+
+
+def build_dashboard(email):
+    """The dashboard of the user with ``email``, or None if there is no such user"""
+    database = get_database()
+    user = database[User._meta.db_table].find_one({'email': email}, _projection(UserSerializer))
+    if user is None:
+        return None
+    team = user.get('team') or None
+
+    sections = {
+        'activities': (recent_activities, email),
+        'rank': (standing, email),
+        'workouts': (suggested_workouts, email),
+    }
+    if team:
+        sections['team'] = (team_summary, team)
+        sections['team_leaders'] = (team_leaders, team)
+    futures = {
+        name: _executor.submit(contextvars.copy_context().run, run_with_stats, function, database, argument)
+        for name, (function, argument) in sections.items()
+    }
+    results = {name: merge_result(future) for name, future in futures.items()}
+
+    summary = results.get('team')
+    if summary is not None:
+        summary['leaders'] = results['team_leaders']
+    return {
+        'user': user_rows(hydrate(user)),
+        'rank': results['rank'],
+        'team': summary,
+        'activities': results['activities'],
+        'workouts': results['workouts'],
+    }
@@ -0,0 +1,45 @@
+"""
+Streaming encoders for exporting querysets row by row.
+
+Rows come from ``values_list()`` iterators so only one chunk of documents
+is held in memory at a time.
+"""
+import csv
+import json
+from datetime import datetime
+from bson import ObjectId
+
+
+class _Echo:
+    """File-like object that hands each written line straight back"""
+
+    def write(self, value):
+        return value
+
+
+def _plain(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def stream_ndjson(rows, fields):
+    """Yield one JSON document per row"""
+    for row in rows:
+        yield json.dumps({field: _plain(value) for field, value in zip(fields, row)}) + '\n'
+
+
+def stream_csv(rows, fields):
+    """Yield a header line followed by one CSV line per row"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([_plain(value) for value in row])
+
+
+EXPORT_FORMATS = {
+    'ndjson': (stream_ndjson, 'application/x-ndjson'),
+    'csv': (stream_csv, 'text/csv'),
+}
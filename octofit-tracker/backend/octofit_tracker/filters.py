@@ -0,0 +1,80 @@
+from datetime import datetime, time, timezone as dt_timezone
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+
+def parse_date_param(params, name):
+    """
+    Read an ISO date or datetime query parameter as an aware datetime.
+    Plain dates resolve to midnight UTC.
+    """
+    raw = params.get(name)
+    if not raw:
+        return None
+    try:
+        value = parse_datetime(raw)
+        if value is None:
+            day = parse_date(raw)
+            value = datetime.combine(day, time.min) if day else None
+    except ValueError:
+        value = None
+    if value is None:
+        raise ValidationError({name: f'Invalid date: {raw}'})
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value, dt_timezone.utc)
+    return value
+
+
+def activity_lookups(params):
+    """
+    ORM lookups for the shared activity query parameters: ``email``,
+    ``type``, ``start`` (inclusive) and ``end`` (exclusive)
+    """
+    lookups = {}
+    if params.get('email'):
+        lookups['user_email'] = params['email']
+    if params.get('type'):
+        lookups['activity_type'] = params['type']
+    start = parse_date_param(params, 'start')
+    if start:
+        lookups['date__gte'] = start
+    end = parse_date_param(params, 'end')
+    if end:
+        lookups['date__lt'] = end
+    return lookups
+
+
+def filter_activities(queryset, params):
+    """Narrow an Activity queryset (or a ``DocumentQuery``) by ``activity_lookups``"""
+    return queryset.filter(**activity_lookups(params))
+
+
+def activity_match(params):
+    """The ``activity_lookups`` of the query parameters as a ``$match`` document"""
+    match = {}
+    for lookup, value in activity_lookups(params).items():
+        name, _, operator = lookup.partition('__')
+        if operator:
+            match.setdefault(name, {})[f'${operator}'] = value
+        else:
+            match[name] = value
+    return match
+
+
+def parse_list_param(params, name, max_items):
+    """
+    Read a comma-separated (or repeated) query parameter as a list of
+    distinct values in request order, of at most ``max_items``
+    """
+    values = []
+    for raw in params.getlist(name):
+        for value in raw.split(','):
+            value = value.strip()
+            if value and value not in values:
+                values.append(value)
+    if not values:
+        raise ValidationError({name: 'This parameter is required'})
+    if len(values) > max_items:
+        raise ValidationError({name: f'At most {max_items} values are allowed'})
+    return values
@@ -0,0 +1,164 @@
+"""
+Incremental maintenance of the leaderboard collection.
+
+Entries are ranked by ``total_calories`` descending, ties broken by
+``user_email`` ascending. Activity writes adjust the owning user's totals
+with ``$inc`` and only shift the ranks of the entries the user overtakes
+(or falls behind), so the board is never recomputed as a whole.
+
+Totals and ranks are updated with raw Mongo operators through
+``DjongoManager`` because djongo cannot translate ``F()`` expressions.
+Rank moves are not serialized across processes; concurrent moves that
+cross each other can leave adjacent ranks swapped until the next move.
+
+``recompute_users`` sets totals from the activities instead of applying
+deltas, so the write-behind worker can safely repeat it.
+"""
+from pymongo import ReturnDocument
+from django.utils import timezone
+from .aggregations import user_totals
+from .cache import invalidate_model
+from .models import Leaderboard, User
+from .mongo import get_collection
+
+
+def ranked_ahead_of(calories, email):
+    """Mongo filter matching entries ranked ahead of ``(calories, email)``"""
+    return {'$or': [
+        {'total_calories': {'$gt': calories}},
+        {'total_calories': calories, 'user_email': {'$lt': email}},
+    ]}
+
+
+def ranked_behind(calories, email):
+    """Mongo filter matching entries ranked behind ``(calories, email)``"""
+    return {'$or': [
+        {'total_calories': {'$lt': calories}},
+        {'total_calories': calories, 'user_email': {'$gt': email}},
+    ]}
+
+
+def rank_of(email):
+    """A user's rank on the leaderboard, or None if they have no entry"""
+    cursor = get_collection(Leaderboard).find({'user_email': email}, {'rank': 1})
+    for entry in cursor.hint([('user_email', 1)]).limit(1):
+        return entry['rank']
+    return None
+
+
+def activity_snapshot(activity):
+    """Capture the fields of an Activity that feed the leaderboard and rollups"""
+    return {
+        'user_email': activity.user_email,
+        'activity_type': activity.activity_type,
+        'calories': activity.calories,
+        'duration': activity.duration,
+        'distance': activity.distance,
+        'date': activity.date,
+    }
+
+
+def record_activity_changes(removed=(), added=()):
+    """Apply the net delta of many activity snapshots, one update per user"""
+    deltas = {}
+    for snapshots, sign in ((removed, -1), (added, 1)):
+        for snapshot in snapshots:
+            delta = deltas.setdefault(snapshot['user_email'], {
+                'calories': 0, 'activities': 0, 'duration': 0,
+            })
+            delta['calories'] += sign * snapshot['calories']
+            delta['activities'] += sign
+            delta['duration'] += sign * snapshot['duration']
+
+    changed = False
+    for user_email, delta in deltas.items():
+        if any(delta.values()):
+            apply_activity_delta(user_email, **delta)
+            changed = True
+
+    # Raw $inc updates bypass post_save, so cached boards are retired here
+    if changed:
+        invalidate_model(Leaderboard)
+
+
+def apply_activity_delta(user_email, calories=0, activities=0, duration=0):
+    """Adjust a user's totals and move their entry to its new rank"""
+    entry = Leaderboard.objects.mongo_find_one_and_update(
+        {'user_email': user_email},
+        {
+            '$inc': {
+                'total_calories': calories,
+                'total_activities': activities,
+                'total_duration': duration,
+            },
+            '$set': {'updated_at': timezone.now()},
+        },
+        projection={'total_calories': 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if entry is None:
+        _insert_entry(user_email)
+        return apply_activity_delta(user_email, calories, activities, duration)
+
+    if calories:
+        _move(user_email, entry['total_calories'] - calories, entry['total_calories'])
+    return entry
+
+
+def recompute_users(emails):
+    """Set users' totals from their activities and move them to their new ranks"""
+    totals = {row['user_email']: row for row in user_totals({'user_email': {'$in': list(emails)}})}
+    changed = False
+    for user_email in emails:
+        row = totals.get(user_email, {'total_calories': 0, 'total_activities': 0, 'total_duration': 0})
+        entry = Leaderboard.objects.mongo_find_one(
+            {'user_email': user_email}, {'total_calories': 1, 'total_activities': 1, 'total_duration': 1},
+        )
+        if entry is None:
+            if not row['total_activities']:
+                continue
+            _insert_entry(user_email)
+            entry = {'total_calories': 0, 'total_activities': 0, 'total_duration': 0}
+
+        values = {name: row[name] for name in ('total_calories', 'total_activities', 'total_duration')}
+        if all(entry.get(name) == value for name, value in values.items()):
+            continue
+        Leaderboard.objects.mongo_update_one(
+            {'user_email': user_email}, {'$set': {**values, 'updated_at': timezone.now()}},
+        )
+        if values['total_calories'] != entry['total_calories']:
+            _move(user_email, entry['total_calories'], values['total_calories'])
+        changed = True
+
+    if changed:
+        invalidate_model(Leaderboard)
+
+
+def _insert_entry(user_email):
+    """Create an empty entry at its position among the zero-calorie tail"""
+    size = Leaderboard.objects.mongo_estimated_document_count()
+    shifted = Leaderboard.objects.mongo_update_many(ranked_behind(0, user_email), {'$inc': {'rank': 1}}).modified_count
+
+    user = User.objects.filter(email=user_email).first()
+    return Leaderboard.objects.create(
+        user_email=user_email,
+        user_name=user.name if user else user_email,
+        team=(user.team or '') if user else '',
+        rank=size - shifted + 1,
+    )
+
+
+def _move(user_email, old_calories, new_calories):
+    """Shift the entries between the old and new position by one rank"""
+    if new_calories > old_calories:
+        passed = {'$and': [ranked_ahead_of(old_calories, user_email), ranked_behind(new_calories, user_email)]}
+        step = 1
+    else:
+        passed = {'$and': [ranked_behind(old_calories, user_email), ranked_ahead_of(new_calories, user_email)]}
+        step = -1
+
+    passed['user_email'] = {'$ne': user_email}
+    moved = Leaderboard.objects.mongo_update_many(passed, {'$inc': {'rank': step}}).modified_count
+    if moved:
+        Leaderboard.objects.mongo_update_one({'user_email': user_email}, {'$inc': {'rank': -step * moved}})
+    return moved
@@ -0,0 +1,40 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from octofit_tracker.archive import archive_activities
+from octofit_tracker.filters import parse_date_param
+
+
+class Command(BaseCommand):
+    help = (
+        'Move activities older than --days (or dated before --before) from the '
+        'hot activities collection to activities_archive in bulk'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=365, help='Keep this many days of activities hot')
+        parser.add_argument('--before', help='Archive activities dated before this ISO date instead')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Activities moved per batch')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['days'] < 0:
+            raise CommandError('--batch-size must be positive and --days not negative')
+        if options['before']:
+            try:
+                before = parse_date_param(options, 'before')
+            except ValidationError:
+                raise CommandError(f'Invalid --before date: {options["before"]}')
+        else:
+            before = timezone.now() - timedelta(days=options['days'])
+
+        started = time.monotonic()
+
+        def progress(moved):
+            self.stdout.write(f'Moved: {moved} ({time.monotonic() - started:.1f}s)')
+
+        moved = archive_activities(before, options['batch_size'], progress)
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {moved} activities dated before {before:%Y-%m-%d} in {time.monotonic() - started:.1f}s'
+        ))
@@ -0,0 +1,209 @@
+import json
+import platform
+import subprocess
+import time
+from io import StringIO
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, override_settings
+from octofit_tracker import benchmarks
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _use_mongomock():
+    """Point djongo and the raw pymongo helpers at one in-process mongomock client"""
+    try:
+        import mongomock
+    except ImportError:
+        raise CommandError('--mongomock requires the mongomock package')
+    import djongo.database
+    import pymongo
+    from octofit_tracker import mongo
+
+    client = mongomock.MongoClient()
+    djongo.database.MongoClient = lambda *args, **kwargs: client
+    pymongo.MongoClient = lambda *args, **kwargs: client
+    mongo.MongoClient = lambda *args, **kwargs: client
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed synthetic datasets at several scales and time the API hot paths, '
+        'reporting latency percentiles, ORM queries and peak memory as JSON. '
+        'Wipes the benchmark database before each scale.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scales',
+            default='100,1000',
+            help='Comma separated user counts to seed and benchmark',
+        )
+        parser.add_argument('--activities-per-user', type=int, default=50, help='Synthetic activities per user')
+        parser.add_argument('--iterations', type=int, default=50, help='Timed requests per scenario')
+        parser.add_argument('--warmup', type=int, default=3, help='Untimed requests before each scenario')
+        parser.add_argument('--seed', type=int, default=42, help='Seed for the synthetic data RNG')
+        parser.add_argument('--workers', type=int, default=1, help='Processes generating activities')
+        parser.add_argument(
+            '--scenarios',
+            help=f'Comma separated subset of: {", ".join(benchmarks.SCENARIOS)}',
+        )
+        parser.add_argument(
+            '--warm-cache',
+            action='store_true',
+            help='Keep the response cache between requests instead of timing the database path',
+        )
+        parser.add_argument(
+            '--database-name',
+            default='octofit_benchmark',
+            help='Database to seed; it is wiped, so it should not be the app database',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=0,
+            help='Also compare sync and async endpoints with this many requests in flight (needs mongod)',
+        )
+        parser.add_argument(
+            '--concurrent-requests',
+            type=int,
+            default=500,
+            help='Requests per endpoint in the concurrency comparison',
+        )
+        parser.add_argument(
+            '--serialization',
+            type=int,
+            default=0,
+            help='Also compare list serialization paths over this many in-memory activities',
+        )
+        parser.add_argument(
+            '--read-path',
+            choices=['fast', 'orm'],
+            help='Serve hot reads with native pymongo queries or the ORM (default: OCTOFIT_FAST_READS)',
+        )
+        parser.add_argument('--mongomock', action='store_true', help='Run against an in-process mongomock database')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        try:
+            scales = [int(scale) for scale in options['scales'].split(',') if scale.strip()]
+        except ValueError:
+            raise CommandError('--scales must be a comma separated list of integers')
+        if not scales or min(scales) < 1 or options['iterations'] < 1 or options['warmup'] < 0:
+            raise CommandError('Scales and iterations must be positive')
+        if options['concurrency'] < 0 or options['concurrent_requests'] < 1 or options['serialization'] < 0:
+            raise CommandError('Concurrency and request counts must be positive')
+        if options['concurrency'] and options['mongomock']:
+            raise CommandError('The async endpoints need a real mongod; drop --mongomock to compare concurrency')
+
+        names = list(benchmarks.SCENARIOS)
+        if options['scenarios']:
+            names = [name.strip() for name in options['scenarios'].split(',') if name.strip()]
+            unknown = sorted(set(names) - set(benchmarks.SCENARIOS))
+            if unknown:
+                raise CommandError(f'Unknown scenarios: {", ".join(unknown)}')
+
+        workers = options['workers']
+        if options['mongomock']:
+            _use_mongomock()
+            # Forked workers would write to their own copy of the in-process database
+            workers = 1
+
+        database = connections['default']
+        if database.settings_dict['NAME'] != options['database_name']:
+            database.close()
+            database.settings_dict['NAME'] = options['database_name']
+
+        fast_reads = settings.OCTOFIT_FAST_READS if options['read_path'] is None else options['read_path'] == 'fast'
+        report = {
+            'meta': {
+                'revision': _git_revision(),
+                'started_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'python': platform.python_version(),
+                'backend': 'mongomock' if options['mongomock'] else 'mongod',
+                'database': options['database_name'],
+                'activities_per_user': options['activities_per_user'],
+                'iterations': options['iterations'],
+                'warm_cache': options['warm_cache'],
+                'concurrency': options['concurrency'],
+                'read_path': 'fast' if fast_reads else 'orm',
+                'seed': options['seed'],
+            },
+            'results': {},
+        }
+        if options['concurrency']:
+            report['concurrency'] = {}
+        if options['serialization']:
+            report['serialization'] = benchmarks.compare_serialization(options['serialization'], seed=options['seed'])
+            self.stderr.write(
+                f'Serialization of {options["serialization"]} activities: '
+                f'{report["serialization"]["model_serializer_ms"]:.1f}ms -> '
+                f'{report["serialization"]["row_converter_ms"]:.1f}ms (x{report["serialization"]["speedup"]})'
+            )
+
+        # The test clients always send ``Host: testserver``
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], OCTOFIT_FAST_READS=fast_reads):
+            for scale in scales:
+                self.run_scale(scale, names, workers, options, report)
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(output + '\n')
+            self.stderr.write(self.style.SUCCESS(f'Report written to {options["output"]}'))
+        else:
+            self.stdout.write(output)
+
+    def run_scale(self, scale, names, workers, options, report):
+        self.stderr.write(f'Seeding {scale} users...')
+        call_command(
+            'populate_db',
+            users=scale,
+            activities_per_user=options['activities_per_user'],
+            seed=options['seed'],
+            workers=workers,
+            stdout=StringIO(),
+        )
+        cache.clear()
+        sample = benchmarks.pick_sample()
+        before_each = None if options['warm_cache'] else cache.clear
+
+        client = Client()
+        results = report['results'][str(scale)] = {}
+        for name in names:
+            result = benchmarks.run_scenario(
+                benchmarks.SCENARIOS[name], client, sample,
+                options['iterations'], options['warmup'], before_each,
+            )
+            results[name] = result
+            self.stderr.write(
+                f'  {name:<22} p50 {result["p50_ms"]:>9.2f}ms  p95 {result["p95_ms"]:>9.2f}ms  '
+                f'p99 {result["p99_ms"]:>9.2f}ms  {result["queries"]:>3} queries  '
+                f'{result["peak_memory_kib"]:>9.1f} KiB'
+            )
+
+        if not options['concurrency']:
+            return
+        comparisons = report['concurrency'][str(scale)] = {}
+        for name in benchmarks.CONCURRENCY_SCENARIOS:
+            result = benchmarks.run_concurrency(
+                name, sample, options['concurrency'], options['concurrent_requests'], before_each,
+            )
+            comparisons[name] = result
+            self.stderr.write(
+                f'  {name:<22} sync {result["sync"]["throughput_rps"]:>8.1f} req/s  '
+                f'async {result["async"]["throughput_rps"]:>8.1f} req/s  x{result["speedup"]}'
+            )
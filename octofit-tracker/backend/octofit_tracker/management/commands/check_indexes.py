@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand, CommandError
+from octofit_tracker.leaderboard import ranked_ahead_of, ranked_behind
+from octofit_tracker.models import User, Activity, Leaderboard, Workout
+from octofit_tracker.mongo import get_collection
+
+FLAGGED_STAGES = {'COLLSCAN', 'SORT'}
+
+
+def _sample(model, field, default):
+    """Pick a real value for ``field`` so explain() sees realistic bounds"""
+    document = get_collection(model).find_one({field: {'$ne': None}}, {field: 1})
+    return document[field] if document else default
+
+
+def query_shapes():
+    """The filter/sort shapes issued by the viewsets, with sample values"""
+    email = _sample(Activity, 'user_email', 'someone@example.com')
+    activity_type = _sample(Activity, 'activity_type', 'Running')
+    team = _sample(Leaderboard, 'team', 'Team')
+    team_id = _sample(User, 'team_ref_id', None)
+    difficulty = _sample(Workout, 'difficulty', 'Beginner')
+    calories = _sample(Leaderboard, 'total_calories', 0)
+
+    return [
+        ('activities list', Activity, {}, [('date', -1)]),
+        ('activities by_user', Activity, {'user_email': email}, [('date', -1)]),
+        ('activities by_type', Activity, {'activity_type': activity_type}, [('date', -1)]),
+        ('leaderboard list/top', Leaderboard, {}, [('rank', 1)]),
+        ('leaderboard by_team', Leaderboard, {'team': team}, [('rank', 1)]),
+        ('leaderboard entry', Leaderboard, {'user_email': email}, None),
+        ('leaderboard around', Leaderboard, {'rank': {'$gte': 1, '$lte': 21}}, [('rank', 1)]),
+        ('leaderboard rank move', Leaderboard,
+         {'$and': [ranked_ahead_of(calories, email), ranked_behind(calories + 500, email)]}, None),
+        ('users by_team/members', User, {'team_ref_id': team_id}, [('_id', 1)]),
+        ('workouts by_difficulty', Workout, {'difficulty': difficulty}, [('_id', 1)]),
+        ('workouts by_type', Workout, {'activity_type': activity_type}, [('_id', 1)]),
+    ]
+
+
+def plan_stages(plan):
+    """Collect every stage name in an explain() plan tree"""
+    stages = []
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            stages.append(plan['stage'])
+        for value in plan.values():
+            stages.extend(plan_stages(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            stages.extend(plan_stages(value))
+    return stages
+
+
+class Command(BaseCommand):
+    help = 'Explain each viewset query and flag collection scans and in-memory sorts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--no-fail',
+            action='store_true',
+            help='Report flagged queries without exiting with an error',
+        )
+
+    def handle(self, *args, **options):
+        flagged = []
+        for label, model, query, sort in query_shapes():
+            cursor = get_collection(model).find(query).limit(50)
+            if sort:
+                cursor = cursor.sort(sort)
+            winning_plan = cursor.explain()['queryPlanner']['winningPlan']
+            stages = plan_stages(winning_plan)
+            problems = sorted(FLAGGED_STAGES.intersection(stages))
+
+            line = f'{label:<28} {" <- ".join(stages)}'
+            if problems:
+                flagged.append(label)
+                self.stdout.write(self.style.WARNING(f'{line}  [{", ".join(problems)}]'))
+            else:
+                self.stdout.write(self.style.SUCCESS(line))
+
+        if flagged and not options['no_fail']:
+            raise CommandError(f'{len(flagged)} queries need an index: {", ".join(flagged)}')
+        self.stdout.write(self.style.SUCCESS('Index check complete'))
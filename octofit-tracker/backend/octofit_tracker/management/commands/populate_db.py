@@ -1,22 +1,121 @@
-from django.core.management.base import BaseCommand
+import multiprocessing
+import time
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
 from datetime import timedelta
-from octofit_tracker.models import User, Team, Activity, Leaderboard, Workout
+from octofit_tracker import synthetic
+from octofit_tracker.cache import invalidate_model
+from octofit_tracker.models import (
+    User, Team, Activity, ActivityRollup, ArchivedActivity, Leaderboard, LeaderboardSnapshot, Workout,
+)
+from octofit_tracker.mongo import get_collection, init_worker
+from octofit_tracker.signals import sync_team_members
+
+
+WORKOUTS = [
+    {
+        'name': 'Super Soldier Strength',
+        'description': 'Captain America\'s legendary strength training routine',
+        'activity_type': 'Weightlifting',
+        'duration': 60,
+        'difficulty': 'Advanced',
+        'calories_estimate': 400
+    },
+    {
+        'name': 'Speed Force Sprint',
+        'description': 'Flash-inspired high-intensity interval training',
+        'activity_type': 'Running',
+        'duration': 30,
+        'difficulty': 'Intermediate',
+        'calories_estimate': 350
+    },
+    {
+        'name': 'Amazonian Warrior Training',
+        'description': 'Wonder Woman\'s combat and flexibility routine',
+        'activity_type': 'Yoga',
+        'duration': 45,
+        'difficulty': 'Intermediate',
+        'calories_estimate': 250
+    },
+    {
+        'name': 'Asgardian Endurance',
+        'description': 'Thor\'s hammer-swinging cardio blast',
+        'activity_type': 'Boxing',
+        'duration': 50,
+        'difficulty': 'Advanced',
+        'calories_estimate': 450
+    },
+    {
+        'name': 'Atlantean Aquatics',
+        'description': 'Aquaman\'s underwater swimming mastery',
+        'activity_type': 'Swimming',
+        'duration': 40,
+        'difficulty': 'Beginner',
+        'calories_estimate': 300
+    },
+    {
+        'name': 'Dark Knight Detective Work',
+        'description': 'Batman\'s stealth and agility training',
+        'activity_type': 'Cycling',
+        'duration': 55,
+        'difficulty': 'Advanced',
+        'calories_estimate': 380
+    },
+    {
+        'name': 'Widow\'s Flexibility Flow',
+        'description': 'Black Widow\'s signature flexibility routine',
+        'activity_type': 'Yoga',
+        'duration': 35,
+        'difficulty': 'Beginner',
+        'calories_estimate': 200
+    },
+    {
+        'name': 'Hulk Smash Power',
+        'description': 'Unleash your inner strength with power lifting',
+        'activity_type': 'Weightlifting',
+        'duration': 45,
+        'difficulty': 'Advanced',
+        'calories_estimate': 420
+    },
+]
 
 
 class Command(BaseCommand):
     help = 'Populate the octofit_db database with test data'
 
-    def handle(self, *args, **kwargs):
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            help='Generate this many synthetic users instead of the hero dataset',
+        )
+        parser.add_argument('--teams', type=int, default=10, help='Synthetic teams to spread users over')
+        parser.add_argument('--activities-per-user', type=int, default=50, help='Synthetic activities per user')
+        parser.add_argument('--days', type=int, default=365, help='Spread synthetic activities over this many days')
+        parser.add_argument('--seed', type=int, default=42, help='Seed for the synthetic data RNG')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Documents per insert batch')
+        parser.add_argument('--workers', type=int, default=1, help='Processes generating activities')
+
+    def clear(self):
+        # delete_many skips the ORM's per-row collection, which would load
+        # every document of a load-test sized dataset
+        self.stdout.write('Clearing existing data...')
+        for model in (
+            User, Team, Activity, ArchivedActivity, ActivityRollup, Leaderboard, LeaderboardSnapshot, Workout,
+        ):
+            get_collection(model).delete_many({})
+        invalidate_model(Leaderboard)
+        invalidate_model(Workout)
+
+    def handle(self, *args, **options):
+        if options['users'] is not None:
+            return self.populate_synthetic(options)
+
         self.stdout.write(self.style.SUCCESS('Starting database population...'))
 
         # Clear existing data
-        self.stdout.write('Clearing existing data...')
-        User.objects.all().delete()
-        Team.objects.all().delete()
-        Activity.objects.all().delete()
-        Leaderboard.objects.all().delete()
-        Workout.objects.all().delete()
+        self.clear()
 
         # Create Teams
         self.stdout.write('Creating teams...')
@@ -101,12 +200,6 @@ class Command(BaseCommand):
             ),
         ]
 
-        # Update team members
-        team_marvel.members = [user.email for user in marvel_users]
-        team_marvel.save()
-        team_dc.members = [user.email for user in dc_users]
-        team_dc.save()
-
         # Create Activities
         self.stdout.write('Creating activities...')
         activity_types = ['Running', 'Cycling', 'Swimming', 'Weightlifting', 'Yoga', 'Boxing']
@@ -126,94 +219,15 @@ class Command(BaseCommand):
                     date=activity_date
                 )
 
-        # Create Leaderboard entries
+        # Rank the leaderboard the way the incremental engine orders it:
+        # calories descending, then email ascending
         self.stdout.write('Creating leaderboard...')
-        for rank, user in enumerate(all_users, start=1):
-            user_activities = Activity.objects.filter(user_email=user.email)
-            total_calories = sum(activity.calories for activity in user_activities)
-            total_duration = sum(activity.duration for activity in user_activities)
-            
-            Leaderboard.objects.create(
-                user_email=user.email,
-                user_name=user.name,
-                team=user.team,
-                total_calories=total_calories,
-                total_activities=user_activities.count(),
-                total_duration=total_duration,
-                rank=rank
-            )
+        call_command('rebuild_leaderboard', stdout=self.stdout)
 
         # Create Workouts
-        self.stdout.write('Creating workout suggestions...')
-        workouts = [
-            {
-                'name': 'Super Soldier Strength',
-                'description': 'Captain America\'s legendary strength training routine',
-                'activity_type': 'Weightlifting',
-                'duration': 60,
-                'difficulty': 'Advanced',
-                'calories_estimate': 400
-            },
-            {
-                'name': 'Speed Force Sprint',
-                'description': 'Flash-inspired high-intensity interval training',
-                'activity_type': 'Running',
-                'duration': 30,
-                'difficulty': 'Intermediate',
-                'calories_estimate': 350
-            },
-            {
-                'name': 'Amazonian Warrior Training',
-                'description': 'Wonder Woman\'s combat and flexibility routine',
-                'activity_type': 'Yoga',
-                'duration': 45,
-                'difficulty': 'Intermediate',
-                'calories_estimate': 250
-            },
-            {
-                'name': 'Asgardian Endurance',
-                'description': 'Thor\'s hammer-swinging cardio blast',
-                'activity_type': 'Boxing',
-                'duration': 50,
-                'difficulty': 'Advanced',
-                'calories_estimate': 450
-            },
-            {
-                'name': 'Atlantean Aquatics',
-                'description': 'Aquaman\'s underwater swimming mastery',
-                'activity_type': 'Swimming',
-                'duration': 40,
-                'difficulty': 'Beginner',
-                'calories_estimate': 300
-            },
-            {
-                'name': 'Dark Knight Detective Work',
-                'description': 'Batman\'s stealth and agility training',
-                'activity_type': 'Cycling',
-                'duration': 55,
-                'difficulty': 'Advanced',
-                'calories_estimate': 380
-            },
-            {
-                'name': 'Widow\'s Flexibility Flow',
-                'description': 'Black Widow\'s signature flexibility routine',
-                'activity_type': 'Yoga',
-                'duration': 35,
-                'difficulty': 'Beginner',
-                'calories_estimate': 200
-            },
-            {
-                'name': 'Hulk Smash Power',
-                'description': 'Unleash your inner strength with power lifting',
-                'activity_type': 'Weightlifting',
-                'duration': 45,
-                'difficulty': 'Advanced',
-                'calories_estimate': 420
-            },
-        ]
-
-        for workout_data in workouts:
-            Workout.objects.create(**workout_data)
+        self.create_workouts()
+        call_command('rebuild_rollups', stdout=self.stdout)
+        call_command('refresh_leaderboards', stdout=self.stdout)
 
         # Print summary
         self.stdout.write(self.style.SUCCESS('\n=== Database Population Complete ==='))
@@ -223,3 +237,64 @@ class Command(BaseCommand):
         self.stdout.write(f'Leaderboard entries: {Leaderboard.objects.count()}')
         self.stdout.write(f'Workouts created: {Workout.objects.count()}')
         self.stdout.write(self.style.SUCCESS('\nDatabase is ready for action! 🦸‍♂️🦸‍♀️'))
+
+    def create_workouts(self):
+        self.stdout.write('Creating workout suggestions...')
+        for workout_data in WORKOUTS:
+            Workout.objects.create(**workout_data)
+
+    def populate_synthetic(self, options):
+        """Generate a seeded load-test dataset with batched inserts across worker processes"""
+        users, teams = options['users'], options['teams']
+        per_user, batch_size, workers = options['activities_per_user'], options['batch_size'], options['workers']
+        if users < 1 or teams < 0 or per_user < 0 or batch_size < 1 or workers < 1 or options['days'] < 1:
+            raise CommandError('Counts must be positive')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generating {users} users, {teams} teams and {users * per_user} activities '
+            f'with {workers} worker(s), seed {options["seed"]}'
+        ))
+        self.clear()
+        now = synthetic.utc_now()
+        started = time.monotonic()
+
+        team_documents = synthetic.team_documents(teams, now)
+        if team_documents:
+            get_collection(Team).insert_many(team_documents)
+        self.create_workouts()
+        synthetic.insert_users(team_documents, users, options['seed'], now, batch_size)
+        for team in team_documents:
+            sync_team_members(team['_id'])
+        self.stdout.write(f'Users created: {users} ({time.monotonic() - started:.1f}s)')
+
+        # Shards are small enough to report progress often and to keep
+        # every worker busy until the end
+        shard_size = max(1, min(1000, users // (workers * 4) or 1))
+        tasks = [
+            (first, min(first + shard_size, users), per_user, options['seed'], options['days'], now, batch_size)
+            for first in range(0, users, shard_size)
+        ]
+        if workers == 1:
+            results = map(synthetic.insert_activity_shard, tasks)
+            self.report_activities(results, users * per_user, started)
+        else:
+            with multiprocessing.Pool(workers, initializer=init_worker) as pool:
+                results = pool.imap_unordered(synthetic.insert_activity_shard, tasks)
+                self.report_activities(results, users * per_user, started)
+
+        self.stdout.write('Ranking leaderboard...')
+        call_command('rebuild_leaderboard', workers=workers, batch_size=batch_size, stdout=self.stdout)
+        call_command('rebuild_rollups', batch_size=batch_size, stdout=self.stdout)
+        call_command('refresh_leaderboards', batch_size=batch_size, stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\nSynthetic dataset ready in {time.monotonic() - started:.1f}s: '
+            f'{Leaderboard.objects.count()} leaderboard entries'
+        ))
+
+    def report_activities(self, results, total, started):
+        inserted = 0
+        for count in results:
+            inserted += count
+            elapsed = time.monotonic() - started
+            self.stdout.write(f'Activities: {inserted}/{total} ({inserted / max(elapsed, 1e-9):,.0f}/s)')
@@ -0,0 +1,64 @@
+import time
+from pymongo import ReplaceOne
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from octofit_tracker.filters import parse_date_param
+from octofit_tracker.models import ActivityRollup
+from octofit_tracker.mongo import get_collection
+from octofit_tracker.rollups import day_totals, rollup_documents, week_start
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the daily and weekly activity rollups from the activities, '
+        'replacing the stored buckets (all of them, or from --since on)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            help='Only rebuild buckets from this ISO date on, rounded down to its week',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000, help='Documents per bulk write')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+        since = None
+        if options['since']:
+            try:
+                # Weekly buckets are only complete when rebuilt from their Monday
+                since = week_start(parse_date_param(options, 'since'))
+            except ValidationError:
+                raise CommandError(f'Invalid --since date: {options["since"]}')
+
+        started = time.monotonic()
+        collection = get_collection(ActivityRollup)
+        now = timezone.now()
+
+        # Buckets are replaced in place, so readers never see the rollups
+        # missing; the buckets the rebuild did not write are dropped after
+        written, batch = 0, []
+        match = {'date': {'$gte': since}} if since else None
+        for document in rollup_documents(day_totals(match), now):
+            batch.append(ReplaceOne(
+                {name: document[name] for name in ('scope', 'key', 'period', 'bucket')}, document, upsert=True,
+            ))
+            if len(batch) >= options['batch_size']:
+                collection.bulk_write(batch, ordered=False)
+                written += len(batch)
+                batch = []
+        if batch:
+            collection.bulk_write(batch, ordered=False)
+            written += len(batch)
+
+        stale = {'updated_at': {'$lt': now}}
+        if since:
+            stale['bucket'] = {'$gte': since}
+        removed = collection.delete_many(stale).deleted_count
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt rollups{f" since {since:%Y-%m-%d}" if since else ""}: '
+            f'{written} written, {removed} stale removed in {time.monotonic() - started:.1f}s'
+        ))
@@ -0,0 +1,30 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from octofit_tracker.boards import METRICS, WINDOWS, refresh_boards
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the precomputed global and team leaderboards from the activity rollups. '
+        'Run it on a schedule; day and week boards go stale between runs.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--windows', default=','.join(WINDOWS), help=f'Comma separated subset of: {", ".join(WINDOWS)}')
+        parser.add_argument('--metrics', default=','.join(METRICS), help=f'Comma separated subset of: {", ".join(METRICS)}')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk write')
+
+    def handle(self, *args, **options):
+        windows = [window.strip() for window in options['windows'].split(',') if window.strip()]
+        metrics = [metric.strip() for metric in options['metrics'].split(',') if metric.strip()]
+        unknown = sorted(set(windows) - set(WINDOWS)) + sorted(set(metrics) - set(METRICS))
+        if unknown:
+            raise CommandError(f'Unknown windows or metrics: {", ".join(unknown)}')
+        if not windows or not metrics or options['batch_size'] < 1:
+            raise CommandError('Windows, metrics and batch size must not be empty')
+
+        started = time.monotonic()
+        written = refresh_boards(windows, metrics, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Refreshed {len(windows) * len(metrics)} board set(s): {written} rows in {time.monotonic() - started:.1f}s'
+        ))
@@ -0,0 +1,64 @@
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from octofit_tracker.write_behind import claim, process
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute leaderboard entries and rollups queued by activity writes '
+        '(OCTOFIT_WRITE_BEHIND) with a pool of worker threads'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Worker threads')
+        parser.add_argument('--batch-size', type=int, default=100, help='Tasks claimed per batch')
+        parser.add_argument('--lease', type=float, default=60, help='Seconds a claimed batch stays leased')
+        parser.add_argument(
+            '--max-attempts', type=int, default=settings.OCTOFIT_WRITE_BEHIND_MAX_ATTEMPTS,
+            help='Attempts before a task is left failed (default: OCTOFIT_WRITE_BEHIND_MAX_ATTEMPTS)',
+        )
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is drained')
+
+    def handle(self, *args, **options):
+        if min(options['workers'], options['batch_size'], options['max_attempts']) < 1 or options['lease'] <= 0:
+            raise CommandError('Workers, batch size, lease and attempts must be positive')
+
+        stop = threading.Event()
+        processed = [0] * options['workers']
+        prefix = f'{socket.gethostname()}:{os.getpid()}'
+
+        def work(index):
+            worker = f'{prefix}:{index}'
+            lease = timedelta(seconds=options['lease'])
+            while not stop.is_set():
+                tasks = claim(worker, options['batch_size'], lease, options['max_attempts'])
+                if tasks:
+                    processed[index] += process(worker, tasks, max_attempts=options['max_attempts'])
+                elif options['once']:
+                    return
+                else:
+                    stop.wait(options['poll_interval'])
+
+        started = time.monotonic()
+        threads = [threading.Thread(target=work, args=(index,), daemon=True) for index in range(options['workers'])]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            self.stderr.write('Stopping after the current batches...')
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Recomputed {sum(processed)} user(s) in {time.monotonic() - started:.1f}s'
+        ))
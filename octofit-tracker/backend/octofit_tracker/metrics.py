@@ -0,0 +1,144 @@
+"""
+Per-route request metrics in the Prometheus text exposition format.
+
+``InstrumentationMiddleware`` records every request into ``request_metrics``
+under its URL name (e.g. ``activity-by-user``) and method: latency,
+response size and ORM query count histograms, plus totals of Mongo
+commands, Mongo time and djongo translation time. Like the pool counters,
+metrics are per process; Prometheus should scrape every worker (or sum
+them) rather than one of them.
+"""
+import bisect
+import threading
+from collections import defaultdict
+from .monitoring import pool_metrics
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with a sum and a count"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket', {**labels, 'le': _number(bound)}, cumulative
+        yield f'{name}_bucket', {**labels, 'le': '+Inf'}, self.count
+        yield f'{name}_sum', labels, self.sum
+        yield f'{name}_count', labels, self.count
+
+
+class RouteMetrics:
+    def __init__(self):
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.response_size = Histogram(SIZE_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.mongo_commands = 0
+        self.mongo_seconds = 0.0
+        self.translation_seconds = 0.0
+        self.statuses = defaultdict(int)
+
+
+class RequestMetrics:
+    """Thread-safe per ``(route, method)`` request metrics"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = defaultdict(RouteMetrics)
+
+    def observe(self, route, method, status, seconds, stats, response_size=None):
+        with self._lock:
+            metrics = self._routes[route, method]
+            metrics.statuses[status] += 1
+            metrics.duration.observe(seconds)
+            metrics.queries.observe(stats.queries)
+            if response_size is not None:
+                metrics.response_size.observe(response_size)
+            metrics.mongo_commands += stats.mongo_commands
+            metrics.mongo_seconds += stats.mongo_seconds
+            metrics.translation_seconds += stats.translation_seconds
+
+    def families(self):
+        """``(name, type, help, samples)`` for every metric family"""
+        with self._lock:
+            routes = list(self._routes.items())
+            histograms = {
+                'octofit_http_request_duration_seconds': ('Request latency', 'duration'),
+                'octofit_http_response_size_bytes': ('Rendered response body size', 'response_size'),
+                'octofit_http_request_queries': ('ORM queries per request', 'queries'),
+            }
+            for name, (description, attribute) in histograms.items():
+                samples = [
+                    sample
+                    for (route, method), metrics in routes
+                    for sample in getattr(metrics, attribute).samples(name, {'route': route, 'method': method})
+                ]
+                yield name, 'histogram', description, samples
+
+            yield 'octofit_http_requests_total', 'counter', 'Requests by response status', [
+                ('octofit_http_requests_total', {'route': route, 'method': method, 'status': str(status)}, count)
+                for (route, method), metrics in routes
+                for status, count in sorted(metrics.statuses.items())
+            ]
+            totals = {
+                'octofit_http_request_mongo_commands_total': ('Mongo commands issued', 'mongo_commands'),
+                'octofit_http_request_mongo_seconds_total': ('Time spent in Mongo commands', 'mongo_seconds'),
+                'octofit_http_request_translation_seconds_total': (
+                    'Time spent in ORM queries outside Mongo (djongo translation)', 'translation_seconds',
+                ),
+            }
+            for name, (description, attribute) in totals.items():
+                yield name, 'counter', description, [
+                    (name, {'route': route, 'method': method}, getattr(metrics, attribute))
+                    for (route, method), metrics in routes
+                ]
+
+
+request_metrics = RequestMetrics()
+
+
+def _pool_families():
+    servers = pool_metrics.snapshot()
+    names = sorted({name for counters in servers.values() for name in counters})
+    for name in names:
+        gauge = name in ('open', 'in_use', 'waiting', 'wait_seconds_max')
+        metric = f'octofit_mongo_pool_{name}' if gauge or name.endswith('_total') else f'octofit_mongo_pool_{name}_total'
+        yield metric, 'gauge' if gauge else 'counter', f'Connection pool {name.replace("_", " ")}', [
+            (metric, {'server': server}, counters[name]) for server, counters in sorted(servers.items())
+        ]
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus():
+    """Request and connection pool metrics of this process as Prometheus text"""
+    lines = []
+    for name, kind, description, samples in (*request_metrics.families(), *_pool_families()):
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        for sample, labels, value in samples:
+            label_text = ','.join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+            lines.append(f'{sample}{{{label_text}}} {_number(value)}')
+    return '\n'.join(lines) + '\n'
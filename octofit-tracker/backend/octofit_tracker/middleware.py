@@ -0,0 +1,63 @@
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from .archive import horizon_cache
+from .metrics import request_metrics
+from .monitoring import RequestStats, current_stats
+
+
+class InstrumentationMiddleware:
+    """
+    Record the latency, ORM queries, Mongo round trips, djongo translation
+    time and response size of every request into ``request_metrics``, and
+    report them in a ``Server-Timing`` header when ``OCTOFIT_SERVER_TIMING``
+    is set. Runs natively in both sync and async stacks, so the async views
+    stay on the event loop. Each request also reads the archive horizon
+    at most once.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            with horizon_cache():
+                response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.finish(request, response, stats, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            with horizon_cache():
+                response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.finish(request, response, stats, time.perf_counter() - started)
+
+    def finish(self, request, response, stats, seconds):
+        match = request.resolver_match
+        route = match.view_name if match else 'unmatched'
+        size = None if response.streaming else len(response.content)
+        request_metrics.observe(route, request.method, response.status_code, seconds, stats, size)
+
+        if settings.OCTOFIT_SERVER_TIMING:
+            response['Server-Timing'] = ', '.join([
+                f'app;dur={seconds * 1000:.1f}',
+                f'db;dur={stats.query_seconds * 1000:.1f};desc="{stats.queries} queries"',
+                f'translate;dur={stats.translation_seconds * 1000:.1f}',
+                f'mongo;dur={stats.mongo_seconds * 1000:.1f};desc="{stats.mongo_commands} commands"',
+            ])
+        return response
@@ -0,0 +1,21 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('octofit_tracker', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leaderboard',
+            index=models.Index(fields=['user_email'], name='leaderboard_user_em_2f81ec_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboard',
+            index=models.Index(fields=['total_calories', 'user_email'], name='leaderboard_total_c_62f307_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('octofit_tracker', '0002_leaderboard_ranking_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='team',
+            name='member_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='team_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='users', to='octofit_tracker.team'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+
+def link_team_membership(apps, schema_editor):
+    """
+    Point every user at a team, preferring their team string over the
+    team's members list, then rebuild members and member_count from the
+    new references.
+    """
+    Team = apps.get_model('octofit_tracker', 'Team')
+    User = apps.get_model('octofit_tracker', 'User')
+
+    teams = {team.name: team for team in Team.objects.all()}
+    listed = {}
+    for team in teams.values():
+        for email in team.members or []:
+            listed.setdefault(email, team)
+
+    for user in User.objects.all():
+        team = teams.get(user.team) or listed.get(user.email)
+        User.objects.filter(pk=user.pk).update(
+            team_ref=team,
+            team=team.name if team else user.team,
+        )
+
+    for team in teams.values():
+        emails = list(User.objects.filter(team_ref=team).values_list('email', flat=True))
+        Team.objects.filter(pk=team.pk).update(members=emails, member_count=len(emails))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('octofit_tracker', '0003_team_membership'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_team_membership, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('octofit_tracker', '0004_link_team_membership'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='activity',
+            name='activities_user_em_5ea6c3_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='leaderboard',
+            name='leaderboard_team_b8597e_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='workout',
+            name='workouts_activit_b0e6e1_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='workout',
+            name='workouts_difficu_e2fdd2_idx',
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['user_email', 'date'], name='activities_user_em_992ab4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['activity_type', 'date'], name='activities_activit_aaac69_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboard',
+            index=models.Index(fields=['team', 'rank'], name='leaderboard_team_fe5ca9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['team_ref', '_id'], name='users_team_re_dcf8ae_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workout',
+            index=models.Index(fields=['activity_type', '_id'], name='workouts_activit_f1702f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workout',
+            index=models.Index(fields=['difficulty', '_id'], name='workouts_difficu_d4ee31_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:27
+
+from django.db import migrations, models
+import djongo.models.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('octofit_tracker', '0005_compound_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityRollup',
+            fields=[
+                ('_id', djongo.models.fields.ObjectIdField(auto_created=True, primary_key=True, serialize=False)),
+                ('scope', models.CharField(choices=[('user', 'User'), ('team', 'Team')], max_length=10)),
+                ('key', models.CharField(max_length=254)),
+                ('period', models.CharField(choices=[('day', 'Day'), ('week', 'Week')], max_length=10)),
+                ('bucket', models.DateTimeField()),
+                ('calories', models.IntegerField(default=0)),
+                ('duration', models.IntegerField(default=0)),
+                ('distance', models.FloatField(default=0)),
+                ('count', models.IntegerField(default=0)),
+                ('by_type', djongo.models.fields.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'activity_rollups',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='activityrollup',
+            index=models.Index(fields=['scope', 'key', 'period', 'bucket'], name='activity_ro_scope_d2ac08_idx'),
+        ),
+    ]
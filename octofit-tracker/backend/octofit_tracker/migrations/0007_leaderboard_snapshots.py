@@ -0,0 +1,42 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:31
+
+from django.db import migrations, models
+import djongo.models.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('octofit_tracker', '0006_activity_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardSnapshot',
+            fields=[
+                ('_id', djongo.models.fields.ObjectIdField(auto_created=True, primary_key=True, serialize=False)),
+                ('board', models.CharField(max_length=300)),
+                ('scope', models.CharField(choices=[('global', 'Global'), ('team', 'Team')], max_length=10)),
+                ('window', models.CharField(choices=[('day', 'Day'), ('week', 'Week'), ('month', 'Month'), ('all', 'All time')], max_length=10)),
+                ('metric', models.CharField(choices=[('calories', 'Calories'), ('duration', 'Duration'), ('activities', 'Activities')], max_length=20)),
+                ('period_start', models.DateTimeField(blank=True, null=True)),
+                ('user_email', models.EmailField(max_length=254)),
+                ('user_name', models.CharField(max_length=200)),
+                ('team', models.CharField(max_length=200)),
+                ('value', models.IntegerField(default=0)),
+                ('rank', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'leaderboard_snapshots',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardsnapshot',
+            index=models.Index(fields=['board', 'rank'], name='leaderboard_board_67b0ef_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardsnapshot',
+            index=models.Index(fields=['board', 'user_email'], name='leaderboard_board_ab0c5b_idx'),
+        ),
+    ]
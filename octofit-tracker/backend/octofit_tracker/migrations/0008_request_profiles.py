@@ -0,0 +1,34 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:37
+
+from django.db import migrations, models
+import djongo.models.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('octofit_tracker', '0007_leaderboard_snapshots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('_id', djongo.models.fields.ObjectIdField(auto_created=True, primary_key=True, serialize=False)),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.CharField(max_length=2000)),
+                ('status_code', models.IntegerField()),
+                ('duration_ms', models.FloatField()),
+                ('username', models.CharField(max_length=150)),
+                ('stats', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'request_profiles',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='requestprofile',
+            index=models.Index(fields=['created_at'], name='request_pro_created_48467a_idx'),
+        ),
+    ]
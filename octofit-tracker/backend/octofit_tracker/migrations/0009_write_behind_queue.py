@@ -0,0 +1,38 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:40
+
+from django.db import migrations, models
+import djongo.models.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('octofit_tracker', '0008_request_profiles'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WriteBehindTask',
+            fields=[
+                ('_id', djongo.models.fields.ObjectIdField(auto_created=True, primary_key=True, serialize=False)),
+                ('user_email', models.EmailField(max_length=254)),
+                ('days', djongo.models.fields.JSONField(default=list)),
+                ('enqueued_at', models.DateTimeField()),
+                ('available_at', models.DateTimeField()),
+                ('claimed_by', models.CharField(blank=True, default='', max_length=100)),
+                ('attempts', models.IntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+            ],
+            options={
+                'db_table': 'write_behind_queue',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='writebehindtask',
+            index=models.Index(fields=['available_at'], name='write_behin_availab_5a28d3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='writebehindtask',
+            index=models.Index(fields=['user_email', 'claimed_by'], name='write_behin_user_em_03b7c1_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:44
+
+from django.db import migrations, models
+import djongo.models.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('octofit_tracker', '0009_write_behind_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedActivity',
+            fields=[
+                ('_id', djongo.models.fields.ObjectIdField(auto_created=True, primary_key=True, serialize=False)),
+                ('user_email', models.EmailField(max_length=254)),
+                ('activity_type', models.CharField(max_length=100)),
+                ('duration', models.IntegerField()),
+                ('distance', models.FloatField(blank=True, null=True)),
+                ('calories', models.IntegerField()),
+                ('date', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'activities_archive',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedactivity',
+            index=models.Index(fields=['user_email', 'date'], name='activities__user_em_9adae8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedactivity',
+            index=models.Index(fields=['activity_type', 'date'], name='activities__activit_bd4142_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedactivity',
+            index=models.Index(fields=['date'], name='activities__date_e358d5_idx'),
+        ),
+    ]
@@ -7,25 +7,42 @@ class User(models.Model):
     name = models.CharField(max_length=200)
     email = models.EmailField(unique=True)
     password = models.CharField(max_length=200)
-    team = models.CharField(max_length=200, blank=True, null=True)
+    team = models.CharField(max_length=200, blank=True, null=True)  # team name, kept in sync with team_ref
+    team_ref = models.ForeignKey(
+        'Team',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='users',
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         db_table = 'users'
         indexes = [
             models.Index(fields=['email']),
+            models.Index(fields=['team_ref', '_id']),
         ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_team = instance.__dict__.get('team')
+        instance._loaded_team_ref_id = instance.__dict__.get('team_ref_id')
+        instance._loaded_email = instance.__dict__.get('email')
+        return instance
+
 
 class Team(models.Model):
     _id = djongo_models.ObjectIdField(primary_key=True)
     name = models.CharField(max_length=200, unique=True)
     description = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    members = models.JSONField(default=list)
+    members = models.JSONField(default=list)  # emails, derived from User.team_ref
+    member_count = models.IntegerField(default=0)
 
     class Meta:
         db_table = 'teams'
@@ -33,8 +50,15 @@ class Team(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_name = instance.__dict__.get('name')
+        return instance
+
 
-class Activity(models.Model):
+class ActivityFields(models.Model):
+    """Fields shared by the hot and archived activity collections"""
     _id = djongo_models.ObjectIdField(primary_key=True)
     user_email = models.EmailField()
     activity_type = models.CharField(max_length=100)
@@ -44,15 +68,101 @@ class Activity(models.Model):
     date = models.DateTimeField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = djongo_models.DjongoManager()
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return f"{self.user_email} - {self.activity_type}"
+
+
+class Activity(ActivityFields):
     class Meta:
         db_table = 'activities'
+        # djongo builds every index ascending; Mongo walks them backwards
+        # for the '-date' orderings
         indexes = [
-            models.Index(fields=['user_email']),
+            models.Index(fields=['user_email', 'date']),
+            models.Index(fields=['activity_type', 'date']),
+            models.Index(fields=['date']),
+        ]
+
+
+class ArchivedActivity(ActivityFields):
+    """
+    Activities older than the archive horizon, moved out of ``activities``
+    by ``archive_activities`` (see ``archive.py``)
+    """
+
+    class Meta:
+        db_table = 'activities_archive'
+        indexes = [
+            models.Index(fields=['user_email', 'date']),
+            models.Index(fields=['activity_type', 'date']),
             models.Index(fields=['date']),
         ]
 
+
+class ActivityRollup(models.Model):
+    """
+    Activity totals of one user or team over one UTC day or ISO week,
+    maintained on activity writes (see ``rollups.py``)
+    """
+    SCOPES = [('user', 'User'), ('team', 'Team')]
+    PERIODS = [('day', 'Day'), ('week', 'Week')]
+
+    _id = djongo_models.ObjectIdField(primary_key=True)
+    scope = models.CharField(max_length=10, choices=SCOPES)
+    key = models.CharField(max_length=254)  # user email or team name
+    period = models.CharField(max_length=10, choices=PERIODS)
+    bucket = models.DateTimeField()  # start of the day, or the Monday of the week
+    calories = models.IntegerField(default=0)
+    duration = models.IntegerField(default=0)
+    distance = models.FloatField(default=0)
+    count = models.IntegerField(default=0)
+    # {activity_type: {calories, duration, distance, count}}, stored as an
+    # embedded document so writes can $inc into it
+    by_type = djongo_models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = djongo_models.DjongoManager()
+
+    class Meta:
+        db_table = 'activity_rollups'
+        indexes = [
+            models.Index(fields=['scope', 'key', 'period', 'bucket']),
+        ]
+
     def __str__(self):
-        return f"{self.user_email} - {self.activity_type}"
+        return f"{self.scope} {self.key} - {self.period} of {self.bucket:%Y-%m-%d}"
+
+
+class WriteBehindTask(models.Model):
+    """
+    A user whose derived data (leaderboard entry and rollups) awaits
+    recomputation by the write-behind worker (see ``write_behind.py``)
+    """
+    _id = djongo_models.ObjectIdField(primary_key=True)
+    user_email = models.EmailField()
+    days = djongo_models.JSONField(default=list)  # YYYY-MM-DD of the changed activities
+    enqueued_at = models.DateTimeField()
+    available_at = models.DateTimeField()  # claimable from; leases and retry backoff push it back
+    claimed_by = models.CharField(max_length=100, blank=True, default='')  # worker, or 'failed' once given up
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+
+    objects = djongo_models.DjongoManager()
+
+    class Meta:
+        db_table = 'write_behind_queue'
+        indexes = [
+            models.Index(fields=['available_at']),
+            models.Index(fields=['user_email', 'claimed_by']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_email} - {len(self.days)} day(s), {self.attempts} attempt(s)"
 
 
 class Leaderboard(models.Model):
@@ -66,17 +176,57 @@ class Leaderboard(models.Model):
     rank = models.IntegerField(default=0)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = djongo_models.DjongoManager()
+
     class Meta:
         db_table = 'leaderboard'
         indexes = [
             models.Index(fields=['rank']),
-            models.Index(fields=['team']),
+            models.Index(fields=['team', 'rank']),
+            models.Index(fields=['user_email']),
+            models.Index(fields=['total_calories', 'user_email']),
         ]
 
     def __str__(self):
         return f"{self.user_name} - Rank {self.rank}"
 
 
+class LeaderboardSnapshot(models.Model):
+    """
+    One ranked entry of a precomputed board: global or per team, over the
+    current day, week, month or all time, ranked by one metric
+    (see ``boards.py``)
+    """
+    SCOPES = [('global', 'Global'), ('team', 'Team')]
+    WINDOWS = [('day', 'Day'), ('week', 'Week'), ('month', 'Month'), ('all', 'All time')]
+    METRICS = [('calories', 'Calories'), ('duration', 'Duration'), ('activities', 'Activities')]
+
+    _id = djongo_models.ObjectIdField(primary_key=True)
+    board = models.CharField(max_length=300)  # scope:window:metric[:team]
+    scope = models.CharField(max_length=10, choices=SCOPES)
+    window = models.CharField(max_length=10, choices=WINDOWS)
+    metric = models.CharField(max_length=20, choices=METRICS)
+    period_start = models.DateTimeField(null=True, blank=True)  # None for all time
+    user_email = models.EmailField()
+    user_name = models.CharField(max_length=200)
+    team = models.CharField(max_length=200)
+    value = models.IntegerField(default=0)
+    rank = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = djongo_models.DjongoManager()
+
+    class Meta:
+        db_table = 'leaderboard_snapshots'
+        indexes = [
+            models.Index(fields=['board', 'rank']),
+            models.Index(fields=['board', 'user_email']),
+        ]
+
+    def __str__(self):
+        return f"{self.board} - {self.user_name} - Rank {self.rank}"
+
+
 class Workout(models.Model):
     _id = djongo_models.ObjectIdField(primary_key=True)
     name = models.CharField(max_length=200)
@@ -90,9 +240,30 @@ class Workout(models.Model):
     class Meta:
         db_table = 'workouts'
         indexes = [
-            models.Index(fields=['activity_type']),
-            models.Index(fields=['difficulty']),
+            models.Index(fields=['activity_type', '_id']),
+            models.Index(fields=['difficulty', '_id']),
         ]
 
     def __str__(self):
         return self.name
+
+
+class RequestProfile(models.Model):
+    """A cProfile capture of one API request (see ``profiling.py``)"""
+    _id = djongo_models.ObjectIdField(primary_key=True)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=2000)
+    status_code = models.IntegerField()
+    duration_ms = models.FloatField()
+    username = models.CharField(max_length=150)
+    stats = models.BinaryField()  # marshalled pstats, as written by Profile.dump_stats
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'request_profiles'
+        indexes = [
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.method} {self.path} - {self.duration_ms:.0f}ms"
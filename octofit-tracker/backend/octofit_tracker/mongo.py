@@ -0,0 +1,82 @@
+"""
+Raw pymongo access to the database djongo is connected to.
+
+Prefer ``DjongoManager``'s ``mongo_*`` methods for a model's own
+collection; these helpers cover whole-database operations and collections
+without a model.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from django.db import connections
+from pymongo import MongoClient
+
+
+def get_database(using='default'):
+    """Return the pymongo Database behind a djongo connection"""
+    connection = connections[using]
+    connection.ensure_connection()
+    return connection.connection
+
+
+def get_collection(model_or_name, using='default'):
+    """Return the pymongo Collection for a model or a collection name"""
+    name = model_or_name if isinstance(model_or_name, str) else model_or_name._meta.db_table
+    return get_database(using)[name]
+
+
+def connect_database(using='default'):
+    """
+    Open a new client with the configured settings and return its Database.
+    The caller closes ``database.client`` when done; worker processes use
+    ``worker_database`` instead.
+    """
+    database_settings = connections[using].settings_dict
+    client = MongoClient(**database_settings.get('CLIENT', {}))
+    return client[database_settings['NAME']]
+
+
+def swap_in(shadow, model, using='default'):
+    """
+    Give a fully built ``shadow`` collection the indexes of ``model`` and
+    rename it over the model's collection. The rename is atomic, so readers
+    see either the old collection or the complete new one.
+    """
+    collection = get_database(using)[shadow]
+    for index in model._meta.indexes:
+        collection.create_index([(field, 1) for field in index.fields], name=index.name)
+    collection.rename(model._meta.db_table, dropTarget=True)
+
+
+_worker_client = {}
+
+
+def worker_database(using='default'):
+    """
+    The Database of this process's own client, opened on first use and
+    reused for every task the process runs. Keyed by pid, so a forked
+    child never reuses its parent's client.
+    """
+    key = (os.getpid(), using)
+    if key not in _worker_client:
+        _worker_client[key] = connect_database(using)
+    return _worker_client[key]
+
+
+def init_worker():
+    """``multiprocessing.Pool`` initializer: set up Django and open the worker's client"""
+    # Spawned workers start without Django configured
+    import django
+    django.setup()
+    worker_database()
+
+
+def prewarm(using='default'):
+    """
+    Select a server and open up to ``minPoolSize`` connections (at least
+    one) with concurrent pings, so the first requests of a worker do not
+    pay for server discovery and connection handshakes.
+    """
+    database = get_database(using)
+    count = max(1, connections[using].settings_dict.get('CLIENT', {}).get('minPoolSize', 0))
+    with ThreadPoolExecutor(count) as executor:
+        list(executor.map(lambda _: database.command('ping'), range(count)))
@@ -0,0 +1,194 @@
+"""
+Connection pool and command metrics for the Mongo clients of this process.
+
+``pool_metrics`` and ``command_timer`` are registered with pymongo as
+global listeners when the app loads, so they observe every client created
+afterwards: djongo's shared client, the Motor clients of the async views
+and worker clients alike. Pool counters are kept per server address and
+are per process, so pools are sized per worker.
+
+``command_timer`` and ``query_timer`` attribute Mongo round trips and ORM
+queries to the ``RequestStats`` of the current request (see
+``middleware.py``). ``query_timer`` is installed on every database
+connection as it is created, so it also sees the queries of async
+requests, whose views run on a ``sync_to_async`` thread. The djongo
+translation time of a query is its ``execute`` time minus the Mongo
+commands it issued.
+"""
+import contextvars
+import threading
+import time
+from collections import defaultdict
+from django.db.backends.signals import connection_created
+from pymongo import monitoring
+
+
+def _address(address):
+    host, port = address
+    return f'{host}:{port}'
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Count connection lifecycle and checkout events per server"""
+
+    COUNTERS = (
+        'pools_cleared', 'connections_created', 'connections_closed',
+        'checkouts_started', 'checkouts', 'checkouts_failed', 'checkins',
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._servers = defaultdict(self._empty)
+        self._checkout_started = threading.local()
+
+    def _empty(self):
+        return {**{name: 0 for name in self.COUNTERS}, 'wait_seconds_total': 0.0, 'wait_seconds_max': 0.0}
+
+    def _count(self, event, name):
+        with self._lock:
+            self._servers[_address(event.address)][name] += 1
+
+    def pool_created(self, event):
+        with self._lock:
+            self._servers[_address(event.address)]
+
+    def pool_cleared(self, event):
+        self._count(event, 'pools_cleared')
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._count(event, 'connections_created')
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._count(event, 'connections_closed')
+
+    def connection_check_out_started(self, event):
+        # Started and checked out events fire on the same thread
+        self._checkout_started.value = time.perf_counter()
+        self._count(event, 'checkouts_started')
+
+    def connection_check_out_failed(self, event):
+        self._count(event, 'checkouts_failed')
+
+    def connection_checked_out(self, event):
+        started = getattr(self._checkout_started, 'value', None)
+        waited = time.perf_counter() - started if started is not None else 0.0
+        with self._lock:
+            server = self._servers[_address(event.address)]
+            server['checkouts'] += 1
+            server['wait_seconds_total'] += waited
+            server['wait_seconds_max'] = max(server['wait_seconds_max'], waited)
+
+    def connection_checked_in(self, event):
+        self._count(event, 'checkins')
+
+    def snapshot(self):
+        """Counters plus derived open/in-use/waiting gauges per server"""
+        with self._lock:
+            servers = {address: dict(counters) for address, counters in self._servers.items()}
+        for counters in servers.values():
+            counters['open'] = counters['connections_created'] - counters['connections_closed']
+            counters['in_use'] = counters['checkouts'] - counters['checkins']
+            counters['waiting'] = counters['checkouts_started'] - counters['checkouts'] - counters['checkouts_failed']
+        return servers
+
+
+class RequestStats:
+    """Database work done on behalf of one request"""
+    __slots__ = ('queries', 'query_seconds', 'translation_seconds', 'mongo_commands', 'mongo_seconds')
+
+    def __init__(self):
+        self.queries = self.mongo_commands = 0
+        self.query_seconds = self.translation_seconds = self.mongo_seconds = 0.0
+
+    def merge(self, other):
+        """Add the work of ``other``, e.g. done on a worker thread, to these stats"""
+        for name in self.__slots__:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+
+current_stats = contextvars.ContextVar('octofit_request_stats', default=None)
+
+
+def run_with_stats(function, *args):
+    """
+    Run ``function`` with stats of its own; for pool threads running in a
+    copy of the request's context. Returns ``(result, stats)``
+    """
+    stats = RequestStats()
+    current_stats.set(stats)
+    return function(*args), stats
+
+
+def merge_result(future):
+    """The result of a ``run_with_stats`` future, its stats added to the current request's"""
+    result, stats = future.result()
+    request_stats = current_stats.get()
+    if request_stats is not None:
+        request_stats.merge(stats)
+    return result
+
+
+class CommandTimer(monitoring.CommandListener):
+    """Add each Mongo command to the stats of the request that issued it"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._add(event)
+
+    def failed(self, event):
+        self._add(event)
+
+    def _add(self, event):
+        # Command events fire on the thread (and context) running the command
+        stats = current_stats.get()
+        if stats is not None:
+            stats.mongo_commands += 1
+            stats.mongo_seconds += event.duration_micros / 1e6
+
+
+def query_timer(execute, sql, params, many, context):
+    """``execute_wrapper`` counting ORM queries and timing their translation"""
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    mongo_before = stats.mongo_seconds
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        stats.queries += 1
+        stats.query_seconds += elapsed
+        stats.translation_seconds += max(0.0, elapsed - (stats.mongo_seconds - mongo_before))
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """``connection_created`` receiver adding ``query_timer`` to the connection once"""
+    if query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_timer)
+
+
+pool_metrics = PoolMetrics()
+command_timer = CommandTimer()
+_registered = False
+
+
+def register():
+    """
+    Register ``pool_metrics`` and ``command_timer`` for every client, and
+    ``query_timer`` for every database connection, created from now on
+    """
+    global _registered
+    if not _registered:
+        monitoring.register(pool_metrics)
+        monitoring.register(command_timer)
+        connection_created.connect(install_query_timer)
+        _registered = True
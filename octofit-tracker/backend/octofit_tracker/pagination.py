@@ -0,0 +1,46 @@
+from bson import ObjectId
+from bson.errors import InvalidId
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+
+class BaseCursorPagination(CursorPagination):
+    """
+    Keyset pagination with bounded page sizes.
+    Clients may ask for up to ``max_page_size`` rows with ``?page_size=``.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class ObjectIdCursorPagination(BaseCursorPagination):
+    """Pages in insertion order, keyed on ``_id``"""
+    ordering = '_id'
+
+    def decode_cursor(self, request):
+        # Cursor positions are encoded as strings; djongo only matches
+        # ``_id`` against real ObjectIds
+        cursor = super().decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            return cursor
+        try:
+            return cursor._replace(position=ObjectId(cursor.position))
+        except InvalidId:
+            raise NotFound(self.invalid_cursor_message)
+
+
+class ActivityCursorPagination(BaseCursorPagination):
+    """Pages activities newest first, keyed on ``date``"""
+    ordering = '-date'
+
+
+class LeaderboardCursorPagination(BaseCursorPagination):
+    """Pages the leaderboard from the top, keyed on ``rank``"""
+    ordering = 'rank'
+
+
+class RollupCursorPagination(BaseCursorPagination):
+    """Pages rollups oldest first, keyed on ``bucket``; a page covers a year of days"""
+    ordering = 'bucket'
+    page_size = 366
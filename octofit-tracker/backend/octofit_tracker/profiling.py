@@ -0,0 +1,104 @@
+"""
+On-demand cProfile captures of individual requests.
+
+With ``OCTOFIT_PROFILING`` enabled, a staff user can profile one request
+by sending ``X-Profile: 1`` or adding ``?profile=1``. The request runs
+under cProfile and the stats are saved as a ``RequestProfile``, whose id
+is returned in the ``X-Profile-Id`` header; the admin lists recent
+profiles, shows the hottest functions and downloads ``.prof`` files for
+``python -m pstats``, snakeviz or flameprof. Only the newest
+``OCTOFIT_PROFILE_KEEP`` profiles are kept.
+
+Async views are not profiled: cProfile follows one thread, which the
+event loop shares between requests. Streaming bodies are produced after
+the view returns and are not part of the profile.
+"""
+import cProfile
+import io
+import marshal
+import pstats
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from .models import RequestProfile
+from .mongo import get_collection
+
+
+def wants_profile(request):
+    """Whether a request asked to be profiled and may be"""
+    if not settings.OCTOFIT_PROFILING:
+        return False
+    if request.headers.get('X-Profile') != '1' and request.GET.get('profile') != '1':
+        return False
+    user = getattr(request, 'user', None)
+    return bool(user and user.is_authenticated and user.is_staff)
+
+
+class _LoadedStats:
+    """What ``pstats.Stats`` needs from a profiler, rebuilt from saved stats"""
+
+    def __init__(self, data):
+        self.stats = marshal.loads(data)
+
+    def create_stats(self):
+        pass
+
+
+def load_stats(data):
+    return pstats.Stats(_LoadedStats(data))
+
+
+def summarize(data, limit=40, sort='cumulative'):
+    """The ``limit`` hottest functions of saved stats as pstats text"""
+    output = io.StringIO()
+    stats = load_stats(data)
+    stats.stream = output
+    stats.sort_stats(sort).print_stats(limit)
+    return output.getvalue()
+
+
+def save_profile(request, response, profiler, seconds):
+    profiler.create_stats()
+    profile = RequestProfile.objects.create(
+        method=request.method,
+        path=request.get_full_path()[:2000],
+        status_code=response.status_code,
+        duration_ms=seconds * 1000,
+        username=request.user.get_username(),
+        stats=marshal.dumps(profiler.stats),
+    )
+    stale = [
+        document['_id'] for document in
+        get_collection(RequestProfile).find({}, {'_id': 1}).sort('created_at', -1).skip(settings.OCTOFIT_PROFILE_KEEP)
+    ]
+    if stale:
+        get_collection(RequestProfile).delete_many({'_id': {'$in': stale}})
+    return profile
+
+
+class ProfilingMiddleware:
+    """Run requests that ask for it under cProfile; must follow AuthenticationMiddleware"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self.get_response):
+            return self.get_response(request)
+        if not wants_profile(request):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        profile = save_profile(request, response, profiler, time.perf_counter() - started)
+        response['X-Profile-Id'] = str(profile._id)
+        return response
@@ -0,0 +1,136 @@
+"""
+Full leaderboard rebuilds from the activities.
+
+The users are split into contiguous email ranges of similar size (read
+off the unique email index) and each range is aggregated by one worker
+process in a single pass over its activities, archived ones included,
+writing unranked rows into a shadow collection. The shadow rows are then
+ranked in one walk over a (calories desc, email asc) index, given the
+leaderboard's indexes and swapped in with
+``renameCollection(dropTarget=True)``, so readers see the old board until
+the new one is complete.
+
+Activity writes made while a rebuild runs update the old board, which the
+swap throws away, so the users written meanwhile are recomputed on the
+new board afterwards: those whose old entry was updated since the rebuild
+started, read just before the swap, and those with activities created
+since. Updates and deletes landing between that read and the swap are
+still missed.
+"""
+import multiprocessing
+from pymongo import UpdateOne
+from django.utils import timezone
+from .aggregations import leaderboard_pipeline, leaderboard_row
+from .archive import archive_overlaps
+from .cache import invalidate_model
+from .leaderboard import recompute_users
+from .models import Activity, Leaderboard, User
+from .mongo import get_collection, get_database, init_worker, swap_in, worker_database
+
+SHADOW = 'leaderboard_rebuild'
+RANK_INDEX = [('total_calories', -1), ('user_email', 1)]
+
+
+def email_ranges(shards):
+    """``(low, high)`` email bounds splitting the users into ``shards`` ranges; None is open"""
+    users = get_collection(User)
+    total = users.count_documents({})
+    bounds = []
+    for shard in range(1, shards):
+        for user in users.find({}, {'email': 1}).sort('email', 1).skip(total * shard // shards).limit(1):
+            if not bounds or user['email'] > bounds[-1]:
+                bounds.append(user['email'])
+    edges = [None, *bounds, None]
+    return list(zip(edges, edges[1:]))
+
+
+def build_shard(task):
+    """
+    Worker entry point: aggregate the totals of one email range into the
+    shadow collection with the process's own client, so it is safe to run
+    in a forked process. Returns the rows written.
+    """
+    low, high, archived, now, batch_size = task
+    database = worker_database()
+    match = {}
+    if low is not None:
+        match['$gte'] = low
+    if high is not None:
+        match['$lt'] = high
+    pipeline = leaderboard_pipeline({'user_email': match} if match else None, ranked=False, archived=archived)
+
+    shadow, batch, written = database[SHADOW], [], 0
+    for row in database[Activity._meta.db_table].aggregate(pipeline, allowDiskUse=True):
+        batch.append({**leaderboard_row(row), 'rank': 0, 'updated_at': now})
+        if len(batch) >= batch_size:
+            shadow.insert_many(batch, ordered=False)
+            written += len(batch)
+            batch = []
+    if batch:
+        shadow.insert_many(batch, ordered=False)
+        written += len(batch)
+    return written
+
+
+def rank_shadow(batch_size, progress=None):
+    """Number the shadow rows in leaderboard order; returns the rows ranked"""
+    shadow = get_collection(SHADOW)
+    shadow.create_index(RANK_INDEX, name='rebuild_rank')
+    operations, ranked = [], 0
+    for rank, row in enumerate(shadow.find({}, {'_id': 1}).sort(RANK_INDEX).hint(RANK_INDEX), start=1):
+        operations.append(UpdateOne({'_id': row['_id']}, {'$set': {'rank': rank}}))
+        if len(operations) >= batch_size:
+            shadow.bulk_write(operations, ordered=False)
+            ranked += len(operations)
+            operations = []
+            if progress:
+                progress('rank', ranked)
+    if operations:
+        shadow.bulk_write(operations, ordered=False)
+        ranked += len(operations)
+    shadow.drop_index('rebuild_rank')
+    return ranked
+
+
+def rebuild_leaderboard(workers=1, batch_size=5000, progress=None):
+    """
+    Recompute the whole leaderboard and swap it in. ``progress(stage, count)``
+    is called as shards finish (``totals``) and rows are ranked (``rank``).
+    Returns the number of entries.
+    """
+    database = get_database()
+    database.drop_collection(SHADOW)
+    database.create_collection(SHADOW)
+    now = started = timezone.now()
+
+    # A few shards per worker keep every process busy until the end
+    shards = email_ranges(workers * 4 if workers > 1 else 1)
+    archived = archive_overlaps()
+    tasks = [(low, high, archived, now, batch_size) for low, high in shards]
+    written = 0
+    if workers == 1:
+        results = map(build_shard, tasks)
+    else:
+        pool = multiprocessing.Pool(workers, initializer=init_worker)
+        results = pool.imap_unordered(build_shard, tasks)
+    try:
+        for count in results:
+            written += count
+            if progress:
+                progress('totals', written)
+    finally:
+        if workers > 1:
+            pool.close()
+            pool.join()
+
+    ranked = rank_shadow(batch_size, progress)
+    # Users the live board was updated for since the start; the swap drops it
+    written = set(get_collection(Leaderboard).distinct('user_email', {'updated_at': {'$gte': started}}))
+    swap_in(SHADOW, Leaderboard)
+    written.update(get_collection(Activity).distinct('user_email', {'created_at': {'$gte': started}}))
+    if written:
+        recompute_users(sorted(written))
+        if progress:
+            progress('caught_up', len(written))
+    invalidate_model(Leaderboard)
+    return ranked
@@ -0,0 +1,242 @@
+"""
+Native pymongo reads for the hot viewset actions.
+
+Simple ORM filters cost more in djongo's SQL round trip (Django compiles
+SQL, djongo parses it back with sqlparse) than in Mongo itself. The
+queries here go straight to ``find`` with a projection of the serialized
+fields and an index hint, and yield plain dicts that the model serializers
+render like model instances.
+
+``DocumentQuery`` implements the part of the QuerySet API cursor
+pagination relies on (``order_by``, ``filter`` with range lookups and
+slicing), so the fast path plugs into the existing paginators. Views pick
+a path with ``settings.OCTOFIT_FAST_READS``.
+
+The ``*_by_*`` multi-gets below answer the batch actions with one ``$in``
+query each and return dicts keyed by the requested values, except
+``activities_by_users``: a per-user limit has no ``$in`` form that an
+index serves, so it runs one indexed query per user, concurrently.
+"""
+import contextvars
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pymongo.errors import OperationFailure
+from .archive import archive_horizon, horizon_cache, partitioned
+from .filters import activity_match, parse_date_param
+from .models import Activity, ActivityRollup, ArchivedActivity, Leaderboard, LeaderboardSnapshot, User, Workout
+from .mongo import get_collection, get_database
+from .monitoring import merge_result, run_with_stats
+from .serializers import (
+    ActivitySerializer,
+    ActivityRollupSerializer,
+    LeaderboardSerializer,
+    LeaderboardSnapshotSerializer,
+    UserSerializer,
+    WorkoutSerializer,
+    readable_fields,
+)
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='batch')
+
+LOOKUP_OPERATORS = {'gt': '$gt', 'gte': '$gte', 'lt': '$lt', 'lte': '$lte', 'in': '$in'}
+
+
+# BadValue, raised among others for a hint naming no index
+BAD_VALUE = 2
+
+
+def is_bad_hint(error):
+    """Whether an OperationFailure is the server rejecting an unknown index hint"""
+    return error.code == BAD_VALUE and 'hint provided does not correspond to an existing index' in str(error)
+
+
+def hydrate(document):
+    """Tag the naive UTC datetimes djongo stores as UTC"""
+    for name, value in document.items():
+        if isinstance(value, datetime) and value.tzinfo is None:
+            document[name] = value.replace(tzinfo=timezone.utc)
+    return document
+
+
+class DocumentQuery:
+    """A lazy ``find`` on a model's collection that yields hydrated dicts"""
+
+    def __init__(self, model, query=None, fields=None, hint=None, ordering=(), database=None):
+        self.model = model
+        self.query = query or {}
+        self.fields = fields
+        self.hint = hint
+        self.ordering = ordering
+        # Set to read from another thread than the request's djongo connection
+        self.database = database
+
+    def _clone(self, **changes):
+        options = {
+            'query': self.query, 'fields': self.fields,
+            'hint': self.hint, 'ordering': self.ordering, 'database': self.database,
+            **changes,
+        }
+        return DocumentQuery(self.model, **options)
+
+    def _condition(self, lookup, value):
+        name, _, operator = lookup.partition('__')
+        field = self.model._meta.get_field(name)
+        if operator:
+            if operator not in LOOKUP_OPERATORS:
+                raise ValueError(f'Unsupported lookup: {lookup}')
+            if operator == 'in':
+                return name, {'$in': [field.to_python(item) for item in value]}
+            return name, {LOOKUP_OPERATORS[operator]: field.to_python(value)}
+        return name, field.to_python(value)
+
+    def filter(self, **lookups):
+        conditions = [dict([self._condition(lookup, value)]) for lookup, value in lookups.items()]
+        if not conditions:
+            return self._clone()
+        return self._clone(query={'$and': [self.query, *conditions]} if self.query else {'$and': conditions})
+
+    def order_by(self, *fields):
+        return self._clone(ordering=fields)
+
+    def only(self, *fields):
+        return self._clone(fields=[name for name in self.fields if name in fields] if self.fields else fields)
+
+    def _cursor(self, hint, skip, limit):
+        projection = dict.fromkeys(self.fields, 1) if self.fields else None
+        database = self.database if self.database is not None else get_database()
+        cursor = database[self.model._meta.db_table].find(self.query, projection)
+        if self.ordering:
+            cursor = cursor.sort([(field.lstrip('-'), -1 if field.startswith('-') else 1) for field in self.ordering])
+        if hint:
+            cursor = cursor.hint(hint)
+        return cursor.skip(skip).limit(limit)
+
+    def _find(self, skip=0, limit=0):
+        try:
+            documents = list(self._cursor(self.hint, skip, limit))
+        except OperationFailure as error:
+            # A database without the index migrations rejects the hint;
+            # run unhinted rather than fail the request
+            if not self.hint or not is_bad_hint(error):
+                raise
+            logger.warning('Index %s missing on %s; run migrate', self.hint, self.model._meta.db_table)
+            documents = list(self._cursor(None, skip, limit))
+        return [hydrate(document) for document in documents]
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self._find(skip=key, limit=1)[0]
+        if key.step is not None:
+            raise ValueError('Slices with a step are not supported')
+        start = key.start or 0
+        if key.stop is None:
+            return self._find(skip=start)
+        # A zero limit means no limit to Mongo
+        return self._find(skip=start, limit=key.stop - start) if key.stop > start else []
+
+    def __iter__(self):
+        return iter(self._find())
+
+
+def activities_by_user(email, model=Activity):
+    return DocumentQuery(
+        model, {'user_email': email}, readable_fields(ActivitySerializer),
+        hint=[('user_email', 1), ('date', 1)], ordering=('-date',),
+    )
+
+
+def activities_by_type(activity_type, model=Activity):
+    return DocumentQuery(
+        model, {'activity_type': activity_type}, readable_fields(ActivitySerializer),
+        hint=[('activity_type', 1), ('date', 1)], ordering=('-date',),
+    )
+
+
+def rollups(scope, key, period):
+    return DocumentQuery(
+        ActivityRollup, {'scope': scope, 'key': key, 'period': period}, readable_fields(ActivityRollupSerializer),
+        hint=[('scope', 1), ('key', 1), ('period', 1), ('bucket', 1)], ordering=('bucket',),
+    )
+
+
+def leaderboard():
+    return DocumentQuery(
+        Leaderboard, {}, readable_fields(LeaderboardSerializer), hint=[('rank', 1)], ordering=('rank',),
+    )
+
+
+def leaderboard_by_team(team):
+    return DocumentQuery(
+        Leaderboard, {'team': team}, readable_fields(LeaderboardSerializer),
+        hint=[('team', 1), ('rank', 1)], ordering=('rank',),
+    )
+
+
+def board(board_id):
+    return DocumentQuery(
+        LeaderboardSnapshot, {'board': board_id}, readable_fields(LeaderboardSnapshotSerializer),
+        hint=[('board', 1), ('rank', 1)], ordering=('rank',),
+    )
+
+
+def workouts_by(field, value):
+    """Workouts filtered on ``difficulty`` or ``activity_type``"""
+    return DocumentQuery(
+        Workout, {field: value}, readable_fields(WorkoutSerializer),
+        hint=[(field, 1), ('_id', 1)], ordering=('_id',),
+    )
+
+
+def users_by_email(emails, fields=None):
+    """``{email: user}`` for the users among ``emails``"""
+    projection = dict.fromkeys(fields or readable_fields(UserSerializer), 1)
+    projection['email'] = 1
+    return {
+        document['email']: hydrate(document)
+        for document in get_collection(User).find({'email': {'$in': list(emails)}}, projection)
+    }
+
+
+def members_by_team(team_ids, fields=None):
+    """``{team_id: [user, ...]}`` for the members of the teams in ``team_ids``, in ``_id`` order"""
+    projection = dict.fromkeys(fields or readable_fields(UserSerializer), 1)
+    projection['team_ref_id'] = 1
+    members = defaultdict(list)
+    cursor = get_collection(User).find({'team_ref_id': {'$in': list(team_ids)}}, projection)
+    for document in cursor.sort([('team_ref_id', 1), ('_id', 1)]):
+        members[document.pop('team_ref_id')].append(hydrate(document))
+    return members
+
+
+def activities_by_users(emails, limit, fields=None, params=None):
+    """
+    ``{email: [activity, ...]}`` with the newest ``limit`` activities of each
+    user in ``emails``, narrowed by the shared activity query ``params``.
+    Each user is one hinted newest-first ``find`` on ``(user_email, date)``,
+    which reads the archive only when the hot activities fall short; the
+    finds run concurrently on a thread pool, as the dashboard sections do.
+    """
+    params = params or {}
+    match, start = activity_match(params), parse_date_param(params, 'start')
+    fields = [*{*(fields or readable_fields(ActivitySerializer)), 'date'}]
+    hint = [('user_email', 1), ('date', 1)]
+    database = get_database()
+
+    def newest(email):
+        query = {**match, 'user_email': email}
+        hot = DocumentQuery(Activity, query, fields, hint=hint, database=database)
+        archived = DocumentQuery(ArchivedActivity, query, fields, hint=hint, database=database)
+        return partitioned(hot, archived, start).order_by('-date')[:limit]
+
+    # The horizon is read here once, so the pool threads share it
+    with horizon_cache():
+        archive_horizon()
+        futures = {
+            email: _executor.submit(contextvars.copy_context().run, run_with_stats, newest, email)
+            for email in emails
+        }
+        return {email: merge_result(future) for email, future in futures.items()}
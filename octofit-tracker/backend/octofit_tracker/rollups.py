@@ -0,0 +1,279 @@
+"""
+Daily and weekly activity rollups per user and per team.
+
+Every activity write applies its delta to four ``ActivityRollup``
+documents (user and team, day and week) with ``$inc`` upserts, including
+the ``by_type`` breakdown, so a year of a user's or team's history is a
+few hundred small documents instead of every activity.
+
+Buckets are UTC days and ISO weeks starting on Monday. Team rollups
+count each activity for its owner's current team, on every path: a user
+who changes team has their weeks recomputed for the old and the new team
+(``move_member_rollups``), and ``rebuild_rollups`` recomputes everything
+from the activities and repairs any drift, e.g. duplicate buckets from
+concurrent first writes.
+
+``recompute_rollups`` is the idempotent alternative to the deltas used by
+the write-behind worker: it rebuilds the touched weeks of some users (and
+of their teams) from the activities. Team buckets are summed from the
+members' user buckets, with the members found through ``team_ref``.
+"""
+from datetime import datetime, timedelta, timezone
+from pymongo import ReplaceOne
+from django.utils import timezone as django_timezone
+from .aggregations import team_lookup
+from .archive import archive_overlaps, union_archive
+from .models import Activity, ActivityRollup, Team, User
+from .mongo import get_collection
+
+METRICS = ('calories', 'duration', 'distance', 'count')
+
+
+def day_start(value):
+    """Midnight UTC of an aware or naive-UTC datetime"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=timezone.utc)
+
+
+def week_start(value):
+    """Monday midnight UTC of the ISO week of a datetime"""
+    day = day_start(value)
+    return day - timedelta(days=day.weekday())
+
+
+def type_key(activity_type):
+    """Activity types become document keys; Mongo rejects dots and a leading $"""
+    return activity_type.replace('.', '_').lstrip('$') or '_'
+
+
+def empty_totals():
+    return dict.fromkeys(METRICS, 0)
+
+
+def add_totals(totals, calories, duration, distance, count):
+    totals['calories'] += calories
+    totals['duration'] += duration
+    totals['distance'] += distance or 0
+    totals['count'] += count
+
+
+def _bucket_keys(scope, key, date):
+    return [(scope, key, 'day', day_start(date)), (scope, key, 'week', week_start(date))]
+
+
+def record_rollup_changes(removed=(), added=()):
+    """
+    Apply the net delta of activity snapshots (``leaderboard.activity_snapshot``)
+    to the rollups, one upsert per touched bucket
+    """
+    emails = {snapshot['user_email'] for snapshot in (*removed, *added)}
+    teams = dict(User.objects.filter(email__in=list(emails)).values_list('email', 'team')) if emails else {}
+
+    deltas = {}
+    for snapshots, sign in ((removed, -1), (added, 1)):
+        for snapshot in snapshots:
+            keys = _bucket_keys('user', snapshot['user_email'], snapshot['date'])
+            if teams.get(snapshot['user_email']):
+                keys += _bucket_keys('team', teams[snapshot['user_email']], snapshot['date'])
+            for bucket_key in keys:
+                delta = deltas.setdefault(bucket_key, {})
+                for totals in (
+                    delta.setdefault('', empty_totals()),
+                    delta.setdefault(type_key(snapshot['activity_type']), empty_totals()),
+                ):
+                    add_totals(
+                        totals, sign * snapshot['calories'], sign * snapshot['duration'],
+                        sign * (snapshot['distance'] or 0), sign,
+                    )
+
+    now = django_timezone.now()
+    emptied = []
+    for (scope, key, period, bucket), delta in deltas.items():
+        changed = {activity_type: totals for activity_type, totals in delta.items() if any(totals.values())}
+        if not changed:
+            continue
+        # Every metric of a touched total is incremented, even by zero, so
+        # upserted buckets have the same shape as rebuilt ones
+        increments = {}
+        for activity_type, totals in {**changed, '': delta['']}.items():
+            for metric, value in totals.items():
+                increments[f'by_type.{activity_type}.{metric}' if activity_type else metric] = value
+        bucket_filter = {'scope': scope, 'key': key, 'period': period, 'bucket': bucket}
+        ActivityRollup.objects.mongo_update_one(
+            bucket_filter,
+            {'$inc': increments, '$set': {'updated_at': now}},
+            upsert=True,
+        )
+        if delta['']['count'] < 0:
+            emptied.append(bucket_filter)
+
+    # Buckets whose last activity moved away carry no information
+    if emptied:
+        ActivityRollup.objects.mongo_delete_many({'$or': emptied, 'count': {'$lte': 0}})
+
+
+def day_totals(match=None):
+    """
+    Per user, team, UTC day and activity type totals of the activities
+    matching ``match``, sorted by day, from one aggregation pass
+    """
+    pipeline = []
+    if match:
+        pipeline.append({'$match': match})
+    if archive_overlaps():
+        pipeline.extend(union_archive(match))
+    pipeline.extend(team_lookup())
+    pipeline.extend([
+        {'$group': {
+            '_id': {
+                'user': '$user_email',
+                'team': '$team',
+                'day': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$date'}},
+                'type': '$activity_type',
+            },
+            'calories': {'$sum': '$calories'},
+            'duration': {'$sum': '$duration'},
+            'distance': {'$sum': '$distance'},
+            'count': {'$sum': 1},
+        }},
+        {'$sort': {'_id.day': 1}},
+    ])
+    return Activity.objects.mongo_aggregate(pipeline, allowDiskUse=True)
+
+
+def rollup_documents(rows, now):
+    """
+    Fold sorted ``day_totals`` rows into rollup documents, yielding each day's
+    buckets when the day ends and each week's when the week ends, so only
+    one day and one week are held in memory
+    """
+    day_buckets, week_buckets = {}, {}
+    current_day = current_week = None
+
+    def documents(buckets):
+        for (scope, key, period, bucket), by_type in buckets.items():
+            totals = empty_totals()
+            for type_totals in by_type.values():
+                add_totals(totals, **type_totals)
+            yield {
+                'scope': scope, 'key': key, 'period': period, 'bucket': bucket,
+                **totals, 'by_type': by_type, 'updated_at': now,
+            }
+
+    for row in rows:
+        group = row['_id']
+        day = datetime.strptime(group['day'], '%Y-%m-%d').replace(tzinfo=timezone.utc)
+        week = day - timedelta(days=day.weekday())
+        if day != current_day:
+            yield from documents(day_buckets)
+            day_buckets, current_day = {}, day
+        if week != current_week:
+            yield from documents(week_buckets)
+            week_buckets, current_week = {}, week
+
+        owners = [('user', group['user'])]
+        if group.get('team'):
+            owners.append(('team', group['team']))
+        for scope, key in owners:
+            for period, bucket, buckets in (('day', day, day_buckets), ('week', week, week_buckets)):
+                totals = buckets.setdefault((scope, key, period, bucket), {}).setdefault(
+                    type_key(group['type']), empty_totals(),
+                )
+                add_totals(totals, row['calories'], row['duration'], row['distance'], row['count'])
+
+    yield from documents(day_buckets)
+    yield from documents(week_buckets)
+
+
+def _replace_buckets(scope, key, weeks, documents):
+    """Make ``documents`` the only ``scope``/``key`` buckets inside ``weeks``"""
+    collection = get_collection(ActivityRollup)
+    if documents:
+        collection.bulk_write([
+            ReplaceOne(
+                {'scope': scope, 'key': key, 'period': document['period'], 'bucket': document['bucket']},
+                document, upsert=True,
+            )
+            for document in documents
+        ], ordered=False)
+    stale = {
+        'scope': scope, 'key': key,
+        '$or': [{'bucket': {'$gte': week, '$lt': week + timedelta(days=7)}} for week in weeks],
+    }
+    if documents:
+        stale['$nor'] = [{'period': document['period'], 'bucket': document['bucket']} for document in documents]
+    collection.delete_many(stale)
+
+
+def team_members(team):
+    """Emails of the members of the team named ``team``, through the indexed ``team_ref``"""
+    team_id = Team.objects.filter(name=team).values_list('pk', flat=True).first()
+    if team_id is None:
+        # A team string without a Team document
+        return list(User.objects.filter(team=team).values_list('email', flat=True))
+    return list(User.objects.filter(team_ref_id=team_id).values_list('email', flat=True))
+
+
+def recompute_team_rollups(team, weeks, now=None):
+    """Rebuild the team's buckets of ``weeks`` from its current members' user buckets"""
+    now = now or django_timezone.now()
+    buckets = {}
+    member_buckets = get_collection(ActivityRollup).find({
+        'scope': 'user', 'key': {'$in': team_members(team)},
+        '$or': [{'bucket': {'$gte': week, '$lt': week + timedelta(days=7)}} for week in weeks],
+    })
+    for member_bucket in member_buckets:
+        bucket = buckets.setdefault((member_bucket['period'], member_bucket['bucket']), {})
+        for activity_type, type_totals in member_bucket['by_type'].items():
+            add_totals(bucket.setdefault(activity_type, empty_totals()), **type_totals)
+
+    documents = []
+    for (period, bucket_start), by_type in buckets.items():
+        totals = empty_totals()
+        for type_totals in by_type.values():
+            add_totals(totals, **type_totals)
+        documents.append({
+            'scope': 'team', 'key': team, 'period': period, 'bucket': bucket_start,
+            **totals, 'by_type': by_type, 'updated_at': now,
+        })
+    _replace_buckets('team', team, sorted(weeks), documents)
+
+
+def recompute_rollups(user_days):
+    """
+    Rebuild the buckets of the weeks around ``{email: [day, ...]}`` from the
+    activities, for each user and then for their current team; safe to repeat
+    """
+    now = django_timezone.now()
+    touched_teams = {}
+    teams = dict(User.objects.filter(email__in=list(user_days)).values_list('email', 'team'))
+    for email, days in user_days.items():
+        weeks = sorted({week_start(day) for day in days})
+        match = {
+            'user_email': email,
+            '$or': [{'date': {'$gte': week, '$lt': week + timedelta(days=7)}} for week in weeks],
+        }
+        documents = [
+            document for document in rollup_documents(day_totals(match), now)
+            if document['scope'] == 'user'
+        ]
+        _replace_buckets('user', email, weeks, documents)
+        if teams.get(email):
+            touched_teams.setdefault(teams[email], set()).update(weeks)
+
+    for team, weeks in touched_teams.items():
+        recompute_team_rollups(team, weeks, now)
+
+
+def move_member_rollups(email, old_team, new_team):
+    """Move a member's history between team rollups after a team change"""
+    weeks = [
+        week.replace(tzinfo=timezone.utc)
+        for week in get_collection(ActivityRollup).distinct('bucket', {'scope': 'user', 'key': email, 'period': 'week'})
+    ]
+    if not weeks:
+        return
+    for team in (old_team, new_team):
+        if team:
+            recompute_team_rollups(team, weeks)
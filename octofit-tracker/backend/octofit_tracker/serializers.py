@@ -1,5 +1,19 @@
+from datetime import timedelta, timezone as dt_timezone
+from bson import ObjectId
+from django.db import models
+from django.utils import timezone
 from rest_framework import serializers
-from .models import User, Team, Activity, Leaderboard, Workout
+from rest_framework.settings import api_settings
+from .models import User, Team, Activity, ActivityRollup, Leaderboard, LeaderboardSnapshot, Workout
+
+
+def readable_fields(serializer_class):
+    """Names of the fields a model serializer renders"""
+    extra_kwargs = getattr(serializer_class.Meta, 'extra_kwargs', {})
+    return [
+        name for name in serializer_class.Meta.fields
+        if not extra_kwargs.get(name, {}).get('write_only')
+    ]
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -16,14 +30,55 @@ class UserSerializer(serializers.ModelSerializer):
 class TeamSerializer(serializers.ModelSerializer):
     class Meta:
         model = Team
-        fields = ['_id', 'name', 'description', 'created_at', 'members']
+        fields = ['_id', 'name', 'description', 'created_at', 'members', 'member_count']
         extra_kwargs = {
             '_id': {'read_only': True},
-            'created_at': {'read_only': True}
+            'created_at': {'read_only': True},
+            'members': {'read_only': True},
+            'member_count': {'read_only': True}
         }
 
 
-class ActivitySerializer(serializers.ModelSerializer):
+class DocumentSerializer(serializers.ModelSerializer):
+    """Model serializer that renders model instances and raw documents alike"""
+    _id = serializers.CharField(read_only=True)
+
+
+class ActivityListSerializer(serializers.ListSerializer):
+    """
+    Validates activities item by item and keeps the valid ones.
+    Invalid items are collected in ``rejected`` as ``(index, errors)`` pairs
+    instead of failing the whole batch; ``accepted`` holds the indexes kept.
+    """
+    batch_size = 500
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            return super().to_internal_value(data)
+
+        if self.max_length is not None and len(data) > self.max_length:
+            message = self.error_messages['max_length'].format(max_length=self.max_length)
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [message]
+            }, code='max_length')
+
+        self.accepted, self.rejected, valid = [], [], []
+        for index, item in enumerate(data):
+            try:
+                valid.append(self.child.run_validation(item))
+                self.accepted.append(index)
+            except serializers.ValidationError as exc:
+                self.rejected.append((index, exc.detail))
+        return valid
+
+    def create(self, validated_data):
+        # djongo inserts ``_id: None`` for every row of a bulk insert, so ids
+        # are assigned client-side
+        activities = [Activity(_id=ObjectId(), **attrs) for attrs in validated_data]
+        return Activity.objects.bulk_create(activities, batch_size=self.batch_size)
+
+
+class ActivitySerializer(DocumentSerializer):
     class Meta:
         model = Activity
         fields = ['_id', 'user_email', 'activity_type', 'duration', 'distance', 'calories', 'date', 'created_at']
@@ -31,9 +86,17 @@ class ActivitySerializer(serializers.ModelSerializer):
             '_id': {'read_only': True},
             'created_at': {'read_only': True}
         }
+        list_serializer_class = ActivityListSerializer
 
 
-class LeaderboardSerializer(serializers.ModelSerializer):
+class ActivityRollupSerializer(DocumentSerializer):
+    class Meta:
+        model = ActivityRollup
+        fields = ['_id', 'scope', 'key', 'period', 'bucket', 'calories', 'duration', 'distance', 'count', 'by_type', 'updated_at']
+        read_only_fields = fields
+
+
+class LeaderboardSerializer(DocumentSerializer):
     class Meta:
         model = Leaderboard
         fields = ['_id', 'user_email', 'user_name', 'team', 'total_calories', 'total_activities', 'total_duration', 'rank', 'updated_at']
@@ -43,7 +106,14 @@ class LeaderboardSerializer(serializers.ModelSerializer):
         }
 
 
-class WorkoutSerializer(serializers.ModelSerializer):
+class LeaderboardSnapshotSerializer(DocumentSerializer):
+    class Meta:
+        model = LeaderboardSnapshot
+        fields = ['_id', 'board', 'scope', 'window', 'metric', 'period_start', 'user_email', 'user_name', 'team', 'value', 'rank', 'updated_at']
+        read_only_fields = fields
+
+
+class WorkoutSerializer(DocumentSerializer):
     class Meta:
         model = Workout
         fields = ['_id', 'name', 'description', 'activity_type', 'duration', 'difficulty', 'calories_estimate', 'created_at']
@@ -51,3 +121,70 @@ class WorkoutSerializer(serializers.ModelSerializer):
             '_id': {'read_only': True},
             'created_at': {'read_only': True}
         }
+
+
+class RowConverter:
+    """
+    Read-only, list-optimized rendering of a model serializer's fields.
+
+    Converts ``.values()`` rows, raw Mongo documents (naive UTC datetimes)
+    or model instances to the representation ``serializer_class`` produces,
+    without building per-field serializer objects for every row. Use the
+    model serializer for writes and anything with custom fields.
+    """
+
+    def __init__(self, serializer_class):
+        model = serializer_class.Meta.model
+        self.fields = readable_fields(serializer_class)
+        self.datetime_fields = [
+            name for name in self.fields
+            if isinstance(model._meta.get_field(name), models.DateTimeField)
+        ]
+
+    def __call__(self, row, fields=None):
+        return self.many([row], fields)[0]
+
+    def many(self, rows, fields=None):
+        """Render ``rows``, limited to ``fields`` (in declaration order) if given"""
+        current = timezone.get_current_timezone()
+        in_utc = current.utcoffset(None) == timedelta(0)
+        if fields is None:
+            fields, datetime_fields = self.fields, self.datetime_fields
+        else:
+            datetime_fields = [name for name in self.datetime_fields if name in fields]
+        data = []
+        for row in rows:
+            if isinstance(row, dict):
+                item = {name: row.get(name) for name in fields}
+            else:
+                item = {name: getattr(row, name) for name in fields}
+            if '_id' in item:
+                item['_id'] = str(item['_id'])
+            for name in datetime_fields:
+                value = item[name]
+                if value is None:
+                    continue
+                if in_utc:
+                    # Common case: UTC values only need their suffix fixed
+                    text = value.isoformat()
+                    if value.tzinfo is None:
+                        item[name] = text + 'Z'
+                    elif text.endswith('+00:00'):
+                        item[name] = text[:-6] + 'Z'
+                    else:
+                        item[name] = value.astimezone(dt_timezone.utc).isoformat()[:-6] + 'Z'
+                else:
+                    if value.tzinfo is None:
+                        value = value.replace(tzinfo=dt_timezone.utc)
+                    item[name] = value.astimezone(current).isoformat()
+            data.append(item)
+        return data
+
+
+user_rows = RowConverter(UserSerializer)
+team_rows = RowConverter(TeamSerializer)
+activity_rows = RowConverter(ActivitySerializer)
+rollup_rows = RowConverter(ActivityRollupSerializer)
+leaderboard_rows = RowConverter(LeaderboardSerializer)
+snapshot_rows = RowConverter(LeaderboardSnapshotSerializer)
+workout_rows = RowConverter(WorkoutSerializer)
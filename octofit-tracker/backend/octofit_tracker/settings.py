@@ -51,12 +51,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so it times the whole stack
+    'octofit_tracker.middleware.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'octofit_tracker.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -85,19 +88,92 @@ WSGI_APPLICATION = 'octofit_tracker.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
+# MongoClient options, tunable per deployment. Pool sizes apply per process
+# (and per event loop for the async views' Motor clients); unset options
+# keep the pymongo defaults.
+MONGO_CLIENT = {
+    'host': os.getenv('MONGO_HOST', 'localhost'),
+    'port': int(os.getenv('MONGO_PORT', 27017)),
+}
+for option, variable, cast in (
+    ('maxPoolSize', 'MONGO_MAX_POOL_SIZE', int),
+    ('minPoolSize', 'MONGO_MIN_POOL_SIZE', int),
+    ('maxIdleTimeMS', 'MONGO_MAX_IDLE_TIME_MS', int),
+    ('waitQueueTimeoutMS', 'MONGO_WAIT_QUEUE_TIMEOUT_MS', int),
+    ('serverSelectionTimeoutMS', 'MONGO_SERVER_SELECTION_TIMEOUT_MS', int),
+    ('connectTimeoutMS', 'MONGO_CONNECT_TIMEOUT_MS', int),
+    ('socketTimeoutMS', 'MONGO_SOCKET_TIMEOUT_MS', int),
+    ('readPreference', 'MONGO_READ_PREFERENCE', str),
+    ('compressors', 'MONGO_COMPRESSORS', str),
+    ('appname', 'MONGO_APP_NAME', str),
+):
+    if os.getenv(variable):
+        MONGO_CLIENT[option] = cast(os.getenv(variable))
+
+# Open connections when a WSGI/ASGI worker starts instead of on its first requests
+MONGO_PREWARM = os.getenv('MONGO_PREWARM', '').lower() in ('1', 'true', 'yes')
+
 DATABASES = {
     'default': {
         'ENGINE': 'djongo',
         'NAME': 'octofit_db',
         'ENFORCE_SCHEMA': False,
-        'CLIENT': {
-            'host': 'localhost',
-            'port': 27017,
-        }
+        # djongo shares one MongoClient per database and closes it whenever a
+        # connection is closed, which would drop the whole pool after every
+        # request; keep connections for the life of the process instead
+        'CONN_MAX_AGE': None,
+        'CLIENT': MONGO_CLIENT,
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# Local memory by default; set REDIS_URL (requires the redis package) to
+# share cached responses between workers (see OCTOFIT_RESPONSE_CACHE).
+
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'octofit',
+        }
+    }
+
+# Serve hot read actions with native pymongo queries instead of the ORM
+OCTOFIT_FAST_READS = os.getenv('OCTOFIT_FAST_READS', 'true').lower() in ('1', 'true', 'yes')
+
+# Cache hot read responses. Writes retire cached responses through the
+# cache, so this needs a cache shared by every process (REDIS_URL): with
+# local memory, other workers and the management commands never see them.
+OCTOFIT_RESPONSE_CACHE = os.getenv('OCTOFIT_RESPONSE_CACHE', 'true' if REDIS_URL else '').lower() in ('1', 'true', 'yes')
+
+# Seconds a cached API response may be served before it is rebuilt
+OCTOFIT_RESPONSE_CACHE_TIMEOUT = int(os.getenv('OCTOFIT_RESPONSE_CACHE_TIMEOUT', 300))
+
+# Queue leaderboard and rollup updates for run_write_behind workers instead
+# of applying them while the client waits
+OCTOFIT_WRITE_BEHIND = os.getenv('OCTOFIT_WRITE_BEHIND', '').lower() in ('1', 'true', 'yes')
+# Attempts before a queued task is given up and kept as failed
+OCTOFIT_WRITE_BEHIND_MAX_ATTEMPTS = int(os.getenv('OCTOFIT_WRITE_BEHIND_MAX_ATTEMPTS', 5))
+
+# Report app, ORM, djongo translation and Mongo time in a Server-Timing header
+OCTOFIT_SERVER_TIMING = os.getenv('OCTOFIT_SERVER_TIMING', 'true').lower() in ('1', 'true', 'yes')
+
+# Let staff users profile single requests with X-Profile: 1 or ?profile=1
+OCTOFIT_PROFILING = os.getenv('OCTOFIT_PROFILING', '').lower() in ('1', 'true', 'yes')
+# Newest request profiles to keep
+OCTOFIT_PROFILE_KEEP = int(os.getenv('OCTOFIT_PROFILE_KEEP', 50))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -139,6 +215,15 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Django REST Framework
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'octofit_tracker.pagination.ObjectIdCursorPagination',
+    'DEFAULT_RENDERER_CLASSES': [
+        'octofit_tracker.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_METHODS = [
@@ -0,0 +1,77 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .cache import invalidate_model
+from .models import User, Team, Leaderboard, Workout
+from .rollups import move_member_rollups
+
+
+@receiver(post_save, sender=Leaderboard)
+@receiver(post_save, sender=Workout)
+def invalidate_on_save(sender, instance, **kwargs):
+    """Retire cached responses built from the saved model"""
+    modified = getattr(instance, 'updated_at', None) or instance.created_at
+    invalidate_model(sender, modified=modified)
+
+
+@receiver(post_delete, sender=Leaderboard)
+@receiver(post_delete, sender=Workout)
+def invalidate_on_delete(sender, instance, **kwargs):
+    """Retire cached responses built from the deleted model"""
+    invalidate_model(sender)
+
+
+def sync_team_members(team_id):
+    """Rebuild a team's member list and count from the indexed User.team_ref"""
+    emails = list(User.objects.filter(team_ref_id=team_id).values_list('email', flat=True))
+    Team.objects.filter(pk=team_id).update(members=emails, member_count=len(emails))
+
+
+@receiver(pre_save, sender=User)
+def link_user_team(sender, instance, **kwargs):
+    """Point team_ref at the team named by the user's team string"""
+    if not instance.team:
+        instance.team_ref = None
+    elif instance.team_ref_id is None or instance.team != getattr(instance, '_loaded_team', None):
+        instance.team_ref = Team.objects.filter(name=instance.team).first()
+
+
+@receiver(post_save, sender=User)
+def update_team_membership(sender, instance, created, **kwargs):
+    """Refresh the denormalized members and rollups of the teams a user left or joined"""
+    previous_team_id = getattr(instance, '_loaded_team_ref_id', None)
+    email_changed = instance.email != getattr(instance, '_loaded_email', instance.email)
+    if previous_team_id != instance.team_ref_id or email_changed:
+        for team_id in {previous_team_id, instance.team_ref_id} - {None}:
+            sync_team_members(team_id)
+    previous_team = getattr(instance, '_loaded_team', None)
+    if not created and previous_team != instance.team:
+        move_member_rollups(instance.email, previous_team, instance.team)
+
+    instance._loaded_team = instance.team
+    instance._loaded_team_ref_id = instance.team_ref_id
+    instance._loaded_email = instance.email
+
+
+@receiver(post_delete, sender=User)
+def remove_team_member(sender, instance, **kwargs):
+    """Drop a deleted user from their team's members"""
+    if instance.team_ref_id:
+        sync_team_members(instance.team_ref_id)
+
+
+@receiver(post_save, sender=Team)
+def link_team_members(sender, instance, created, **kwargs):
+    """Adopt users already naming a new team and carry renames over to members"""
+    previous_name = getattr(instance, '_loaded_name', instance.name)
+    if created:
+        if User.objects.filter(team=instance.name, team_ref__isnull=True).update(team_ref=instance):
+            sync_team_members(instance.pk)
+    elif previous_name != instance.name:
+        User.objects.filter(team_ref=instance).update(team=instance.name)
+    instance._loaded_name = instance.name
+
+
+@receiver(post_delete, sender=Team)
+def clear_team_members(sender, instance, **kwargs):
+    """Clear the team string of users whose team was deleted"""
+    User.objects.filter(team=instance.name).update(team=None)
@@ -0,0 +1,136 @@
+"""
+Deterministic synthetic data for load testing.
+
+Every user draws from its own RNGs seeded with ``(seed, stream, user_index)``,
+so a dataset is identical whatever the number of worker processes. Documents
+are built in djongo's storage format (naive UTC datetimes, ObjectId
+``_id``) and written straight to the collections with ``insert_many``.
+"""
+import random
+from itertools import accumulate
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from .models import User, Activity
+from .mongo import get_collection, worker_database
+
+ACTIVITY_PROFILES = {
+    # weight, mean and spread of duration (minutes), kcal per minute, km/h
+    'Running': (30, 35, 12, 10.5, 10.0),
+    'Cycling': (20, 60, 20, 8.0, 22.0),
+    'Weightlifting': (18, 50, 15, 6.0, None),
+    'Yoga': (12, 45, 15, 3.5, None),
+    'Swimming': (10, 40, 10, 9.0, 2.5),
+    'Boxing': (10, 40, 12, 11.0, None),
+}
+ACTIVITY_TYPES = list(ACTIVITY_PROFILES)
+ACTIVITY_CUM_WEIGHTS = list(accumulate(profile[0] for profile in ACTIVITY_PROFILES.values()))
+
+# Workouts cluster before work and in the early evening
+HOURS = list(range(24))
+HOUR_CUM_WEIGHTS = list(accumulate([1, 1, 1, 1, 2, 6, 10, 9, 5, 3, 3, 4, 5, 4, 3, 3, 5, 9, 10, 8, 5, 3, 2, 1]))
+
+
+def user_rng(seed, stream, user_index):
+    return random.Random(f'{seed}:{stream}:{user_index}')
+
+
+def user_email(user_index):
+    return f'user{user_index}@octofit.test'
+
+
+def team_documents(count, now):
+    return [
+        {
+            '_id': ObjectId(),
+            'name': f'Team {index + 1}',
+            'description': 'Synthetic load-test team',
+            'created_at': now,
+            'members': '[]',
+            'member_count': 0,
+        }
+        for index in range(count)
+    ]
+
+
+def user_documents(first, last, teams, seed, now):
+    """Build users ``first..last-1``, spread unevenly across ``teams``"""
+    team_weights = [1.0 / (rank + 1) for rank in range(len(teams))]
+    documents = []
+    for index in range(first, last):
+        rng = user_rng(seed, 'user', index)
+        team = rng.choices(teams, team_weights)[0] if teams else None
+        documents.append({
+            '_id': ObjectId(),
+            'name': f'User {index}',
+            'email': user_email(index),
+            'password': 'synthetic',
+            'team': team['name'] if team else None,
+            'team_ref_id': team['_id'] if team else None,
+            'created_at': now,
+        })
+    return documents
+
+
+def activity_documents(user_index, count, seed, now, days):
+    """Build ``count`` activities for one user over the last ``days`` days"""
+    rng = user_rng(seed, 'activities', user_index)
+    fitness = rng.lognormvariate(0, 0.25)
+    favourite = rng.choices(ACTIVITY_TYPES, cum_weights=ACTIVITY_CUM_WEIGHTS)[0]
+    email = user_email(user_index)
+
+    documents = []
+    for _ in range(count):
+        activity_type = favourite if rng.random() < 0.4 else rng.choices(ACTIVITY_TYPES, cum_weights=ACTIVITY_CUM_WEIGHTS)[0]
+        _, mean, spread, kcal_per_minute, speed = ACTIVITY_PROFILES[activity_type]
+        duration = max(5, int(rng.gauss(mean, spread)))
+        day = now - timedelta(days=rng.randrange(days))
+        date = day.replace(
+            hour=rng.choices(HOURS, cum_weights=HOUR_CUM_WEIGHTS)[0],
+            minute=rng.randrange(60),
+            second=rng.randrange(60),
+            microsecond=0,
+        )
+        documents.append({
+            '_id': ObjectId(),
+            'user_email': email,
+            'activity_type': activity_type,
+            'duration': duration,
+            'distance': round(duration / 60 * speed * fitness, 2) if speed else None,
+            'calories': int(duration * kcal_per_minute * fitness),
+            'date': date,
+            'created_at': now,
+        })
+    return documents
+
+
+def utc_now():
+    """Current time in djongo's storage format"""
+    return datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+
+
+def insert_activity_shard(task):
+    """
+    Worker entry point: generate and insert activities for a range of users
+    with the process's own client, so it is safe to run in a forked process.
+    """
+    first, last, per_user, seed, days, now, batch_size = task
+    collection = worker_database()[Activity._meta.db_table]
+    batch, inserted = [], 0
+    for index in range(first, last):
+        batch.extend(activity_documents(index, per_user, seed, now, days))
+        if len(batch) >= batch_size:
+            collection.insert_many(batch, ordered=False)
+            inserted += len(batch)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+        inserted += len(batch)
+    return inserted
+
+
+def insert_users(teams, count, seed, now, batch_size):
+    """Insert ``count`` users in batches"""
+    collection = get_collection(User)
+    for first in range(0, count, batch_size):
+        last = min(first + batch_size, count)
+        collection.insert_many(user_documents(first, last, teams, seed, now), ordered=False)
@@ -1,8 +1,42 @@
-from django.test import TestCase
+import json
+import threading
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import mock
+from asgiref.sync import async_to_sync
+from bson import ObjectId
+from pymongo import monitoring
+from pymongo.errors import OperationFailure
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
-from .models import User, Team, Activity, Leaderboard, Workout
+from .archive import archive_horizon, archive_overlaps, horizon_cache
+from .async_views import ThreadedDatabase, get_async_database
+from .benchmarks import SCENARIOS, compare_serialization, percentile
+from .cache import check_shared_cache
+from .dashboard import build_dashboard
+from .management.commands.check_indexes import plan_stages
+from .leaderboard import activity_snapshot, record_activity_changes
+from .models import (
+    User, Team, Activity, ActivityRollup, ArchivedActivity, Leaderboard, LeaderboardSnapshot, RequestProfile, Workout,
+    WriteBehindTask,
+)
+from .mongo import get_collection, get_database
+from .monitoring import PoolMetrics, RequestStats, command_timer, current_stats, pool_metrics, query_timer
+from .profiling import summarize
+from .rebuild import email_ranges, rank_shadow
+from .renderers import ORJSONRenderer
+from .repository import DocumentQuery
+from .serializers import ActivitySerializer, activity_rows
+from .write_behind import claim, enqueue, process
 
 
 class UserModelTest(TestCase):
@@ -204,3 +238,1451 @@ class WorkoutAPITest(APITestCase):
         """Test filtering workouts by difficulty"""
         response = self.client.get('/workouts/by_difficulty/?difficulty=Intermediate')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class LeaderboardEngineTest(APITestCase):
+    """Test cases for incremental leaderboard updates on activity writes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        User.objects.create(name='Runner', email='runner@example.com', password='pw', team='Team A')
+        User.objects.create(name='Walker', email='walker@example.com', password='pw', team='Team B')
+
+    def post_activity(self, email, calories, duration=30):
+        data = {
+            'user_email': email,
+            'activity_type': 'Running',
+            'duration': duration,
+            'calories': calories,
+            'date': timezone.now().isoformat()
+        }
+        return self.client.post('/activities/', data, format='json')
+
+    def ranks(self):
+        return {entry.user_email: entry.rank for entry in Leaderboard.objects.all()}
+
+    def test_create_activity_updates_totals(self):
+        """Test posting activities accumulates the user's totals"""
+        self.post_activity('runner@example.com', 300, duration=20)
+        self.post_activity('runner@example.com', 200, duration=10)
+        entry = Leaderboard.objects.get(user_email='runner@example.com')
+        self.assertEqual(entry.total_calories, 500)
+        self.assertEqual(entry.total_activities, 2)
+        self.assertEqual(entry.total_duration, 30)
+        self.assertEqual(entry.user_name, 'Runner')
+        self.assertEqual(entry.team, 'Team A')
+
+    def test_overtaking_reranks(self):
+        """Test a user overtaking another swaps their ranks"""
+        self.post_activity('runner@example.com', 300)
+        self.post_activity('walker@example.com', 100)
+        self.assertEqual(self.ranks(), {'runner@example.com': 1, 'walker@example.com': 2})
+
+        self.post_activity('walker@example.com', 400)
+        self.assertEqual(self.ranks(), {'runner@example.com': 2, 'walker@example.com': 1})
+
+    def test_delete_activity_reverts_totals(self):
+        """Test deleting an activity subtracts it and re-ranks"""
+        self.post_activity('runner@example.com', 300)
+        self.post_activity('walker@example.com', 400)
+        activity = Activity.objects.get(user_email='walker@example.com')
+        response = self.client.delete(f'/activities/{activity._id}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        entry = Leaderboard.objects.get(user_email='walker@example.com')
+        self.assertEqual(entry.total_calories, 0)
+        self.assertEqual(entry.total_activities, 0)
+        self.assertEqual(self.ranks(), {'runner@example.com': 1, 'walker@example.com': 2})
+
+
+class ActivityBulkAPITest(APITestCase):
+    """Test cases for bulk activity ingestion"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.date = timezone.now().isoformat()
+
+    def activity(self, email, calories=100):
+        return {
+            'user_email': email,
+            'activity_type': 'Cycling',
+            'duration': 45,
+            'distance': 12.5,
+            'calories': calories,
+            'date': self.date
+        }
+
+    def test_bulk_create_json_array(self):
+        """Test creating activities from a JSON array"""
+        data = [self.activity('a@example.com'), self.activity('b@example.com', 200)]
+        response = self.client.post('/activities/bulk/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['accepted'], 2)
+        self.assertEqual(Activity.objects.count(), 2)
+        self.assertEqual(Leaderboard.objects.get(user_email='b@example.com').rank, 1)
+
+    def test_bulk_create_ndjson_reports_rejected_rows(self):
+        """Test NDJSON ingestion keeps valid rows and reports invalid ones"""
+        invalid = self.activity('not-an-email')
+        body = '\n'.join(json.dumps(row) for row in [self.activity('a@example.com'), invalid]) + '\n'
+        response = self.client.post('/activities/bulk/', body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data['accepted'], 1)
+        self.assertEqual(response.data['rejected'], 1)
+        self.assertEqual(response.data['results'][1]['status'], 'rejected')
+        self.assertIn('user_email', response.data['results'][1]['errors'])
+        self.assertEqual(Activity.objects.count(), 1)
+
+
+class PaginationAPITest(APITestCase):
+    """Test cases for cursor pagination on list endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        for i in range(3):
+            Workout.objects.create(
+                name=f'Workout {i}',
+                description='Paged workout',
+                activity_type='Running',
+                duration=30,
+                difficulty='Beginner',
+                calories_estimate=300
+            )
+            Activity.objects.create(
+                user_email='pager@example.com',
+                activity_type='Running',
+                duration=30,
+                calories=100 + i,
+                date=timezone.now() - timedelta(days=i)
+            )
+
+    def collect(self, url):
+        """Follow next links and return every page's results"""
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data['results'])
+            url = response.data['next']
+        return pages
+
+    def test_workouts_paginate_by_id(self):
+        """Test workouts are split into bounded pages keyed on _id"""
+        pages = self.collect('/workouts/?page_size=2')
+        self.assertEqual([len(page) for page in pages], [2, 1])
+        names = [workout['name'] for page in pages for workout in page]
+        self.assertEqual(names, ['Workout 0', 'Workout 1', 'Workout 2'])
+
+    def test_by_user_paginates_newest_first(self):
+        """Test custom actions are paginated with the viewset's ordering"""
+        pages = self.collect('/activities/by_user/?email=pager@example.com&page_size=2')
+        self.assertEqual([len(page) for page in pages], [2, 1])
+        calories = [activity['calories'] for page in pages for activity in page]
+        self.assertEqual(calories, [100, 101, 102])
+
+    def test_page_size_is_bounded(self):
+        """Test page_size cannot exceed the paginator's maximum"""
+        response = self.client.get('/workouts/?page_size=100000')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 3)
+
+
+class ActivityExportAPITest(APITestCase):
+    """Test cases for streaming activity exports"""
+
+    def setUp(self):
+        self.client = APIClient()
+        now = timezone.now()
+        for email, activity_type, days_ago in [
+            ('a@example.com', 'Running', 1),
+            ('a@example.com', 'Yoga', 2),
+            ('b@example.com', 'Running', 40),
+        ]:
+            Activity.objects.create(
+                user_email=email,
+                activity_type=activity_type,
+                duration=30,
+                calories=200,
+                date=now - timedelta(days=days_ago)
+            )
+
+    def read(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_export_ndjson_with_filters(self):
+        """Test NDJSON export honours email and type filters"""
+        response = self.client.get('/activities/export/?email=a@example.com&type=Running')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['activity_type'], 'Running')
+
+    def test_export_csv_with_date_range(self):
+        """Test CSV export writes a header and honours the date window"""
+        start = (timezone.now() - timedelta(days=7)).date().isoformat()
+        response = self.client.get(f'/activities/export/?export_format=csv&start={start}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = self.read(response).splitlines()
+        self.assertTrue(lines[0].startswith('_id,user_email,activity_type'))
+        self.assertEqual(len(lines), 3)
+
+    def test_export_rejects_unknown_format(self):
+        """Test an unsupported export format is rejected"""
+        response = self.client.get('/activities/export/?export_format=xml')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ActivityStatsAPITest(APITestCase):
+    """Test cases for server-side activity aggregation"""
+
+    def setUp(self):
+        self.client = APIClient()
+        User.objects.create(name='A', email='a@example.com', password='pw', team='Team A')
+        User.objects.create(name='B', email='b@example.com', password='pw', team='Team B')
+        now = timezone.now()
+        for email, calories, days_ago in [
+            ('a@example.com', 100, 1),
+            ('a@example.com', 300, 2),
+            ('b@example.com', 50, 1),
+            ('b@example.com', 999, 60),
+        ]:
+            Activity.objects.create(
+                user_email=email,
+                activity_type='Running',
+                duration=30,
+                calories=calories,
+                date=now - timedelta(days=days_ago)
+            )
+        self.start = (now - timedelta(days=7)).date().isoformat()
+
+    def test_stats_by_user(self):
+        """Test totals and averages per user within a date window"""
+        response = self.client.get(f'/activities/stats/?group_by=user&start={self.start}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = {row['user']: row for row in response.data['results']}
+        self.assertEqual(results['a@example.com']['count'], 2)
+        self.assertEqual(results['a@example.com']['total_calories'], 400)
+        self.assertEqual(results['a@example.com']['avg_calories'], 200)
+        self.assertEqual(results['b@example.com']['total_calories'], 50)
+
+    def test_stats_by_team_and_type(self):
+        """Test grouping by several dimensions at once"""
+        response = self.client.get('/activities/stats/?group_by=team,activity_type')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = {row['team']: row for row in response.data['results']}
+        self.assertEqual(results['Team B']['total_calories'], 1049)
+        self.assertEqual(results['Team B']['activity_type'], 'Running')
+
+    def test_stats_rejects_unknown_group(self):
+        """Test an unknown grouping is rejected"""
+        response = self.client.get('/activities/stats/?group_by=planet')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(OCTOFIT_RESPONSE_CACHE=True)
+class ResponseCacheTest(APITestCase):
+    """Test cases for cached leaderboard and workout responses"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.entry = Leaderboard.objects.create(
+            user_email='cached@example.com',
+            user_name='Cached Hero',
+            team='Cache Team',
+            total_calories=500,
+            rank=1
+        )
+
+    def test_repeat_request_served_from_cache(self):
+        """Test a repeated request does not touch the database"""
+        first = self.client.get('/leaderboard/top/?limit=5')
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            second = self.client.get('/leaderboard/top/?limit=5')
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_conditional_request_returns_not_modified(self):
+        """Test a matching If-None-Match is answered with 304"""
+        first = self.client.get('/leaderboard/by_team/?team=Cache+Team')
+        response = self.client.get('/leaderboard/by_team/?team=Cache+Team', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_save_invalidates_cached_response(self):
+        """Test saving a leaderboard row retires cached responses"""
+        first = self.client.get('/leaderboard/top/')
+        self.entry.user_name = 'Renamed Hero'
+        self.entry.save()
+        second = self.client.get('/leaderboard/top/')
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second.data[0]['user_name'], 'Renamed Hero')
+
+    def test_disabled_cache_still_answers_conditional_requests(self):
+        """Test uncached responses carry validators from their data and honour them"""
+        with override_settings(OCTOFIT_RESPONSE_CACHE=False):
+            first = self.client.get('/leaderboard/top/')
+            self.assertEqual(first['Last-Modified'], http_date(int(self.entry.updated_at.timestamp())))
+            with mock.patch('octofit_tracker.cache.cache') as response_cache:
+                response = self.client.get('/leaderboard/top/', HTTP_IF_NONE_MATCH=first['ETag'])
+            response_cache.get.assert_not_called()
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+            self.entry.user_name = 'Renamed Hero'
+            self.entry.save()
+            response = self.client.get('/leaderboard/top/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+    def test_local_cache_warning(self):
+        """Test enabling response caching over local memory is flagged"""
+        self.assertEqual([warning.id for warning in check_shared_cache(None)], ['octofit.W001'])
+        with override_settings(OCTOFIT_RESPONSE_CACHE=False):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class TeamMembershipTest(APITestCase):
+    """Test cases for indexed team membership and member counts"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.red = Team.objects.create(name='Red', description='Red team')
+        self.blue = Team.objects.create(name='Blue', description='Blue team')
+        self.user = User.objects.create(name='Mover', email='mover@example.com', password='pw', team='Red')
+
+    def test_user_linked_to_team(self):
+        """Test a user's team string resolves to a team reference and count"""
+        self.assertEqual(self.user.team_ref_id, self.red._id)
+        self.red.refresh_from_db()
+        self.assertEqual(self.red.member_count, 1)
+        self.assertEqual(self.red.members, ['mover@example.com'])
+
+    def test_changing_team_moves_membership(self):
+        """Test switching teams updates both teams' members"""
+        self.user.team = 'Blue'
+        self.user.save()
+        self.red.refresh_from_db()
+        self.blue.refresh_from_db()
+        self.assertEqual(self.red.member_count, 0)
+        self.assertEqual(self.blue.member_count, 1)
+        self.assertEqual(self.blue.members, ['mover@example.com'])
+
+    def test_members_and_by_team_use_reference(self):
+        """Test member lookups go through the team reference"""
+        response = self.client.get(f'/teams/{self.red._id}/members/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([user['email'] for user in response.data['results']], ['mover@example.com'])
+
+        response = self.client.get('/users/by_team/?team=Blue')
+        self.assertEqual(response.data['results'], [])
+
+
+class CheckIndexesCommandTest(TestCase):
+    """Test cases for the explain() plan inspection"""
+
+    def test_plan_stages_walks_nested_plans(self):
+        """Test stages are collected from nested input stages"""
+        plan = {
+            'stage': 'LIMIT',
+            'inputStage': {
+                'stage': 'SORT',
+                'inputStage': {'stage': 'COLLSCAN'},
+            },
+        }
+        self.assertEqual(plan_stages(plan), ['LIMIT', 'SORT', 'COLLSCAN'])
+
+    def test_plan_stages_walks_stage_lists(self):
+        """Test stages are collected from $or input stage lists"""
+        plan = {
+            'stage': 'FETCH',
+            'inputStage': {
+                'stage': 'OR',
+                'inputStages': [{'stage': 'IXSCAN'}, {'stage': 'IXSCAN'}],
+            },
+        }
+        self.assertEqual(plan_stages(plan), ['FETCH', 'OR', 'IXSCAN', 'IXSCAN'])
+
+
+class PopulateSyntheticTest(TestCase):
+    """Test cases for the synthetic load-test dataset"""
+
+    def populate(self, **options):
+        call_command('populate_db', users=20, teams=3, activities_per_user=5, seed=7, stdout=StringIO(), **options)
+
+    def test_generates_requested_volumes(self):
+        """Test users, activities, teams and ranks are all generated"""
+        self.populate()
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Activity.objects.count(), 100)
+        self.assertEqual(sum(team.member_count for team in Team.objects.all()), 20)
+
+        entries = list(Leaderboard.objects.order_by('rank'))
+        self.assertEqual([entry.rank for entry in entries], list(range(1, 21)))
+        calories = [entry.total_calories for entry in entries]
+        self.assertEqual(calories, sorted(calories, reverse=True))
+
+    def test_same_seed_same_dataset(self):
+        """Test the dataset only depends on the seed"""
+        self.populate()
+        first = {entry.user_email: entry.total_calories for entry in Leaderboard.objects.all()}
+        self.populate(batch_size=7)
+        second = {entry.user_email: entry.total_calories for entry in Leaderboard.objects.all()}
+        self.assertEqual(first, second)
+
+
+class BenchmarkCommandTest(TestCase):
+    """Test cases for the API benchmark command"""
+
+    def test_reports_every_scenario(self):
+        """Test the JSON report covers each scale and scenario"""
+        out = StringIO()
+        call_command(
+            'benchmark_api', scales='5', activities_per_user=3, iterations=2, warmup=0,
+            database_name=connection.settings_dict['NAME'], stdout=out, stderr=StringIO(),
+        )
+        report = json.loads(out.getvalue())
+        results = report['results']['5']
+        self.assertEqual(set(results), set(SCENARIOS))
+        self.assertEqual(results['activities.by_user']['status'], 200)
+        self.assertEqual(results['activities.bulk']['status'], 201)
+        self.assertEqual(results['activities.list']['iterations'], 2)
+
+    def test_percentile_is_nearest_rank(self):
+        """Test percentiles pick an observed sample"""
+        samples = list(range(1, 101))
+        self.assertEqual(percentile(samples, 50), 50)
+        self.assertEqual(percentile(samples, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
+
+
+class AsyncViewsTest(APITestCase):
+    """Test cases for the Motor-backed async read paths"""
+
+    def setUp(self):
+        self.client = APIClient()
+        now = timezone.now()
+        for day in range(3):
+            Activity.objects.create(
+                user_email='async@example.com', activity_type='Running',
+                duration=30, distance=5.0, calories=100 + day, date=now - timedelta(days=day),
+            )
+        for rank in range(1, 4):
+            Leaderboard.objects.create(
+                user_email=f'user{rank}@example.com', user_name=f'User {rank}',
+                team='Team A', total_calories=1000 - rank, rank=rank,
+            )
+        # Motor talks to a real server; the tests serve through djongo's client
+        patcher = mock.patch.dict('sys.modules', {'motor.motor_asyncio': None})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def async_get(self, path, params=None):
+        async def get():
+            return await self.async_client.get(path, params or {})
+        return async_to_sync(get)()
+
+    def test_by_user_matches_sync_endpoint(self):
+        """Test the async activity page has the sync representation"""
+        expected = self.client.get('/api/activities/by_user/', {'email': 'async@example.com'}).json()['results']
+        response = self.async_get('/api/async/activities/by_user/', {'email': 'async@example.com'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['results'], expected)
+
+    def test_by_user_cursor_pages(self):
+        """Test keyset cursors walk every activity exactly once"""
+        page = self.async_get('/api/async/activities/by_user/', {'email': 'async@example.com', 'page_size': 2}).json()
+        self.assertEqual([row['calories'] for row in page['results']], [100, 101])
+        self.assertIsNotNone(page['next'])
+        page = self.async_get(page['next']).json()
+        self.assertEqual([row['calories'] for row in page['results']], [102])
+        self.assertIsNone(page['next'])
+
+    def test_leaderboard_top_matches_sync_endpoint(self):
+        """Test the async top entries match the sync action"""
+        expected = self.client.get('/api/leaderboard/top/', {'limit': 2}).json()
+        response = self.async_get('/api/async/leaderboard/top/', {'limit': 2})
+        self.assertEqual(response.json(), expected)
+
+    def test_by_user_merges_archived_activities(self):
+        """Test archived activities are paged after the hot ones, like the sync action"""
+        for days in (400, 500):
+            Activity.objects.create(
+                user_email='async@example.com', activity_type='Running',
+                duration=30, distance=5.0, calories=days, date=timezone.now() - timedelta(days=days),
+            )
+        call_command('archive_activities', days=365, stdout=StringIO())
+        expected = self.client.get('/api/activities/by_user/', {'email': 'async@example.com'}).json()['results']
+        rows, url, params = [], '/api/async/activities/by_user/', {'email': 'async@example.com', 'page_size': 2}
+        while url:
+            page = self.async_get(url, params).json()
+            rows.extend(page['results'])
+            url, params = page['next'], None
+        self.assertEqual([row['calories'] for row in rows], [100, 101, 102, 400, 500])
+        self.assertEqual(rows, expected)
+
+    def test_falls_back_without_motor(self):
+        """Test the views serve through djongo's client where Motor cannot be imported"""
+        self.assertIsInstance(get_async_database(), ThreadedDatabase)
+        response = self.async_get('/api/async/workouts/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['results'], [])
+
+    def test_missing_parameter(self):
+        """Test required filters are enforced like the sync actions"""
+        response = self.async_get('/api/async/leaderboard/by_team/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), {'error': 'Team parameter is required'})
+
+
+class PoolMetricsTest(APITestCase):
+    """Test cases for Mongo connection pool metrics"""
+
+    def test_counts_connection_lifecycle(self):
+        """Test open, in-use and waiting gauges follow pool events"""
+        metrics = PoolMetrics()
+        address = ('db', 27017)
+        metrics.pool_created(monitoring.PoolCreatedEvent(address, {}))
+        for connection_id in (1, 2):
+            metrics.connection_created(monitoring.ConnectionCreatedEvent(address, connection_id))
+            metrics.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(address))
+            metrics.connection_checked_out(monitoring.ConnectionCheckedOutEvent(address, connection_id))
+        metrics.connection_checked_in(monitoring.ConnectionCheckedInEvent(address, 1))
+        metrics.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(address))
+        metrics.connection_closed(monitoring.ConnectionClosedEvent(address, 1, 'idle'))
+
+        server = metrics.snapshot()['db:27017']
+        self.assertEqual(server['connections_created'], 2)
+        self.assertEqual(server['open'], 1)
+        self.assertEqual(server['in_use'], 1)
+        self.assertEqual(server['waiting'], 1)
+        self.assertGreaterEqual(server['wait_seconds_max'], 0)
+
+    def test_pool_stats_endpoint(self):
+        """Test the pool stats endpoint reports this process"""
+        response = self.client.get('/api/metrics/pool/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('servers', response.data)
+        self.assertEqual(response.data['max_pool_size'], 100)
+
+
+class FastReadsTest(APITestCase):
+    """Test cases for the native pymongo read path"""
+
+    def setUp(self):
+        self.client = APIClient()
+        now = timezone.now()
+        for index in range(5):
+            Activity.objects.create(
+                user_email='fast@example.com', activity_type='Cycling',
+                duration=40, distance=12.5, calories=300 + index, date=now - timedelta(hours=index),
+            )
+        for rank in range(1, 4):
+            Leaderboard.objects.create(
+                user_email=f'user{rank}@example.com', user_name=f'User {rank}',
+                team='Team A', total_calories=1000 - rank, rank=rank,
+            )
+        Workout.objects.create(name='Ride', activity_type='Cycling', duration=45, difficulty='Beginner')
+
+    def walk(self, path, params):
+        """Collect every row of a paginated action by following next links"""
+        rows, url = [], path
+        while url:
+            page = self.client.get(url, params).json()
+            rows.extend(page['results'])
+            url, params = page['next'], None
+        return rows
+
+    def both_paths(self, fetch):
+        with override_settings(OCTOFIT_FAST_READS=False):
+            cache.clear()
+            orm = fetch()
+        with override_settings(OCTOFIT_FAST_READS=True):
+            cache.clear()
+            fast = fetch()
+        return orm, fast
+
+    def test_paginated_actions_match_orm(self):
+        """Test fast pages carry the same rows as the ORM pages"""
+        for path, params, count in (
+            ('/api/activities/by_user/', {'email': 'fast@example.com', 'page_size': 2}, 5),
+            ('/api/activities/by_type/', {'type': 'Cycling', 'page_size': 2}, 5),
+            ('/api/leaderboard/by_team/', {'team': 'Team A', 'page_size': 2}, 3),
+            ('/api/workouts/by_type/', {'type': 'Cycling'}, 1),
+        ):
+            orm, fast = self.both_paths(lambda: self.walk(path, params))
+            self.assertEqual(len(orm), count, path)
+            self.assertEqual(fast, orm, path)
+
+    def test_missing_index_falls_back_to_unhinted_query(self):
+        """Test a hint the server rejects is dropped instead of failing the request"""
+        original = DocumentQuery._cursor
+
+        def cursor(query, hint, skip, limit):
+            if hint:
+                raise OperationFailure('error processing query: planner returned error :: caused by :: '
+                                       'hint provided does not correspond to an existing index', 2)
+            return original(query, hint, skip, limit)
+
+        with override_settings(OCTOFIT_FAST_READS=True), mock.patch.object(DocumentQuery, '_cursor', cursor):
+            with self.assertLogs('octofit_tracker.repository', 'WARNING'):
+                response = self.client.get('/api/activities/by_user/', {'email': 'fast@example.com'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()['results']), 5)
+
+    def test_other_query_errors_are_raised(self):
+        """Test only the unknown-index error drops the hint"""
+        def cursor(query, hint, skip, limit):
+            raise OperationFailure('$hint: unknown operator', 2)
+
+        query = DocumentQuery(Activity, hint=[('user_email', 1), ('date', 1)])
+        with mock.patch.object(DocumentQuery, '_cursor', cursor), self.assertRaises(OperationFailure):
+            list(query)
+
+    def test_empty_filter_keeps_query(self):
+        """Test filtering by no lookups leaves a document query as it was"""
+        query = DocumentQuery(Activity).filter()
+        self.assertEqual(query.query, {})
+        self.assertEqual(len(list(query)), 5)
+
+    def test_top_matches_orm(self):
+        """Test the fast top entries match the ORM"""
+        orm, fast = self.both_paths(lambda: self.client.get('/api/leaderboard/top/', {'limit': 2}).json())
+        self.assertEqual(fast, orm)
+        self.assertEqual([row['rank'] for row in fast], [1, 2])
+
+
+class RowConverterTest(TestCase):
+    """Test cases for the list-optimized read serializers"""
+
+    def setUp(self):
+        created = Activity.objects.create(
+            user_email='rows@example.com', activity_type='Yoga', duration=45,
+            calories=150, date=timezone.now().replace(microsecond=123000),
+        )
+        # Mongo keeps milliseconds, so compare against the stored values
+        self.activity = Activity.objects.get(_id=created._id)
+
+    def test_matches_model_serializer(self):
+        """Test instances, raw documents and other time zones render like the serializer"""
+        expected = ActivitySerializer(self.activity).data
+        document = get_collection(Activity).find_one({'_id': self.activity._id})
+        self.assertEqual(activity_rows(self.activity), expected)
+        self.assertEqual(activity_rows(document), expected)
+        with timezone.override('Europe/Paris'):
+            self.assertEqual(activity_rows(document), ActivitySerializer(self.activity).data)
+
+    def test_orjson_renderer_matches_json_renderer(self):
+        """Test orjson output decodes to the stdlib renderer's output"""
+        data = {'rows': activity_rows.many([self.activity]), 'at': timezone.now(), 'text': 'héros'}
+        self.assertEqual(json.loads(ORJSONRenderer().render(data)), json.loads(JSONRenderer().render(data)))
+
+    def test_serialization_benchmark(self):
+        """Test both serialization paths produce the same bytes"""
+        result = compare_serialization(50, repeat=1)
+        self.assertEqual(result['model_serializer_bytes'], result['row_converter_bytes'])
+
+
+class SparseFieldsTest(APITestCase):
+    """Test cases for the fields and exclude query parameters"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.team = Team.objects.create(name='Team Sparse', description='Few columns')
+        User.objects.create(name='Sparse Hero', email='sparse@example.com', password='pw', team='Team Sparse')
+        Workout.objects.create(
+            name='Long Read', description='x' * 500, activity_type='Yoga', duration=30, difficulty='Beginner',
+        )
+        Leaderboard.objects.create(user_email='sparse@example.com', user_name='Sparse Hero', team='Team Sparse', rank=1)
+
+    def test_fields_narrow_list_output(self):
+        """Test list responses only carry the requested fields"""
+        response = self.client.get('/api/workouts/', {'fields': 'name,difficulty'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(response.data['results'][0]), ['name', 'difficulty'])
+
+    def test_exclude_pushes_projection_down(self):
+        """Test excluded fields are not fetched from Mongo"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/teams/{self.team._id}/', {'exclude': 'members,description'})
+        self.assertNotIn('members', response.data)
+        self.assertIn('member_count', response.data)
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertIn('member_count', sql)
+        self.assertNotIn('"members"', sql)
+
+    def test_fast_and_orm_paths_project(self):
+        """Test paginated actions narrow output on both read paths"""
+        for fast_reads in (False, True):
+            with override_settings(OCTOFIT_FAST_READS=fast_reads):
+                cache.clear()
+                response = self.client.get('/api/leaderboard/by_team/', {'team': 'Team Sparse', 'fields': 'user_name,rank'})
+                self.assertEqual(response.data['results'], [{'user_name': 'Sparse Hero', 'rank': 1}])
+
+    def test_team_members_use_user_fields(self):
+        """Test nested member lists select from the user fields"""
+        response = self.client.get(f'/api/teams/{self.team._id}/members/', {'fields': 'email'})
+        self.assertEqual(response.data['results'], [{'email': 'sparse@example.com'}])
+
+    def test_unknown_field(self):
+        """Test unknown fields are rejected"""
+        response = self.client.get('/api/workouts/', {'fields': 'name,secret'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('secret', response.data['fields'][0])
+
+
+class ActivityRollupTest(APITestCase):
+    """Test cases for the daily and weekly activity rollups"""
+
+    def setUp(self):
+        self.client = APIClient()
+        User.objects.create(name='Runner', email='runner@example.com', password='pw', team='Team A')
+        # A Wednesday, so the week bucket starts two days earlier
+        self.day = timezone.now().replace(year=2024, month=3, day=6, hour=12, minute=0, second=0, microsecond=0)
+
+    def post_activity(self, activity_type, calories, day_offset=0, distance=None):
+        data = {
+            'user_email': 'runner@example.com',
+            'activity_type': activity_type,
+            'duration': 30,
+            'calories': calories,
+            'distance': distance,
+            'date': (self.day + timedelta(days=day_offset)).isoformat(),
+        }
+        return self.client.post('/activities/', data, format='json')
+
+    def rollups(self):
+        return {
+            (rollup['scope'], rollup['period'], rollup['bucket'].date().isoformat()):
+                {key: rollup[key] for key in ('calories', 'duration', 'distance', 'count', 'by_type')}
+            for rollup in get_collection(ActivityRollup).find({})
+        }
+
+    def test_writes_update_day_and_week_buckets(self):
+        """Test creates, updates and deletes keep user and team buckets in step"""
+        self.post_activity('Running', 300, distance=5.0)
+        self.post_activity('Yoga', 100, day_offset=1)
+        rollups = self.rollups()
+        self.assertEqual(set(rollups), {
+            ('user', 'day', '2024-03-06'), ('user', 'day', '2024-03-07'), ('user', 'week', '2024-03-04'),
+            ('team', 'day', '2024-03-06'), ('team', 'day', '2024-03-07'), ('team', 'week', '2024-03-04'),
+        })
+        week = rollups[('team', 'week', '2024-03-04')]
+        self.assertEqual((week['calories'], week['duration'], week['distance'], week['count']), (400, 60, 5.0, 2))
+        self.assertEqual(week['by_type']['Yoga'], {'calories': 100, 'duration': 30, 'distance': 0, 'count': 1})
+
+        activity = Activity.objects.get(activity_type='Yoga')
+        response = self.client.patch(f'/activities/{activity._id}/', {'calories': 150}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.rollups()[('user', 'week', '2024-03-04')]['calories'], 450)
+
+        self.client.delete(f'/activities/{activity._id}/')
+        rollups = self.rollups()
+        self.assertNotIn(('user', 'day', '2024-03-07'), rollups)
+        self.assertEqual(rollups[('user', 'week', '2024-03-04')]['count'], 1)
+
+    def test_rebuild_matches_incremental_rollups(self):
+        """Test the rebuild command reproduces the incrementally maintained buckets"""
+        self.post_activity('Running', 300, distance=5.0)
+        self.post_activity('Running', 200, day_offset=5, distance=2.5)
+        self.post_activity('Boxing', 250, day_offset=6)
+        incremental = self.rollups()
+        collection = get_collection(ActivityRollup)
+        kept = collection.find_one({'scope': 'user', 'period': 'week'})['_id']
+        collection.insert_one({
+            'scope': 'user', 'key': 'runner@example.com', 'period': 'day',
+            'bucket': datetime(2024, 3, 1), 'count': 1, 'updated_at': datetime(2024, 3, 1),
+        })
+
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertEqual(self.rollups(), incremental)
+        # Buckets are replaced in place and the ones without activities dropped
+        self.assertEqual(collection.find_one({'scope': 'user', 'period': 'week'})['_id'], kept)
+        call_command('rebuild_rollups', since='2024-03-10', stdout=StringIO())
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_team_change_moves_team_history(self):
+        """Test a member's history follows them to a new team, as a rebuild would count it"""
+        Team.objects.create(name='Team B')
+        self.post_activity('Running', 300)
+        user = User.objects.get(email='runner@example.com')
+        user.team = 'Team B'
+        user.save()
+
+        def team_weeks():
+            return {
+                rollup['key']: rollup['calories']
+                for rollup in get_collection(ActivityRollup).find({'scope': 'team', 'period': 'week'})
+            }
+        self.assertEqual(team_weeks(), {'Team B': 300})
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertEqual(team_weeks(), {'Team B': 300})
+
+    def test_list_buckets(self):
+        """Test listing a user's daily buckets in a date range"""
+        self.post_activity('Running', 300)
+        self.post_activity('Running', 200, day_offset=1)
+        for fast_reads in (False, True):
+            with override_settings(OCTOFIT_FAST_READS=fast_reads):
+                response = self.client.get('/api/rollups/', {
+                    'scope': 'user', 'key': 'runner@example.com', 'start': '2024-03-07',
+                })
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual([row['bucket'] for row in response.data['results']], ['2024-03-07T00:00:00Z'])
+                self.assertEqual(response.data['results'][0]['by_type']['Running']['calories'], 200)
+
+    def test_list_requires_scope_and_key(self):
+        """Test rollup lists reject missing or unknown parameters"""
+        self.assertEqual(self.client.get('/api/rollups/', {'scope': 'user'}).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/api/rollups/', {'scope': 'user', 'key': 'runner@example.com', 'period': 'year'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class LeaderboardBoardsTest(APITestCase):
+    """Test cases for the precomputed windowed and team leaderboards"""
+
+    def setUp(self):
+        self.client = APIClient()
+        for name, team in (('Ann', 'Team A'), ('Bob', 'Team A'), ('Cat', 'Team B'), ('Dan', 'Team B')):
+            User.objects.create(name=name, email=f'{name.lower()}@example.com', password='pw', team=team)
+        now = timezone.now()
+        for email, calories, days_ago in (
+            ('ann@example.com', 300, 0), ('bob@example.com', 200, 0), ('cat@example.com', 100, 0),
+            ('dan@example.com', 900, 400), ('ann@example.com', 50, 400),
+        ):
+            self.client.post('/activities/', {
+                'user_email': email, 'activity_type': 'Running', 'duration': 30, 'calories': calories,
+                'date': (now - timedelta(days=days_ago)).isoformat(),
+            }, format='json')
+        call_command('refresh_leaderboards', stdout=StringIO())
+
+    def board(self, **params):
+        response = self.client.get('/api/leaderboard/boards/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(row['user_email'], row['value'], row['rank']) for row in response.data['results']]
+
+    def test_windows_and_metrics(self):
+        """Test boards rank each window and metric separately"""
+        self.assertEqual(self.board(window='all'), [
+            ('dan@example.com', 900, 1), ('ann@example.com', 350, 2),
+            ('bob@example.com', 200, 3), ('cat@example.com', 100, 4),
+        ])
+        self.assertEqual(self.board(window='day', limit=2), [('ann@example.com', 300, 1), ('bob@example.com', 200, 2)])
+        self.assertEqual(self.board(window='week', metric='activities')[0], ('ann@example.com', 1, 1))
+
+    def test_team_boards_rank_within_team(self):
+        """Test team boards carry team-relative ranks"""
+        self.assertEqual(self.board(scope='team', team='Team B', window='day'), [('cat@example.com', 100, 1)])
+        self.assertEqual(
+            [rank for _, _, rank in self.board(scope='team', team='Team B', window='all')], [1, 2],
+        )
+
+    def test_around_user(self):
+        """Test the neighbours of a user come from both read paths"""
+        for fast_reads in (False, True):
+            with override_settings(OCTOFIT_FAST_READS=fast_reads):
+                cache.clear()
+                self.assertEqual(
+                    [email for email, _, _ in self.board(window='all', email='bob@example.com', limit=1)],
+                    ['ann@example.com', 'bob@example.com', 'cat@example.com'],
+                )
+        response = self.client.get('/api/leaderboard/boards/', {'window': 'day', 'email': 'dan@example.com'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_partial_refresh_swaps_in_whole_collection(self):
+        """Test refreshing some windows keeps the other boards and the indexes"""
+        before = self.board(window='all')
+        Activity.objects.filter(user_email='cat@example.com').delete()
+        get_collection(ActivityRollup).delete_many({'key': 'cat@example.com'})
+        call_command('refresh_leaderboards', windows='day', stdout=StringIO())
+        self.assertEqual(self.board(window='day'), [('ann@example.com', 300, 1), ('bob@example.com', 200, 2)])
+        self.assertEqual(self.board(window='all'), before)
+        indexes = get_collection(LeaderboardSnapshot).index_information()
+        self.assertTrue({index.name for index in LeaderboardSnapshot._meta.indexes} <= set(indexes))
+        self.assertNotIn('leaderboard_snapshots_refresh', get_database().list_collection_names())
+
+    def test_invalid_board(self):
+        """Test unknown windows and team boards without a team are rejected"""
+        for params in ({'window': 'year'}, {'scope': 'team'}):
+            response = self.client.get('/api/leaderboard/boards/', params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class LeaderboardAroundTest(APITestCase):
+    """Test cases for the around-me rank lookup"""
+
+    def setUp(self):
+        self.client = APIClient()
+        for rank in range(1, 8):
+            Leaderboard.objects.create(
+                user_email=f'user{rank}@example.com', user_name=f'User {rank}', team='Team',
+                total_calories=1000 - rank, rank=rank,
+            )
+
+    def test_neighbours_on_both_read_paths(self):
+        """Test the user's entry comes back with N entries on each side"""
+        for fast_reads in (False, True):
+            with override_settings(OCTOFIT_FAST_READS=fast_reads):
+                cache.clear()
+                response = self.client.get('/api/leaderboard/around/', {'email': 'user4@example.com', 'limit': 2})
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response.data['rank'], 4)
+                self.assertEqual([row['rank'] for row in response.data['results']], [2, 3, 4, 5, 6])
+
+    def test_edges_and_unknown_user(self):
+        """Test windows are clipped at the top and unknown users are not found"""
+        response = self.client.get('/api/leaderboard/around/', {'email': 'user1@example.com', 'limit': 2})
+        self.assertEqual([row['rank'] for row in response.data['results']], [1, 2, 3])
+        response = self.client.get('/api/leaderboard/around/', {'email': 'nobody@example.com'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get('/api/leaderboard/around/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class InstrumentationTest(APITestCase):
+    """Test cases for request metrics, Server-Timing and the metrics endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        Workout.objects.create(
+            name='Metered', description='Counted', activity_type='Yoga', duration=30, difficulty='Beginner',
+        )
+
+    def test_server_timing_reports_database_work(self):
+        """Test responses carry the ORM queries and Mongo commands they took"""
+        response = self.client.get('/api/workouts/')
+        timing = dict(
+            (part.split(';')[0], part) for part in response['Server-Timing'].split(', ')
+        )
+        self.assertEqual(set(timing), {'app', 'db', 'translate', 'mongo'})
+        self.assertIn('desc="1 queries"', timing['db'])
+
+    def test_server_timing_under_asgi(self):
+        """Test ORM queries of views run from the async handler are counted too"""
+        async def fetch():
+            return await self.async_client.get('/api/workouts/')
+
+        response = async_to_sync(fetch)()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+
+    def test_mongo_commands_are_attributed_to_the_request(self):
+        """Test command events count towards the current request and out of translation time"""
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        try:
+            def execute(sql, params, many, context):
+                event = mock.Mock(duration_micros=2500)
+                command_timer.succeeded(event)
+                command_timer.succeeded(event)
+            query_timer(execute, 'SELECT 1', (), False, {})
+        finally:
+            current_stats.reset(token)
+        self.assertEqual((stats.queries, stats.mongo_commands), (1, 2))
+        self.assertAlmostEqual(stats.mongo_seconds, 0.005)
+        self.assertLess(stats.translation_seconds, stats.query_seconds)
+
+    @override_settings(OCTOFIT_SERVER_TIMING=False)
+    def test_server_timing_can_be_disabled(self):
+        """Test the header is only sent when enabled"""
+        self.assertNotIn('Server-Timing', self.client.get('/api/workouts/'))
+
+    def test_metrics_endpoint(self):
+        """Test per-route histograms and pool metrics are exposed as Prometheus text"""
+        self.client.get('/api/workouts/')
+        servers = {'db:27017': {'checkouts': 3, 'open': 1}}
+        with mock.patch.object(pool_metrics, 'snapshot', return_value=servers):
+            response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        text = response.content.decode()
+        self.assertIn('# TYPE octofit_http_request_duration_seconds histogram', text)
+        self.assertIn('octofit_http_request_duration_seconds_bucket{route="workout-list",method="GET",le="+Inf"}', text)
+        self.assertIn('octofit_http_requests_total{route="workout-list",method="GET",status="200"}', text)
+        self.assertIn('octofit_http_response_size_bytes_count{route="workout-list",method="GET"}', text)
+        self.assertIn('octofit_mongo_pool_checkouts_total{server="db:27017"} 3', text)
+        self.assertIn('# TYPE octofit_mongo_pool_open gauge', text)
+
+
+@override_settings(OCTOFIT_PROFILING=True)
+class RequestProfilingTest(APITestCase):
+    """Test cases for on-demand request profiles"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = get_user_model().objects.create_user('staff', password='pw', is_staff=True, is_superuser=True)
+        Workout.objects.create(
+            name='Profiled', description='Sampled', activity_type='Yoga', duration=30, difficulty='Beginner',
+        )
+
+    def test_staff_request_is_profiled(self):
+        """Test a flagged staff request saves a profile the admin can show and download"""
+        self.client.force_login(self.staff)
+        response = self.client.get('/api/workouts/', HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        profile = RequestProfile.objects.get(_id=ObjectId(response['X-Profile-Id']))
+        self.assertEqual((profile.method, profile.path, profile.username), ('GET', '/api/workouts/', 'staff'))
+        self.assertIn('function calls', summarize(bytes(profile.stats)))
+
+        page = self.client.get(f'/admin/octofit_tracker/requestprofile/{profile._id}/change/')
+        self.assertContains(page, 'Hottest functions')
+        download = self.client.get(f'/admin/octofit_tracker/requestprofile/{profile._id}/download/')
+        self.assertEqual(download.content, bytes(profile.stats))
+
+    def test_only_flagged_staff_requests_are_profiled(self):
+        """Test anonymous, unflagged and disabled requests are not profiled"""
+        self.assertNotIn('X-Profile-Id', self.client.get('/api/workouts/', {'profile': '1'}))
+        self.client.force_login(self.staff)
+        self.assertNotIn('X-Profile-Id', self.client.get('/api/workouts/'))
+        with override_settings(OCTOFIT_PROFILING=False):
+            self.assertNotIn('X-Profile-Id', self.client.get('/api/workouts/', {'profile': '1'}))
+        self.assertIn('X-Profile-Id', self.client.get('/api/workouts/', {'profile': '1'}))
+
+    @override_settings(OCTOFIT_PROFILE_KEEP=2)
+    def test_old_profiles_are_pruned(self):
+        """Test only the newest profiles are kept"""
+        self.client.force_login(self.staff)
+        for _ in range(3):
+            self.client.get('/api/workouts/', HTTP_X_PROFILE='1')
+        self.assertEqual(RequestProfile.objects.count(), 2)
+
+
+@override_settings(OCTOFIT_WRITE_BEHIND=True)
+class WriteBehindTest(APITestCase):
+    """Test cases for queued leaderboard and rollup updates"""
+
+    def setUp(self):
+        self.client = APIClient()
+        User.objects.create(name='Runner', email='runner@example.com', password='pw', team='Team A')
+        User.objects.create(name='Walker', email='walker@example.com', password='pw', team='Team A')
+
+    def post_activity(self, email, calories):
+        return self.client.post('/activities/', {
+            'user_email': email, 'activity_type': 'Running', 'duration': 30, 'calories': calories,
+            'date': timezone.now().isoformat(),
+        }, format='json')
+
+    def drain(self):
+        call_command('run_write_behind', once=True, workers=2, stdout=StringIO())
+
+    def snapshot(self):
+        entries = {
+            entry.user_email: (entry.total_calories, entry.total_activities, entry.rank)
+            for entry in Leaderboard.objects.all()
+        }
+        rollups = sorted(
+            (rollup['scope'], rollup['key'], rollup['period'], rollup['calories'], rollup['count'])
+            for rollup in get_collection(ActivityRollup).find({})
+        )
+        return entries, rollups
+
+    def test_writes_are_queued_and_coalesced(self):
+        """Test writes only enqueue, one task per user, until a worker runs"""
+        self.assertEqual(self.post_activity('runner@example.com', 300).status_code, status.HTTP_201_CREATED)
+        self.post_activity('runner@example.com', 200)
+        self.post_activity('walker@example.com', 400)
+        self.assertFalse(Leaderboard.objects.exists())
+        self.assertEqual(get_collection(WriteBehindTask).count_documents({}), 2)
+
+        self.drain()
+        entries, rollups = self.snapshot()
+        self.assertEqual(entries, {'walker@example.com': (400, 1, 2), 'runner@example.com': (500, 2, 1)})
+        self.assertIn(('team', 'Team A', 'week', 900, 3), rollups)
+        self.assertEqual(get_collection(WriteBehindTask).count_documents({}), 0)
+
+    def test_retries_are_idempotent(self):
+        """Test reprocessing the same changes leaves derived data unchanged"""
+        self.post_activity('runner@example.com', 300)
+        activity = Activity.objects.get()
+        self.client.patch(f'/activities/{activity._id}/', {'calories': 350}, format='json')
+        self.drain()
+        processed = self.snapshot()
+
+        enqueue(added=[activity_snapshot(Activity.objects.get())])
+        self.drain()
+        self.assertEqual(self.snapshot(), processed)
+        self.assertEqual(processed[0], {'runner@example.com': (350, 1, 1)})
+
+    def test_users_are_leased_to_one_worker(self):
+        """Test a user claimed by one worker is left alone by the others"""
+        self.post_activity('walker@example.com', 400)
+        self.drain()
+        self.post_activity('runner@example.com', 300)
+        lease = timedelta(seconds=60)
+        tasks = claim('worker-1', 10, lease)
+        # Queues a second task for the user, as the first one is claimed
+        self.post_activity('runner@example.com', 600)
+        self.assertEqual(claim('worker-2', 10, lease), [])
+
+        process('worker-1', tasks)
+        tasks = claim('worker-2', 10, lease)
+        self.assertEqual(len(tasks), 1)
+        self.assertEqual(claim('worker-1', 10, lease), [])
+        process('worker-2', tasks)
+        self.assertEqual(self.snapshot()[0]['runner@example.com'], (900, 2, 1))
+
+    def test_concurrent_workers_keep_ranks_contiguous(self):
+        """Test workers draining repeated writes of the same users leave ranks 1..n"""
+        for index in range(3):
+            User.objects.create(name=f'User {index}', email=f'user{index}@example.com', password='pw')
+            self.post_activity(f'user{index}@example.com', 100 * (index + 1))
+        self.drain()
+        for calories in (250, 50, 400):
+            self.post_activity('runner@example.com', calories)
+            self.drain()
+            self.post_activity('walker@example.com', calories)
+        call_command('run_write_behind', once=True, workers=4, batch_size=1, stdout=StringIO())
+        entries = self.snapshot()[0]
+        self.assertEqual(sorted(rank for _, _, rank in entries.values()), [1, 2, 3, 4, 5])
+        self.assertEqual(entries['runner@example.com'][:2], (700, 3))
+        self.assertEqual(get_collection(WriteBehindTask).count_documents({}), 0)
+
+    def test_failed_batches_are_released_for_retry(self):
+        """Test a failing batch keeps its tasks with the error and a backoff"""
+        self.post_activity('runner@example.com', 300)
+        with mock.patch('octofit_tracker.write_behind.recompute_users', side_effect=RuntimeError('boom')):
+            with self.assertLogs('octofit_tracker.write_behind', 'ERROR'):
+                self.drain()
+        task = get_collection(WriteBehindTask).find_one()
+        self.assertEqual((task['attempts'], task['claimed_by']), (1, ''))
+        self.assertIn('boom', task['last_error'])
+
+    def test_exhausted_tasks_do_not_absorb_later_writes(self):
+        """Test a task out of attempts is kept as failed and new writes queue afresh"""
+        self.post_activity('runner@example.com', 300)
+        with mock.patch('octofit_tracker.write_behind.recompute_users', side_effect=RuntimeError('boom')):
+            with self.assertLogs('octofit_tracker.write_behind', 'ERROR'):
+                call_command('run_write_behind', once=True, max_attempts=1, stdout=StringIO())
+        self.assertEqual(get_collection(WriteBehindTask).find_one()['claimed_by'], 'failed')
+
+        self.post_activity('runner@example.com', 200)
+        self.assertEqual(get_collection(WriteBehindTask).count_documents({}), 2)
+        call_command('run_write_behind', once=True, max_attempts=1, stdout=StringIO())
+        self.assertEqual(self.snapshot()[0], {'runner@example.com': (500, 2, 1)})
+        self.assertEqual(get_collection(WriteBehindTask).count_documents({'claimed_by': 'failed'}), 1)
+
+
+class RebuildLeaderboardTest(TestCase):
+    """Test cases for the rebuild_leaderboard command"""
+
+    def setUp(self):
+        for index, team in enumerate(('Team A', 'Team B', 'Team A')):
+            User.objects.create(name=f'User {index}', email=f'user{index}@example.com', password='pw', team=team)
+        for email, calories in (
+            ('user0@example.com', 100), ('user1@example.com', 250), ('user2@example.com', 100),
+            ('user0@example.com', 50), ('ghost@example.com', 10),
+        ):
+            Activity.objects.create(user_email=email, activity_type='Running', duration=20, calories=calories,
+                                    date=timezone.now())
+        Leaderboard.objects.create(user_email='stale@example.com', user_name='Stale', team='', rank=1)
+
+    def test_rebuild_ranks_and_swaps(self):
+        """Test the rebuilt board replaces the old one with ranks, names and indexes"""
+        output = StringIO()
+        call_command('rebuild_leaderboard', batch_size=2, stdout=output)
+        self.assertIn('Leaderboard rebuilt: 4 entries', output.getvalue())
+
+        board = [
+            (entry.rank, entry.user_email, entry.user_name, entry.team, entry.total_calories, entry.total_activities)
+            for entry in Leaderboard.objects.order_by('rank')
+        ]
+        self.assertEqual(board, [
+            (1, 'user1@example.com', 'User 1', 'Team B', 250, 1),
+            (2, 'user0@example.com', 'User 0', 'Team A', 150, 2),
+            (3, 'user2@example.com', 'User 2', 'Team A', 100, 1),
+            (4, 'ghost@example.com', 'ghost@example.com', '', 10, 1),
+        ])
+        indexes = get_collection(Leaderboard).index_information()
+        self.assertTrue({index.name for index in Leaderboard._meta.indexes} <= set(indexes))
+        self.assertNotIn('rebuild_rank', indexes)
+        self.assertNotIn('leaderboard_rebuild', get_database().list_collection_names())
+
+    def test_writes_during_rebuild_survive_the_swap(self):
+        """Test users written while the rebuild runs are recomputed on the new board"""
+        def rank_while_writing(*args):
+            activity = Activity.objects.create(
+                user_email='user2@example.com', activity_type='Running', duration=20, calories=200,
+                date=timezone.now(),
+            )
+            record_activity_changes(added=[activity_snapshot(activity)])
+            activity = Activity.objects.get(user_email='user0@example.com', calories=50)
+            removed = activity_snapshot(activity)
+            activity.calories = 5
+            activity.save()
+            record_activity_changes(removed=[removed], added=[activity_snapshot(activity)])
+            return rank_shadow(*args)
+
+        output = StringIO()
+        with mock.patch('octofit_tracker.rebuild.rank_shadow', rank_while_writing):
+            call_command('rebuild_leaderboard', stdout=output)
+        self.assertIn('Recomputed after writes: 2', output.getvalue())
+        board = [
+            (entry.rank, entry.user_email, entry.total_calories)
+            for entry in Leaderboard.objects.order_by('rank')
+        ]
+        self.assertEqual(board, [
+            (1, 'user2@example.com', 300), (2, 'user1@example.com', 250),
+            (3, 'user0@example.com', 105), (4, 'ghost@example.com', 10),
+        ])
+
+    def test_email_ranges_cover_all_users(self):
+        """Test shard bounds split the email keyspace without gaps"""
+        ranges = email_ranges(3)
+        self.assertEqual(ranges[0][0], None)
+        self.assertEqual(ranges[-1][1], None)
+        for (_, high), (low, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(high, low)
+
+
+class ActivityArchiveTest(APITestCase):
+    """Test cases for the activity archive and date-range routing"""
+
+    def setUp(self):
+        self.client = APIClient()
+        now = timezone.now()
+        for days_ago in (1, 2, 3, 400, 500):
+            Activity.objects.create(
+                user_email='old@example.com', activity_type='Running',
+                duration=30, calories=days_ago, date=now - timedelta(days=days_ago),
+            )
+
+    def archive(self):
+        output = StringIO()
+        call_command('archive_activities', days=365, batch_size=1, stdout=output)
+        return output.getvalue()
+
+    def walk(self, path, params):
+        rows, url = [], path
+        while url:
+            page = self.client.get(url, params).json()
+            rows.extend(page['results'])
+            url, params = page['next'], None
+        return rows
+
+    def test_archive_moves_aged_activities(self):
+        """Test the command moves only activities past the horizon"""
+        self.assertIn('Archived 2 activities', self.archive())
+        self.assertEqual(sorted(Activity.objects.values_list('calories', flat=True)), [1, 2, 3])
+        self.assertEqual(sorted(ArchivedActivity.objects.values_list('calories', flat=True)), [400, 500])
+        self.assertFalse(archive_overlaps(timezone.now() - timedelta(days=30)))
+        self.assertTrue(archive_overlaps(timezone.now() - timedelta(days=450)))
+        self.assertIn('Archived 0 activities', self.archive())
+
+    def test_reads_merge_hot_and_archived(self):
+        """Test paginated reads span both collections newest first on both read paths"""
+        self.archive()
+        # Back-dated after the archive run, so older than the archive horizon
+        Activity.objects.create(
+            user_email='old@example.com', activity_type='Running',
+            duration=30, calories=450, date=timezone.now() - timedelta(days=450),
+        )
+        for fast_reads in (False, True):
+            with override_settings(OCTOFIT_FAST_READS=fast_reads):
+                for path, params in (
+                    ('/api/activities/', {'page_size': 2}),
+                    ('/api/activities/by_user/', {'email': 'old@example.com', 'page_size': 2}),
+                    ('/api/activities/by_type/', {'type': 'Running', 'page_size': 2}),
+                ):
+                    calories = [row['calories'] for row in self.walk(path, params)]
+                    self.assertEqual(calories, [1, 2, 3, 400, 450, 500], path)
+
+    def test_recent_range_skips_archive(self):
+        """Test a range after the horizon never reads the archive"""
+        self.archive()
+        start = (timezone.now() - timedelta(days=30)).date().isoformat()
+        with mock.patch('octofit_tracker.archive.PartitionedQuery') as merged:
+            response = self.client.get('/api/activities/by_user/', {'email': 'old@example.com', 'start': start})
+        merged.assert_not_called()
+        self.assertEqual([row['calories'] for row in response.data['results']], [1, 2, 3])
+
+    def test_batch_by_user_reads_archive_only_when_short(self):
+        """Test batched activities fill up from the archive only past the hot ones"""
+        self.archive()
+        params = {'emails': 'old@example.com', 'fields': 'calories'}
+        with mock.patch.object(DocumentQuery, '_find', autospec=True, side_effect=DocumentQuery._find) as find:
+            response = self.client.get('/api/activities/batch_by_user/', {**params, 'limit': 2})
+        self.assertEqual(response.data, {'old@example.com': [{'calories': 1}, {'calories': 2}]})
+        self.assertEqual([call.args[0].model for call in find.call_args_list], [Activity])
+
+        response = self.client.get('/api/activities/batch_by_user/', {**params, 'limit': 4})
+        self.assertEqual([row['calories'] for row in response.data['old@example.com']], [1, 2, 3, 400])
+
+    def test_horizon_read_once_per_cache(self):
+        """Test the horizon is read once within a cache and refreshed by an archive run"""
+        with horizon_cache():
+            self.assertIsNone(archive_horizon())
+            with mock.patch('octofit_tracker.archive._read_horizon') as read:
+                archive_overlaps()
+                archive_overlaps()
+            read.assert_not_called()
+            self.archive()
+            self.assertIsNotNone(archive_horizon())
+        with mock.patch('octofit_tracker.archive._read_horizon', return_value=None) as read:
+            self.client.get('/api/activities/', {'email': 'old@example.com', 'page_size': 2})
+        self.assertEqual(read.call_count, 1)
+
+    def test_archived_detail_and_export(self):
+        """Test archived activities can be read, updated and exported"""
+        self.archive()
+        archived = ArchivedActivity.objects.get(calories=500)
+        response = self.client.get(f'/api/activities/{archived._id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['calories'], 500)
+        response = self.client.patch(f'/api/activities/{archived._id}/', {'duration': 45}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(ArchivedActivity.objects.get(calories=500).duration, 45)
+
+        response = self.client.get('/api/activities/export/')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['calories'] for row in rows], [500, 400, 3, 2, 1])
+
+
+class BatchLookupTest(APITestCase):
+    """Test cases for the keyed multi-get actions"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.team = Team.objects.create(name='Team A')
+        self.empty_team = Team.objects.create(name='Team B')
+        now = timezone.now()
+        for index in range(3):
+            User.objects.create(name=f'User {index}', email=f'user{index}@example.com', password='pw', team='Team A')
+            for days_ago in range(index + 2):
+                Activity.objects.create(
+                    user_email=f'user{index}@example.com', activity_type='Running',
+                    duration=30, calories=100 * index + days_ago, date=now - timedelta(days=days_ago),
+                )
+
+    def test_users_batch_keyed_by_email(self):
+        """Test users are returned keyed by email with null for unknown emails"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/users/batch/', {
+                'emails': 'user2@example.com,nobody@example.com,user0@example.com',
+            })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(list(response.data), ['user2@example.com', 'nobody@example.com', 'user0@example.com'])
+        self.assertEqual(response.data['user2@example.com']['name'], 'User 2')
+        self.assertNotIn('password', response.data['user2@example.com'])
+        self.assertIsNone(response.data['nobody@example.com'])
+
+    def test_activities_batch_by_user(self):
+        """Test each user gets their newest activities, up to the limit"""
+        response = self.client.get('/api/activities/batch_by_user/', {
+            'emails': 'user0@example.com,user2@example.com,nobody@example.com', 'limit': 3, 'fields': 'calories',
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {
+            'user0@example.com': [{'calories': 0}, {'calories': 1}],
+            'user2@example.com': [{'calories': 200}, {'calories': 201}, {'calories': 202}],
+            'nobody@example.com': [],
+        })
+
+    def test_activities_batch_runs_users_concurrently(self):
+        """Test each user's activities are read on the batch pool"""
+        threads = []
+        original = DocumentQuery._find
+
+        def find(query, *args, **kwargs):
+            threads.append(threading.current_thread().name)
+            return original(query, *args, **kwargs)
+
+        with mock.patch.object(DocumentQuery, '_find', find):
+            response = self.client.get('/api/activities/batch_by_user/', {
+                'emails': 'user0@example.com,user1@example.com,user2@example.com', 'limit': 1,
+            })
+        self.assertEqual([rows[0]['calories'] for rows in response.data.values()], [0, 100, 200])
+        self.assertEqual(len(threads), 3)
+        self.assertTrue(all(name.startswith('batch') for name in threads))
+
+    def test_teams_batch_members(self):
+        """Test members are returned keyed by team id"""
+        team_id, empty_id = str(self.team._id), str(self.empty_team._id)
+        response = self.client.get('/api/teams/batch_members/', {'ids': f'{team_id},{empty_id}', 'fields': 'email'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {
+            team_id: [{'email': f'user{index}@example.com'} for index in range(3)],
+            empty_id: [],
+        })
+
+    def test_batch_parameters_are_validated(self):
+        """Test missing, oversized and malformed key lists are rejected"""
+        emails = ','.join(f'user{index}@example.com' for index in range(101))
+        for path, params in (
+            ('/api/users/batch/', {}),
+            ('/api/users/batch/', {'emails': emails}),
+            ('/api/teams/batch_members/', {'ids': 'not-an-id'}),
+            ('/api/activities/batch_by_user/', {'emails': 'user0@example.com', 'limit': 'x'}),
+        ):
+            response = self.client.get(path, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+
+class DashboardTest(APITestCase):
+    """Test cases for the compound dashboard endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        Team.objects.create(name='Team A', description='The A team')
+        User.objects.create(name='Dash', email='dash@example.com', password='pw', team='Team A')
+        User.objects.create(name='Loner', email='loner@example.com', password='pw')
+        now = timezone.now()
+        for index in range(12):
+            Activity.objects.create(
+                user_email='dash@example.com', activity_type='Cycling',
+                duration=30, calories=index, date=now - timedelta(hours=index),
+            )
+        for rank in range(1, 8):
+            Leaderboard.objects.create(
+                user_email='dash@example.com' if rank == 3 else f'user{rank}@example.com',
+                user_name=f'User {rank}', team='Team A', total_calories=1000 - rank, rank=rank,
+            )
+        for name, activity_type in (('Ride', 'Cycling'), ('Run', 'Running'), ('Spin', 'Cycling')):
+            Workout.objects.create(name=name, activity_type=activity_type, duration=45, difficulty='Beginner')
+
+    def test_dashboard_sections_are_bounded(self):
+        """Test every section is returned for the user and capped in size"""
+        response = self.client.get('/api/dashboard/', {'email': 'dash@example.com'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data['user']['name'], 'Dash')
+        self.assertNotIn('password', data['user'])
+        self.assertEqual(data['rank']['rank'], 3)
+        self.assertEqual([activity['calories'] for activity in data['activities']], list(range(10)))
+        self.assertEqual(data['team']['name'], 'Team A')
+        self.assertNotIn('members', data['team'])
+        self.assertEqual([leader['rank'] for leader in data['team']['leaders']], [1, 2, 3, 4, 5])
+        self.assertEqual([workout['name'] for workout in data['workouts']], ['Ride', 'Spin'])
+
+    def test_dashboard_of_new_user(self):
+        """Test a user without a team, rank or activities gets empty sections"""
+        data = self.client.get('/api/dashboard/', {'email': 'loner@example.com'}).json()
+        self.assertIsNone(data['rank'])
+        self.assertIsNone(data['team'])
+        self.assertEqual(data['activities'], [])
+        self.assertEqual(len(data['workouts']), 3)
+
+    def test_sections_record_their_own_stats(self):
+        """Test each pool thread counts into its own stats, merged into the request's"""
+        request_stats, seen = RequestStats(), []
+
+        def standing(database, email):
+            stats = current_stats.get()
+            seen.append(stats)
+            stats.mongo_commands += 1
+            stats.mongo_seconds += 0.5
+
+        token = current_stats.set(request_stats)
+        try:
+            with mock.patch('octofit_tracker.dashboard.standing', standing):
+                build_dashboard('dash@example.com')
+        finally:
+            current_stats.reset(token)
+        self.assertIsNot(seen[0], request_stats)
+        self.assertEqual((request_stats.mongo_commands, request_stats.mongo_seconds), (1, 0.5))
+
+    def test_dashboard_requires_known_user(self):
+        """Test the email is required and must belong to a user"""
+        self.assertEqual(self.client.get('/api/dashboard/').status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/api/dashboard/', {'email': 'nobody@example.com'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
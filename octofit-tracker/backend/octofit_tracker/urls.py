@@ -18,12 +18,17 @@ from django.contrib import admin
 from django.urls import path, include
 from django.http import JsonResponse
 from rest_framework import routers
+from . import async_views
 from .views import (
     UserViewSet,
     TeamViewSet,
     ActivityViewSet,
+    ActivityRollupViewSet,
     LeaderboardViewSet,
-    WorkoutViewSet
+    WorkoutViewSet,
+    dashboard,
+    pool_stats,
+    metrics,
 )
 
 # Get codespace name from environment
@@ -39,8 +44,10 @@ def api_root(request):
         'users': f'{base_url}/api/users/',
         'teams': f'{base_url}/api/teams/',
         'activities': f'{base_url}/api/activities/',
+        'rollups': f'{base_url}/api/rollups/',
         'leaderboard': f'{base_url}/api/leaderboard/',
         'workouts': f'{base_url}/api/workouts/',
+        'dashboard': f'{base_url}/api/dashboard/',
     })
 
 # Create router and register viewsets
@@ -48,12 +55,23 @@ router = routers.DefaultRouter()
 router.register(r'users', UserViewSet, basename='user')
 router.register(r'teams', TeamViewSet, basename='team')
 router.register(r'activities', ActivityViewSet, basename='activity')
+router.register(r'rollups', ActivityRollupViewSet, basename='rollup')
 router.register(r'leaderboard', LeaderboardViewSet, basename='leaderboard')
 router.register(r'workouts', WorkoutViewSet, basename='workout')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', api_root, name='api-root'),
+    path('api/dashboard/', dashboard, name='dashboard'),
+    path('api/metrics/pool/', pool_stats, name='pool-stats'),
+    path('metrics', metrics, name='metrics'),
+    # Async read paths served without blocking the event loop under ASGI
+    path('api/async/activities/by_user/', async_views.activities_by_user, name='async-activity-by-user'),
+    path('api/async/leaderboard/top/', async_views.leaderboard_top, name='async-leaderboard-top'),
+    path('api/async/leaderboard/by_team/', async_views.leaderboard_by_team, name='async-leaderboard-by-team'),
+    path('api/async/workouts/', async_views.workouts, name='async-workout-list'),
+    path('api/async/workouts/by_difficulty/', async_views.workouts_by_difficulty, name='async-workout-by-difficulty'),
+    path('api/async/workouts/by_type/', async_views.workouts_by_type, name='async-workout-by-type'),
     path('', include(router.urls)),  # Root points to API
     path('api/', include(router.urls)),  # Also available under /api/
     path('api-auth/', include('rest_framework.urls', namespace='rest_framework')),
@@ -1,132 +1,612 @@
+import heapq
+import os
+from operator import itemgetter
+from bson import ObjectId
+from bson.errors import InvalidId
+from django.conf import settings
+from django.db import connection
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from rest_framework import viewsets, status
-from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.decorators import action, api_view
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.response import Response
-from .models import User, Team, Activity, Leaderboard, Workout
+from . import repository
+from .archive import activity_models, partitioned
+from .aggregations import STATS_GROUP_KEYS, activity_stats
+from .boards import board_id, board_rank
+from .cache import cached_response
+from .dashboard import build_dashboard
+from .exports import EXPORT_FORMATS
+from .filters import filter_activities, parse_date_param, parse_list_param
+from .leaderboard import activity_snapshot, rank_of, record_activity_changes
+from .metrics import render_prometheus
+from .models import User, Team, Activity, ActivityRollup, ArchivedActivity, Leaderboard, LeaderboardSnapshot, Workout
+from .monitoring import pool_metrics
+from .pagination import (
+    ActivityCursorPagination,
+    LeaderboardCursorPagination,
+    ObjectIdCursorPagination,
+    RollupCursorPagination,
+)
+from .parsers import NDJSONParser
+from .rollups import record_rollup_changes
 from .serializers import (
     UserSerializer,
     TeamSerializer,
     ActivitySerializer,
+    ActivityRollupSerializer,
     LeaderboardSerializer,
-    WorkoutSerializer
+    LeaderboardSnapshotSerializer,
+    WorkoutSerializer,
+    activity_rows,
+    leaderboard_rows,
+    rollup_rows,
+    snapshot_rows,
+    user_rows,
+    workout_rows,
+    readable_fields,
 )
+from .write_behind import enqueue
+
+
+class SparseFieldsMixin:
+    """
+    Narrow GET responses with ``?fields=a,b`` and/or ``?exclude=c``.
+    The selection is also pushed down into the query as a projection
+    (``.only()``), keeping ``_id`` and the pagination ordering fields.
+    """
+
+    def selected_fields(self, serializer_class=None):
+        """Selected field names in declaration order, or None for all"""
+        params = self.request.query_params
+        if 'fields' not in params and 'exclude' not in params:
+            return None
+
+        readable = readable_fields(serializer_class or self.get_serializer_class())
+        requested = [name for name in params.get('fields', '').split(',') if name.strip()]
+        excluded = [name for name in params.get('exclude', '').split(',') if name.strip()]
+        unknown = sorted({name.strip() for name in requested + excluded} - set(readable))
+        if unknown:
+            raise ValidationError({'fields': [
+                f'Unknown fields: {", ".join(unknown)}. Choose from: {", ".join(readable)}'
+            ]})
+        requested = {name.strip() for name in requested} or set(readable)
+        excluded = {name.strip() for name in excluded}
+        return [name for name in readable if name in requested and name not in excluded]
+
+    def project(self, queryset, serializer_class=None):
+        fields = self.selected_fields(serializer_class)
+        if fields is None:
+            return queryset
+        ordering = getattr(self.paginator, 'ordering', None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        return queryset.only('_id', *fields, *(field.lstrip('-') for field in ordering))
+
+    def narrow(self, serializer, serializer_class=None):
+        fields = self.selected_fields(serializer_class)
+        if fields is not None:
+            target = getattr(serializer, 'child', serializer)
+            for name in list(target.fields):
+                if name not in fields:
+                    target.fields.pop(name)
+        return serializer
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if self.request.method in SAFE_METHODS:
+            serializer = self.narrow(serializer)
+        return serializer
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action == 'retrieve':
+            queryset = self.project(queryset)
+        return queryset
+
+
+class PaginatedActionMixin(SparseFieldsMixin):
+    """
+    Paginate custom list actions with the viewset's paginator.
+    Lists are rendered with ``read_converter`` when the viewset sets one
+    and with the serializer otherwise.
+    """
+    read_converter = None
+
+    def serialize_rows(self, rows):
+        if self.read_converter is not None:
+            return self.read_converter.many(rows, self.selected_fields())
+        return self.get_serializer(rows, many=True).data
+
+    def paginated_response(self, queryset):
+        page = self.paginate_queryset(self.project(queryset))
+        return self.get_paginated_response(self.serialize_rows(page))
 
+    def list(self, request, *args, **kwargs):
+        queryset = self.project(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(self.serialize_rows(queryset))
+        return self.get_paginated_response(self.serialize_rows(page))
 
-class UserViewSet(viewsets.ModelViewSet):
+
+class ObjectIdLookupMixin:
+    """
+    Resolve detail routes by ObjectId.
+    djongo compares the raw URL string against ``_id`` otherwise and never matches.
+    """
+
+    def get_object(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            self.kwargs[lookup_url_kwarg] = ObjectId(self.kwargs[lookup_url_kwarg])
+        except (InvalidId, TypeError):
+            raise Http404
+        return super().get_object()
+
+
+class UserViewSet(ObjectIdLookupMixin, PaginatedActionMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing users.
     Provides CRUD operations for user accounts.
     """
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    pagination_class = ObjectIdCursorPagination
+    batch_max_items = 100
+
+    @action(detail=False, methods=['get'])
+    def batch(self, request):
+        """Get the users with the given emails in one query, keyed by email (null if unknown)"""
+        emails = parse_list_param(request.query_params, 'emails', self.batch_max_items)
+        fields = self.selected_fields()
+        users = repository.users_by_email(emails, fields)
+        return Response({email: user_rows(users[email], fields) if email in users else None for email in emails})
 
     @action(detail=False, methods=['get'])
     def by_team(self, request):
         """Get users filtered by team"""
         team_name = request.query_params.get('team', None)
         if team_name:
-            users = User.objects.filter(team=team_name)
-            serializer = self.get_serializer(users, many=True)
-            return Response(serializer.data)
+            team = Team.objects.filter(name=team_name).first()
+            users = User.objects.filter(team_ref=team) if team else User.objects.none()
+            return self.paginated_response(users)
         return Response({'error': 'Team parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
 
 
-class TeamViewSet(viewsets.ModelViewSet):
+class TeamViewSet(ObjectIdLookupMixin, PaginatedActionMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing teams.
     Provides CRUD operations for team entities.
     """
     queryset = Team.objects.all()
     serializer_class = TeamSerializer
+    pagination_class = ObjectIdCursorPagination
+    batch_max_items = 50
+
+    @action(detail=False, methods=['get'])
+    def batch_members(self, request):
+        """Get the members of the teams with the given ids in one query, keyed by team id"""
+        team_ids = parse_list_param(request.query_params, 'ids', self.batch_max_items)
+        try:
+            object_ids = [ObjectId(team_id) for team_id in team_ids]
+        except InvalidId:
+            raise ValidationError({'ids': 'Team ids must be ObjectIds'})
+        fields = self.selected_fields(UserSerializer)
+        members = repository.members_by_team(object_ids, fields)
+        return Response({
+            team_id: user_rows.many(members.get(object_id, []), fields)
+            for team_id, object_id in zip(team_ids, object_ids)
+        })
 
     @action(detail=True, methods=['get'])
     def members(self, request, pk=None):
         """Get all members of a specific team"""
         team = self.get_object()
-        users = User.objects.filter(team=team.name)
-        serializer = UserSerializer(users, many=True)
-        return Response(serializer.data)
+        users = self.project(team.users.all(), UserSerializer)
+        page = self.paginate_queryset(users)
+        serializer = self.narrow(UserSerializer(page, many=True), UserSerializer)
+        return self.get_paginated_response(serializer.data)
 
 
-class ActivityViewSet(viewsets.ModelViewSet):
+class ActivityViewSet(ObjectIdLookupMixin, PaginatedActionMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing activities.
     Provides CRUD operations for fitness activities.
     """
     queryset = Activity.objects.all()
     serializer_class = ActivitySerializer
+    read_converter = activity_rows
+    pagination_class = ActivityCursorPagination
+    bulk_max_items = 5000
+    export_chunk_size = 2000
+    batch_max_items = 100
+    batch_max_limit = 100
+
+    def get_object(self):
+        """Fall back to the archive for activities moved there"""
+        try:
+            return super().get_object()
+        except Http404:
+            self.queryset = ArchivedActivity.objects.all()
+            return super().get_object()
+
+    def routed(self, hot, archived):
+        """
+        Narrow hot and archived activities by the shared activity query
+        parameters; the archive is only read when the ``start`` reaches it
+        """
+        params = self.request.query_params
+        hot, archived = filter_activities(hot, params), filter_activities(archived, params)
+        return partitioned(hot, archived, parse_date_param(params, 'start'))
+
+    def list(self, request, *args, **kwargs):
+        return self.paginated_response(self.routed(Activity.objects.all(), ArchivedActivity.objects.all()))
+
+    def record_changes(self, removed=(), added=()):
+        """Apply activity snapshots to the leaderboard and the rollups, or queue them"""
+        if settings.OCTOFIT_WRITE_BEHIND:
+            enqueue(removed=removed, added=added)
+            return
+        record_activity_changes(removed=removed, added=added)
+        record_rollup_changes(removed=removed, added=added)
+
+    def perform_create(self, serializer):
+        activity = serializer.save()
+        self.record_changes(added=[activity_snapshot(activity)])
+
+    def perform_update(self, serializer):
+        previous = activity_snapshot(serializer.instance)
+        activity = serializer.save()
+        self.record_changes(removed=[previous], added=[activity_snapshot(activity)])
+
+    def perform_destroy(self, instance):
+        previous = activity_snapshot(instance)
+        instance.delete()
+        self.record_changes(removed=[previous])
+
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
+        """Create many activities from a JSON array or an NDJSON stream"""
+        serializer = self.get_serializer(data=request.data, many=True, max_length=self.bulk_max_items)
+        serializer.is_valid(raise_exception=True)
+        activities = serializer.save()
+        self.record_changes(added=[activity_snapshot(activity) for activity in activities])
+
+        results = [
+            {'index': index, 'status': 'accepted', '_id': str(activity._id)}
+            for index, activity in zip(serializer.accepted, activities)
+        ]
+        results.extend(
+            {'index': index, 'status': 'rejected', 'errors': errors}
+            for index, errors in serializer.rejected
+        )
+        results.sort(key=lambda result: result['index'])
+
+        if not serializer.rejected:
+            response_status = status.HTTP_201_CREATED
+        elif serializer.accepted:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({
+            'accepted': len(serializer.accepted),
+            'rejected': len(serializer.rejected),
+            'results': results,
+        }, status=response_status)
 
     @action(detail=False, methods=['get'])
     def by_user(self, request):
-        """Get activities filtered by user email"""
+        """Get activities filtered by user email, between optional start and end dates"""
         user_email = request.query_params.get('email', None)
         if user_email:
-            activities = Activity.objects.filter(user_email=user_email).order_by('-date')
-            serializer = self.get_serializer(activities, many=True)
-            return Response(serializer.data)
+            if settings.OCTOFIT_FAST_READS:
+                activities = self.routed(
+                    repository.activities_by_user(user_email),
+                    repository.activities_by_user(user_email, ArchivedActivity),
+                )
+            else:
+                activities = self.routed(
+                    Activity.objects.filter(user_email=user_email).order_by('-date'),
+                    ArchivedActivity.objects.filter(user_email=user_email).order_by('-date'),
+                )
+            return self.paginated_response(activities)
         return Response({'error': 'Email parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['get'])
+    def batch_by_user(self, request):
+        """
+        Get the newest ``limit`` activities of each of the given emails, keyed
+        by email, narrowed by the optional type, start and end parameters
+        """
+        params = request.query_params
+        emails = parse_list_param(params, 'emails', self.batch_max_items)
+        try:
+            limit = int(params.get('limit', 20))
+        except ValueError:
+            return Response({'error': 'Limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, self.batch_max_limit))
+
+        fields = self.selected_fields()
+        activities = repository.activities_by_users(emails, limit, fields, params)
+        return Response({email: activity_rows.many(activities.get(email, []), fields) for email in emails})
+
     @action(detail=False, methods=['get'])
     def by_type(self, request):
-        """Get activities filtered by activity type"""
+        """Get activities filtered by activity type, between optional start and end dates"""
         activity_type = request.query_params.get('type', None)
         if activity_type:
-            activities = Activity.objects.filter(activity_type=activity_type).order_by('-date')
-            serializer = self.get_serializer(activities, many=True)
-            return Response(serializer.data)
+            if settings.OCTOFIT_FAST_READS:
+                activities = self.routed(
+                    repository.activities_by_type(activity_type),
+                    repository.activities_by_type(activity_type, ArchivedActivity),
+                )
+            else:
+                activities = self.routed(
+                    Activity.objects.filter(activity_type=activity_type).order_by('-date'),
+                    ArchivedActivity.objects.filter(activity_type=activity_type).order_by('-date'),
+                )
+            return self.paginated_response(activities)
         return Response({'error': 'Type parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream activities as NDJSON or CSV, filtered by email, type, start and end"""
+        export_format = request.query_params.get('export_format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {'error': f'export_format must be one of: {", ".join(EXPORT_FORMATS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        encoder, content_type = EXPORT_FORMATS[export_format]
+
+        fields = self.selected_fields() or ActivitySerializer.Meta.fields
+        # Hot and archived rows are merged on a leading date column
+        start = parse_date_param(request.query_params, 'start')
+        rows = heapq.merge(*(
+            filter_activities(model.objects.all(), request.query_params)
+            .order_by('date').values_list('date', *fields).iterator(chunk_size=self.export_chunk_size)
+            for model in activity_models(start)
+        ), key=itemgetter(0))
+
+        response = StreamingHttpResponse(encoder((row[1:] for row in rows), fields), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="activities.{export_format}"'
+        return response
+
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """Get activity totals and averages grouped by user, team, activity_type, day, week or month"""
+        group_by = [key for key in request.query_params.get('group_by', 'user').split(',') if key]
+        unknown = [key for key in group_by if key not in STATS_GROUP_KEYS]
+        if not group_by or unknown:
+            return Response(
+                {'error': f'group_by must be a comma-separated list of: {", ".join(STATS_GROUP_KEYS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({
+            'group_by': group_by,
+            'results': activity_stats(group_by, request.query_params),
+        })
+
+
+class ActivityRollupViewSet(ObjectIdLookupMixin, PaginatedActionMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint for daily and weekly activity totals.
+    Lists need ``scope`` (user or team) and ``key`` (email or team name) and
+    take ``period`` (day or week, default day), ``start`` and ``end``.
+    """
+    queryset = ActivityRollup.objects.all()
+    serializer_class = ActivityRollupSerializer
+    read_converter = rollup_rows
+    pagination_class = RollupCursorPagination
+
+    def list(self, request, *args, **kwargs):
+        params = request.query_params
+        scope, key, period = params.get('scope'), params.get('key'), params.get('period', 'day')
+        if not scope or not key:
+            return Response({'error': 'Scope and key parameters are required'}, status=status.HTTP_400_BAD_REQUEST)
+        choices = {'scope': (scope, ActivityRollup.SCOPES), 'period': (period, ActivityRollup.PERIODS)}
+        for name, (value, options) in choices.items():
+            if value not in dict(options):
+                return Response(
+                    {'error': f'{name} must be one of: {", ".join(dict(options))}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        if settings.OCTOFIT_FAST_READS:
+            rollups = repository.rollups(scope, key, period)
+        else:
+            rollups = ActivityRollup.objects.filter(scope=scope, key=key, period=period).order_by('bucket')
+        start = parse_date_param(params, 'start')
+        if start:
+            rollups = rollups.filter(bucket__gte=start)
+        end = parse_date_param(params, 'end')
+        if end:
+            rollups = rollups.filter(bucket__lt=end)
+        return self.paginated_response(rollups)
 
-class LeaderboardViewSet(viewsets.ModelViewSet):
+
+class LeaderboardViewSet(ObjectIdLookupMixin, PaginatedActionMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing leaderboard.
     Provides CRUD operations and ranking queries.
     """
     queryset = Leaderboard.objects.all().order_by('rank')
     serializer_class = LeaderboardSerializer
+    read_converter = leaderboard_rows
+    pagination_class = LeaderboardCursorPagination
+    top_max_limit = 100
 
     @action(detail=False, methods=['get'])
+    @cached_response(Leaderboard)
     def by_team(self, request):
         """Get leaderboard filtered by team"""
         team_name = request.query_params.get('team', None)
         if team_name:
-            leaderboard = Leaderboard.objects.filter(team=team_name).order_by('rank')
-            serializer = self.get_serializer(leaderboard, many=True)
-            return Response(serializer.data)
+            if settings.OCTOFIT_FAST_READS:
+                leaderboard = repository.leaderboard_by_team(team_name)
+            else:
+                leaderboard = Leaderboard.objects.filter(team=team_name).order_by('rank')
+            return self.paginated_response(leaderboard)
         return Response({'error': 'Team parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=False, methods=['get'])
+    @cached_response(Leaderboard)
     def top(self, request):
         """Get top N entries from leaderboard"""
-        limit = int(request.query_params.get('limit', 10))
-        leaderboard = Leaderboard.objects.all().order_by('rank')[:limit]
-        serializer = self.get_serializer(leaderboard, many=True)
-        return Response(serializer.data)
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            return Response({'error': 'Limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, self.top_max_limit))
+        if settings.OCTOFIT_FAST_READS:
+            leaderboard = self.project(repository.leaderboard())[:limit]
+        else:
+            leaderboard = self.project(Leaderboard.objects.all().order_by('rank'))[:limit]
+        return Response(self.serialize_rows(leaderboard))
+
+    @action(detail=False, methods=['get'])
+    @cached_response(Leaderboard)
+    def around(self, request):
+        """Get a user's leaderboard entry and the N entries ranked above and below it"""
+        email = request.query_params.get('email', None)
+        if not email:
+            return Response({'error': 'Email parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            return Response({'error': 'Limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, self.top_max_limit))
 
+        rank = rank_of(email)
+        if rank is None:
+            return Response({'error': 'User is not on the leaderboard'}, status=status.HTTP_404_NOT_FOUND)
+        if settings.OCTOFIT_FAST_READS:
+            leaderboard = repository.leaderboard()
+        else:
+            leaderboard = Leaderboard.objects.all().order_by('rank')
+        leaderboard = leaderboard.filter(rank__gte=rank - limit, rank__lte=rank + limit)
+        return Response({
+            'rank': rank,
+            'results': self.serialize_rows(self.project(leaderboard)[:2 * limit + 1]),
+        })
+
+    @action(detail=False, methods=['get'])
+    @cached_response(LeaderboardSnapshot)
+    def boards(self, request):
+        """
+        Get the top N of a precomputed board, chosen by scope (global or team,
+        with team=), window and metric; with email=, get the user's entry and
+        the N entries above and below it instead
+        """
+        params = request.query_params
+        choices = {
+            'scope': (params.get('scope', 'global'), LeaderboardSnapshot.SCOPES),
+            'window': (params.get('window', 'all'), LeaderboardSnapshot.WINDOWS),
+            'metric': (params.get('metric', 'calories'), LeaderboardSnapshot.METRICS),
+        }
+        for name, (value, options) in choices.items():
+            if value not in dict(options):
+                return Response(
+                    {'error': f'{name} must be one of: {", ".join(dict(options))}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        scope, window, metric = (value for value, _ in choices.values())
+        team = params.get('team')
+        if scope == 'team' and not team:
+            return Response({'error': 'Team parameter is required for team boards'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(params.get('limit', 10))
+        except ValueError:
+            return Response({'error': 'Limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, self.top_max_limit))
 
-class WorkoutViewSet(viewsets.ModelViewSet):
+        board = board_id(scope, window, metric, team)
+        if settings.OCTOFIT_FAST_READS:
+            entries = repository.board(board)
+        else:
+            entries = LeaderboardSnapshot.objects.filter(board=board).order_by('rank')
+        email = params.get('email')
+        if email:
+            rank = board_rank(board, email)
+            if rank is None:
+                return Response({'error': 'User is not on this board'}, status=status.HTTP_404_NOT_FOUND)
+            entries = entries.filter(rank__gte=rank - limit, rank__lte=rank + limit)
+            limit = 2 * limit + 1
+
+        rows = self.project(entries, LeaderboardSnapshotSerializer)[:limit]
+        return Response({
+            'board': board,
+            'results': snapshot_rows.many(rows, self.selected_fields(LeaderboardSnapshotSerializer)),
+        })
+
+
+class WorkoutViewSet(ObjectIdLookupMixin, PaginatedActionMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing workouts.
     Provides CRUD operations for workout suggestions.
     """
     queryset = Workout.objects.all()
     serializer_class = WorkoutSerializer
+    read_converter = workout_rows
+    pagination_class = ObjectIdCursorPagination
 
     @action(detail=False, methods=['get'])
+    @cached_response(Workout)
     def by_difficulty(self, request):
         """Get workouts filtered by difficulty level"""
         difficulty = request.query_params.get('difficulty', None)
         if difficulty:
-            workouts = Workout.objects.filter(difficulty=difficulty)
-            serializer = self.get_serializer(workouts, many=True)
-            return Response(serializer.data)
+            if settings.OCTOFIT_FAST_READS:
+                workouts = repository.workouts_by('difficulty', difficulty)
+            else:
+                workouts = Workout.objects.filter(difficulty=difficulty)
+            return self.paginated_response(workouts)
         return Response({'error': 'Difficulty parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=False, methods=['get'])
+    @cached_response(Workout)
     def by_type(self, request):
         """Get workouts filtered by activity type"""
         activity_type = request.query_params.get('type', None)
         if activity_type:
-            workouts = Workout.objects.filter(activity_type=activity_type)
-            serializer = self.get_serializer(workouts, many=True)
-            return Response(serializer.data)
+            if settings.OCTOFIT_FAST_READS:
+                workouts = repository.workouts_by('activity_type', activity_type)
+            else:
+                workouts = Workout.objects.filter(activity_type=activity_type)
+            return self.paginated_response(workouts)
         return Response({'error': 'Type parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['GET'])
+def pool_stats(request):
+    """Mongo connection pool counters of this worker process, per server"""
+    client_settings = connection.settings_dict.get('CLIENT', {})
+    return Response({
+        'pid': os.getpid(),
+        'max_pool_size': client_settings.get('maxPoolSize', 100),
+        'min_pool_size': client_settings.get('minPoolSize', 0),
+        'servers': pool_metrics.snapshot(),
+    })
+
+
+@api_view(['GET'])
+def dashboard(request):
+    """
+    The main screen of one user (``?email=``) in one request: their profile,
+    rank, team summary, recent activities and suggested workouts
+    """
+    email = request.query_params.get('email', None)
+    if not email:
+        return Response({'error': 'Email parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
+    data = build_dashboard(email)
+    if data is None:
+        return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(data)
+
+
+def metrics(request):
+    """Request and connection pool metrics of this worker in the Prometheus text format"""
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,153 @@
+"""
+Write-behind queue for the data derived from activities.
+
+With ``OCTOFIT_WRITE_BEHIND`` enabled, activity writes no longer update
+the leaderboard and rollups inline. They upsert one ``WriteBehindTask``
+per affected user instead, adding the changed days to a pending task of
+that user if there is one, so a burst of writes coalesces into a single
+recomputation. ``run_write_behind`` workers claim tasks in batches, merge
+them per user and recompute from the activities (``recompute_users`` and
+``recompute_rollups``), which is idempotent, so a batch that fails or
+whose worker dies is simply retried.
+
+Claims are leases: a claimed task becomes claimable again once
+``available_at`` passes. A claim also leases its user in
+``write_behind_locks`` (one document per user, keyed by email), and tasks
+of users leased to another worker are left for a later claim, so two
+workers never recompute the same user at once; concurrent ``_move`` calls
+for one user would shift the entries in between twice. Failed tasks are released with an exponential
+backoff. After ``OCTOFIT_WRITE_BEHIND_MAX_ATTEMPTS`` they are kept, with
+their last error, as ``claimed_by='failed'``; later writes of the same
+user then queue a new task instead of joining the failed one.
+
+Derived data lags writes by the worker's poll interval. Workers retire
+cached leaderboard responses through the cache, which only reaches the
+web processes when the cache is shared (``REDIS_URL``).
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from django.conf import settings
+from django.utils import timezone as django_timezone
+from .leaderboard import recompute_users
+from .models import WriteBehindTask
+from .mongo import get_collection, get_database
+from .rollups import day_start, recompute_rollups
+
+logger = logging.getLogger(__name__)
+
+# ``claimed_by`` of tasks that used up their attempts
+FAILED = 'failed'
+LOCKS = 'write_behind_locks'
+
+
+def enqueue(removed=(), added=()):
+    """Queue recomputation for the owners and days of activity snapshots"""
+    days = defaultdict(set)
+    for snapshot in (*removed, *added):
+        days[snapshot['user_email']].add(day_start(snapshot['date']).strftime('%Y-%m-%d'))
+    if not days:
+        return
+
+    now = django_timezone.now()
+    get_collection(WriteBehindTask).bulk_write([
+        UpdateOne(
+            # Only unclaimed tasks absorb new days; a claimed one may already be half done
+            {'user_email': user_email, 'claimed_by': ''},
+            {
+                '$addToSet': {'days': {'$each': sorted(user_days)}},
+                '$setOnInsert': {'enqueued_at': now, 'available_at': now, 'attempts': 0, 'last_error': ''},
+            },
+            upsert=True,
+        )
+        for user_email, user_days in days.items()
+    ], ordered=False)
+
+
+def lock_user(worker, user_email, until):
+    """Lease ``user_email`` to ``worker`` until ``until``; False while another worker holds it"""
+    try:
+        get_database()[LOCKS].update_one(
+            {'_id': user_email, '$or': [{'worker': worker}, {'expires_at': {'$lte': django_timezone.now()}}]},
+            {'$set': {'worker': worker, 'expires_at': until}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+def unlock_users(worker, user_emails):
+    get_database()[LOCKS].delete_many({'_id': {'$in': list(user_emails)}, 'worker': worker})
+
+
+def claim(worker, batch_size, lease, max_attempts=None):
+    """Lease up to ``batch_size`` due tasks, and their users, to ``worker``, oldest first"""
+    max_attempts = max_attempts or settings.OCTOFIT_WRITE_BEHIND_MAX_ATTEMPTS
+    collection = get_collection(WriteBehindTask)
+    # Users other workers are recomputing; their tasks wait for a later claim
+    locked = set(get_database()[LOCKS].distinct('_id', {
+        'worker': {'$ne': worker}, 'expires_at': {'$gt': django_timezone.now()},
+    }))
+    tasks = []
+    while len(tasks) < batch_size:
+        now = django_timezone.now()
+        task = collection.find_one_and_update(
+            {
+                'available_at': {'$lte': now}, 'attempts': {'$lt': max_attempts},
+                'claimed_by': {'$ne': FAILED}, 'user_email': {'$nin': list(locked)},
+            },
+            {'$set': {'claimed_by': worker, 'available_at': now + lease}, '$inc': {'attempts': 1}},
+            sort=[('available_at', 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+        if task is None:
+            break
+        if not lock_user(worker, task['user_email'], now + lease):
+            # Leased to another worker since the locks were read
+            collection.update_one({'_id': task['_id'], 'claimed_by': worker}, {
+                '$set': {'claimed_by': '', 'available_at': now}, '$inc': {'attempts': -1},
+            })
+            locked.add(task['user_email'])
+            continue
+        tasks.append(task)
+    return tasks
+
+
+def process(worker, tasks, backoff=timedelta(seconds=5), max_attempts=None):
+    """Recompute the derived data of claimed tasks; returns the number of users done"""
+    max_attempts = max_attempts or settings.OCTOFIT_WRITE_BEHIND_MAX_ATTEMPTS
+    user_days = defaultdict(set)
+    for task in tasks:
+        user_days[task['user_email']].update(
+            datetime.strptime(day, '%Y-%m-%d').replace(tzinfo=timezone.utc) for day in task['days']
+        )
+
+    collection = get_collection(WriteBehindTask)
+    ids = [task['_id'] for task in tasks]
+    try:
+        recompute_users(list(user_days))
+        recompute_rollups(user_days)
+    except Exception as error:
+        unlock_users(worker, user_days)
+        logger.exception('Write-behind batch of %d task(s) failed', len(tasks))
+        exhausted = [task['_id'] for task in tasks if task['attempts'] >= max_attempts]
+        retried = [task for task in tasks if task['attempts'] < max_attempts]
+        if exhausted:
+            collection.update_many({'_id': {'$in': exhausted}, 'claimed_by': worker}, {'$set': {
+                'claimed_by': FAILED, 'last_error': repr(error),
+            }})
+        if retried:
+            attempts = max(task['attempts'] for task in retried)
+            collection.update_many({'_id': {'$in': [task['_id'] for task in retried]}, 'claimed_by': worker}, {'$set': {
+                'claimed_by': '',
+                'available_at': django_timezone.now() + backoff * 2 ** (attempts - 1),
+                'last_error': repr(error),
+            }})
+        return 0
+
+    collection.delete_many({'_id': {'$in': ids}, 'claimed_by': worker})
+    unlock_users(worker, user_days)
+    return len(user_days)
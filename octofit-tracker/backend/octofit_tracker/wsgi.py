@@ -9,8 +9,13 @@ https://docs.djangoproject.com/en/4.1/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'octofit_tracker.settings')
 
 application = get_wsgi_application()
+
+if settings.MONGO_PREWARM:
+    from octofit_tracker.mongo import prewarm
+    prewarm()